@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、Kernel.AssignTask 的 asyncio 封装，AsyncKernel.AssignTask 为协程，以异步方式提交任务后等待结果，不阻塞事件循环，
+#    替代每个任务一个 threading.Event 加 OnResult_XXX 回调的写法，一个事件循环可同时等待任意多个任务；
+# 2、全部任务共用一个回调，回调在 Kernel 的线程中按结果的 tasker_id 找到对应的 Future，经 loop.call_soon_threadsafe 在事件循环中设置结果，
+#    回调早于 AssignTask 返回 tasker_id 时结果先暂存，登记时直接取用；
+# 3、等待超时或协程被取消（包括外层 asyncio.wait_for 超时）时以 Kernel.CancelTask 取消任务，之后到达的结果直接丢弃，
+#    超时抛出 asyncio.TimeoutError，timeout 未指定时取任务的 timeout_wait，为 0 时不限，CancelTask 失败时记入 logging 日志，不掩盖原异常；
+# 4、concurrency 限制同时执行的任务数量，超出的协程在提交前等待，避免大量请求同时涌入 Kernel 的任务队列；
+# 5、返回结果与同步 AssignTask 相同，为原始结果字典，提交失败时直接返回提交结果，可用 codec.ParseResult 解析；
+
+# 注意：AsyncKernel 只能在创建后首次使用它的事件循环中使用。
+
+import asyncio
+import logging
+import threading
+
+import tasker
+
+async_concurrency = 64 # 默认同时执行的任务数量
+
+logger = logging.getLogger(__name__)
+
+class AsyncKernel(object):
+    def __init__(self, kernel, concurrency = async_concurrency):
+        if concurrency < 1:
+            raise ValueError("同时执行的任务数量必须为正整数！%s" % concurrency)
+        self.kernel = kernel
+        self.concurrency = concurrency
+        self.semaphore = None # 在事件循环中创建
+        self.lock = threading.Lock()
+        self.waiting = {} # {tasker_id: (loop, future)}
+        self.arrived = {} # 早于登记到达的结果
+        self.cancelled = set() # 已取消任务，其结果到达时丢弃
+
+    # Kernel 线程中调用
+    def OnResult(self, result):
+        tasker_id = result.get("tasker_id")
+        with self.lock:
+            if tasker_id in self.cancelled:
+                self.cancelled.discard(tasker_id)
+                return
+            if tasker_id not in self.waiting:
+                self.arrived[tasker_id] = result
+                return
+            loop, future = self.waiting.pop(tasker_id)
+        loop.call_soon_threadsafe(SetResult, future, result)
+
+    # 结果已交给事件循环时不再取消
+    def CancelTask(self, args, tasker_id):
+        with self.lock:
+            if self.waiting.pop(tasker_id, None) is None:
+                return
+            self.cancelled.add(tasker_id) # 结果到达时丢弃并移除
+        cancel_args = dict(args)
+        cancel_args["tasker_id"] = tasker_id
+        try:
+            self.kernel.CancelTask(cancel_args)
+        except Exception as e:
+            logger.warning("CancelTask 异常！%s %s", tasker_id, e)
+
+    # task 为 Tasker 或参数字典，timeout 为等待结果的秒数
+    async def AssignTask(self, task, timeout = None):
+        args = task.ToArgs() if isinstance(task, tasker.Tasker) else task
+        if timeout is None and args.get("timeout_wait", 0) > 0:
+            timeout = args["timeout_wait"]
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        async with self.semaphore:
+            loop = asyncio.get_event_loop() # 协程内即为当前运行的事件循环，兼容 Python 3.6
+            future = loop.create_future()
+            result = self.kernel.AssignTask(args, self.OnResult) # 异步
+            if result["return_code"] != 0:
+                return result
+            tasker_id = result["tasker_id"]
+            with self.lock:
+                if tasker_id in self.arrived:
+                    future.set_result(self.arrived.pop(tasker_id))
+                else:
+                    self.waiting[tasker_id] = (loop, future)
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                self.CancelTask(args, tasker_id)
+                raise
+
+    # 同时执行多个任务，按输入顺序返回结果，return_exceptions 与 asyncio.gather 一致
+    async def AssignTasks(self, tasks, timeout = None, return_exceptions = False):
+        return await asyncio.gather(*[self.AssignTask(task, timeout) for task in tasks], return_exceptions = return_exceptions)
+
+def SetResult(future, result):
+    if not future.done():
+        future.set_result(result)
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、Python 端 NumPy 蒙特卡洛雪球定价引擎，入参与 test_derivx_autocall_snowball 中的 Config 一致；
+# 2、CalcGreeksMulti 一次任务同时计算多个希腊值，所有差分情景共用同一组随机数据（公共随机数），
+#    Delta 和 Gamma 的价格偏移直接在同一组比率路径上计算，Vega 和 Rho 只重建路径不重新生成随机数据，
+#    Theta 使用同一组路径的前段，避免每个希腊值各自提交任务时重复生成路径，也消除希腊值之间的模拟噪声差异；
+#    差分类型、方式和粒度取自 diff_settings，可由 LoadDiffSettings 读取插件 ini 文件，单个任务以 config.diff_settings 覆盖部分项；
+# 3、默认按价格缩放方式计算，GBM 路径对初始价格成比例，全部 calc_price 共用同一组比率路径，计算量随路径数量而非路径数量乘以价格数量增长；
+# 4、计算结果为 calc_price 行 runs_step 列的矩阵，只填充 run_from 起 run_days 天，与插件结果格式一致；
+# 5、结果数值为 trade_long 方向的收支现值（相对初始价格的比率），不计保证金本金；
+# 6、收支现值对 coupon_rate 是线性的，CalcCoupon 一次模拟得到各路径的贴现计息年数和非票息收支，直接解线性方程得到客户票息，
+#    CalcCouponLine 返回收支现值关于票息的直线，可按不同目标收益一次读出对应票息；
+# 7、calc_mode_observe 只模拟敲出观察日和到期日，观察日之间的逐日敲入按布朗桥条件抽样区间最小值（离散观察修正）判断，
+#    长期限产品每条路径计算量约为逐日模拟的 1/20，不支持涨跌停限制，与逐日方式相比有很小的离散化偏差；
+# 8、calc_mode_pde 改用 autocall_pde 有限差分引擎，一次逆推得到全部价格和天数的结果，没有模拟噪声，凤凰结构只支持此方式；
+# 9、calc_mode_smooth 改用 autocall_smooth 平滑估计引擎，CalcGreeksMulti 中 Delta、Vega 按路径导数、Gamma 按似然比混合估计，
+#    不做价格、波动率偏移，障碍附近的 Gamma 噪声远小于差分方式，Theta、Rho 仍按差分情景在同一次模拟中计算；
+
+# 注意：目前未支持期权费方式、返息、敲出参与增强、锁盈缓冲、自然日参数和 payoff_calc_method 非零等设置，
+#      此类参数非默认值时抛出 ValueError 异常，需要时仍使用 derivx_autocall_snowball 插件计算。
+
+import xml.etree.ElementTree
+
+import numpy as np
+
+import pathgen
+import autocall_pde
+import autocall_smooth
+import vanilla_european
+
+func_calc_coupon = 1
+func_calc_payoff = 2
+func_calc_greeks = 3
+
+calc_chunk_rows = 8192 # 每批计算路径数量，限制内存占用
+
+# 计算方式
+calc_mode_reference = 0 # 逐个计算价格生成价格路径计算，用于核对
+calc_mode_scaled = 1 # 同一组比率路径按计算价格缩放，全部计算价格一次计算
+calc_mode_observe = 2 # 只模拟敲出观察日和到期日，观察日之间的逐日敲入按布朗桥条件抽样区间最小值，同样按价格缩放
+calc_mode_pde = 3 # 有限差分 PDE 引擎，见 autocall_pde
+calc_mode_smooth = 4 # 敲出按一步存活抽样、敲入按穿越概率的平滑估计，希腊值按路径导数和似然比估计，见 autocall_smooth
+
+bridge_beta = 0.5825971579390106 # 离散观察修正系数 -zeta(1/2)/sqrt(2*pi)，障碍向外平移 beta*sigma*sqrt(dt)
+
+# 差分计算设置，与插件 ini 默认设置一致，可由 LoadDiffSettings 读取插件 ini 文件替换，单个任务可由 config.diff_settings 覆盖
+# type 差分计算类型 0:向前，1:向后，2:中心
+# mode 差分计算方式 0:加法，1:乘法
+# size 差分计算粒度，加法即实际值，乘法非百分比，Theta 为天数
+diff_settings = {
+    "d": {"type": 2, "mode": 1, "size": 0.01},
+    "g": {"type": 2, "mode": 1, "size": 0.01},
+    "v": {"type": 2, "mode": 0, "size": 0.01},
+    "t": {"type": 0, "mode": 0, "size": 1.0},
+    "r": {"type": 2, "mode": 0, "size": 0.01}
+}
+
+diff_ini_names = {"d": "D", "g": "G", "v": "V", "t": "T", "r": "R"} # 插件 ini 中 DiffCalcType_X 等的后缀
+
+def CheckConfig(config):
+    unsupported = []
+    if config.use_option_fee == True:
+        unsupported.append("use_option_fee")
+    if config.knock_i_above_get == True:
+        unsupported.append("knock_i_above_get")
+    if config.knock_o_p_need == True:
+        unsupported.append("knock_o_p_need")
+    for name in ["prefix_rebate_ann_need", "prefix_rebate_abs_need", "suffix_rebate_ann_need", "suffix_rebate_abs_need"]:
+        if getattr(config, name, False) == True:
+            unsupported.append(name)
+    if config.payoff_calc_method != 0:
+        unsupported.append("payoff_calc_method")
+    if config.runs_step_n != 0 or len(config.knock_o_days_n) > 0 or len(config.trading_days_n) > 0:
+        unsupported.append("runs_step_n")
+    if len(unsupported) > 0:
+        raise ValueError("NumPy 引擎暂不支持参数：%s" % ", ".join(unsupported))
+    if len(config.knock_o_days) != len(config.knock_o_rate):
+        raise ValueError("敲出日期序列与敲出比率序列长度不一致！%d != %d" % (len(config.knock_o_days), len(config.knock_o_rate)))
+    if config.run_from < 0 or config.run_from + config.run_days > config.runs_step:
+        raise ValueError("运行天数超出价格变动步数！%d + %d > %d" % (config.run_from, config.run_days, config.runs_step))
+
+# 估值时点，返回已确定价格的交易日数和首个需观察的列
+# 未收盘时当日收盘价仍随机，路径第 1 列为当日收盘，已收盘时当日收盘价即计算价格，路径第 0 列需观察
+def GetOffset(config, run_day):
+    fixed = run_day + (1 if config.market_close == True else 0)
+    if fixed >= config.runs_step:
+        return config.runs_step, 0
+    return fixed, (0 if config.market_close == True else 1)
+
+# 雪球各路径收支现值，prices 第 c 列为第 fixed + c 个交易日的价格
+def EvalSnowball(config, prices, fixed, first, disc_rate, coupon_rate):
+    runs_step = config.runs_step
+    count, cols = prices.shape[0], prices.shape[1] - 1
+    start_price = config.start_price
+
+    end_day = runs_step + config.extend_end_days
+    pay_day = np.full(count, float(end_day))
+    knock_o = np.zeros(count, dtype = bool)
+    for day, rate in zip(config.knock_o_days, config.knock_o_rate):
+        col = day - fixed
+        if col < first or col > cols:
+            continue
+        hit = (prices[:, col] >= rate * start_price) & ~knock_o
+        pay_day[hit] = day + config.extend_end_days
+        knock_o |= hit
+
+    if config.knock_i_occur == True:
+        knock_i = np.ones(count, dtype = bool)
+    elif config.knock_i_valid != True:
+        knock_i = np.zeros(count, dtype = bool)
+    elif config.knock_i_only_at_end == True:
+        knock_i = prices[:, cols] <= config.knock_i_ratio * start_price
+    else:
+        knock_i = prices[:, first :].min(axis = 1) <= config.knock_i_ratio * start_price
+
+    return SettleSnowball(config, knock_o, pay_day, knock_i, prices[:, cols], fixed, disc_rate, coupon_rate)
+
+# 价格缩放方式，ratios 第 c 列为第 fixed + c + 1 个交易日价格与计算价格之比，prices 为全部计算价格，结果为 [路径, 价格]
+# GBM 路径对初始价格成比例，同一组比率路径对每个计算价格只做观察列上的比较，计算量不随计算价格数量按路径步数倍增
+# 比较时仍以价格乘以比率的形式计算，与逐价格方式的结果完全一致
+def EvalSnowballScaled(config, ratios, prices, fixed, first, disc_rate, coupon_rate):
+    runs_step = config.runs_step
+    count, cols = ratios.shape[0], ratios.shape[1]
+    start_price = config.start_price
+    prices = np.asarray(prices, dtype = float)
+    ones = np.ones(count)
+    def Ratio(col):
+        return ones if col == 0 else ratios[:, col - 1]
+
+    end_day = runs_step + config.extend_end_days
+    pay_day = np.full((count, len(prices)), float(end_day))
+    knock_o = np.zeros((count, len(prices)), dtype = bool)
+    for day, rate in zip(config.knock_o_days, config.knock_o_rate):
+        col = day - fixed
+        if col < first or col > cols:
+            continue
+        hit = (np.multiply.outer(Ratio(col), prices) >= rate * start_price) & ~knock_o
+        pay_day[hit] = day + config.extend_end_days
+        knock_o |= hit
+
+    if config.knock_i_occur == True:
+        knock_i = np.ones((count, len(prices)), dtype = bool)
+    elif config.knock_i_valid != True:
+        knock_i = np.zeros((count, len(prices)), dtype = bool)
+    else:
+        if config.knock_i_only_at_end == True:
+            ratio_low = Ratio(cols)
+        else:
+            ratio_low = ratios[:, max(first - 1, 0) : cols].min(axis = 1) if cols > 0 else ones
+            if first == 0:
+                ratio_low = np.minimum(ratio_low, 1.0)
+        knock_i = np.multiply.outer(ratio_low, prices) <= config.knock_i_ratio * start_price
+
+    return SettleSnowball(config, knock_o, pay_day, knock_i, np.multiply.outer(Ratio(cols), prices), fixed, disc_rate, coupon_rate)
+
+# 观察日方式，ratios 第 k 列为第 fixed + grid_cols[k] 个交易日价格与计算价格之比，结果为 [路径, 价格]
+# 相邻模拟日之间的逐日敲入观察按布朗桥条件抽样区间最小值，uniforms 第 k 列用于第 k 段，障碍按离散观察修正下移
+# 区间最小值只与比率路径有关，与计算价格无关，敲入判断与逐日方式一样只需对每条路径的最小比率按价格缩放
+def EvalSnowballObserve(config, ratios, uniforms, grid_cols, prices, fixed, first, disc_rate, coupon_rate, sigma):
+    runs_step = config.runs_step
+    count, cols = ratios.shape[0], runs_step - fixed
+    start_price = config.start_price
+    prices = np.asarray(prices, dtype = float)
+    ones = np.ones(count)
+    column = dict((col, k) for k, col in enumerate(grid_cols))
+
+    end_day = runs_step + config.extend_end_days
+    pay_day = np.full((count, len(prices)), float(end_day))
+    knock_o = np.zeros((count, len(prices)), dtype = bool)
+    for day, rate in zip(config.knock_o_days, config.knock_o_rate):
+        col = day - fixed
+        if col < first or col > cols:
+            continue
+        ratio = ones if col == 0 else ratios[:, column[col]]
+        hit = (np.multiply.outer(ratio, prices) >= rate * start_price) & ~knock_o
+        pay_day[hit] = day + config.extend_end_days
+        knock_o |= hit
+
+    ratio_end = ratios[:, -1] if cols > 0 else ones
+    barrier = config.knock_i_ratio * start_price
+    if config.knock_i_occur == True:
+        knock_i = np.ones((count, len(prices)), dtype = bool)
+    elif config.knock_i_valid != True:
+        knock_i = np.zeros((count, len(prices)), dtype = bool)
+    elif config.knock_i_only_at_end == True:
+        knock_i = np.multiply.outer(ratio_end, prices) <= barrier
+    else:
+        ratio_low = ratios.min(axis = 1) if cols > 0 else ones # 模拟日本身按实际障碍观察
+        if first == 0:
+            ratio_low = np.minimum(ratio_low, 1.0)
+        knock_i = np.multiply.outer(ratio_low, prices) <= barrier
+        spans = np.diff(np.concatenate(([0], grid_cols)))
+        inner = spans > 1 # 段内有逐日观察
+        if inner.any():
+            dt = 1.0 / config.year_days
+            log_b = np.log(ratios[:, inner])
+            log_a = np.log(np.concatenate((ones[:, None], ratios[:, : -1]), axis = 1)[:, inner])
+            variance = sigma * sigma * spans[inner] * dt
+            log_low = 0.5 * (log_a + log_b - np.sqrt((log_b - log_a) ** 2 - 2.0 * variance * np.log(uniforms[:, : len(spans)][:, inner])))
+            ratio_low = np.exp(log_low.min(axis = 1))
+            knock_i |= np.multiply.outer(ratio_low, prices) <= barrier * np.exp(-bridge_beta * sigma * np.sqrt(dt))
+
+    return SettleSnowball(config, knock_o, pay_day, knock_i, np.multiply.outer(ratio_end, prices), fixed, disc_rate, coupon_rate)
+
+# 观察日方式的模拟步，首个敲入观察日、敲出观察日和到期日，以距 fixed 的步数计
+# 首个敲入观察日单独模拟，避免估值日价格接近障碍时未观察的首段按布朗桥计入穿越
+def GetGridCols(config, fixed, first):
+    cols = config.runs_step - fixed
+    grid = set(day - fixed for day in config.knock_o_days if first <= day - fixed <= cols and day - fixed > 0)
+    if cols > 0:
+        grid.add(cols)
+        grid.add(max(first, 1))
+    return sorted(grid)
+
+# 由敲出、敲入状态和到期价格计算收支现值，各数组形状一致或可广播，knock_i 可为敲入概率
+# coupon_rate 为 None 时返回收支现值关于票息的直线，末维 [0] 为与票息无关的部分，[1] 为每单位票息的贴现计息年数
+def SettleSnowball(config, knock_o, pay_day, knock_i, price_end, fixed, disc_rate, coupon_rate):
+    year_days = float(config.year_days)
+    start_price = config.start_price
+    end_day = config.runs_step + config.extend_end_days
+    loss = config.knock_i_participate * np.minimum(price_end - config.strike_price, 0.0) / start_price
+    loss = np.maximum(loss, -config.knock_i_max_loss)
+    # 票息收支对 coupon_rate 线性，ukiuko 票息为固定值计入非票息部分
+    if config.ukiuko_coupon_use == True:
+        keep_fixed = config.ukiuko_coupon * (end_day / year_days if config.ukiuko_coupon_ann == True else 1.0)
+        keep_accrual = 0.0
+    else:
+        keep_fixed = 0.0
+        keep_accrual = end_day / year_days
+    knock_i = np.asarray(knock_i, dtype = float) # 可为敲入概率
+    payoff = np.where(knock_o, 0.0, knock_i * loss + (1.0 - knock_i) * keep_fixed)
+    accrual = np.where(knock_o, pay_day / year_days, (1.0 - knock_i) * keep_accrual)
+
+    years = (pay_day - fixed) / year_days
+    discount = np.exp(-disc_rate * years)
+    if config.discount_payoff == True:
+        payoff = payoff * discount
+        accrual = accrual * discount
+    margin = config.margin_rate * (np.exp(config.margin_interest * years) - 1.0)
+    if config.discount_margin == True:
+        margin = margin * discount
+    value = payoff - margin
+    if coupon_rate is None:
+        value = np.stack(np.broadcast_arrays(value, accrual), axis = -1)
+    else:
+        value = value + coupon_rate * accrual
+    return value if config.trade_long == True else -value
+
+# 情景：(波动率, 漂移利率, 贴现利率, 延后天数, 价格偏移方式, 价格偏移粒度)
+def MakeScenario(config, sigma = None, drift_rate = None, disc_rate = None, day_shift = 0, bump_mode = 0, bump_size = 0.0):
+    return (config.sigma if sigma is None else sigma,
+            config.risk_free_rate if drift_rate is None else drift_rate,
+            config.risk_free_rate if disc_rate is None else disc_rate,
+            int(day_shift), int(bump_mode), float(bump_size))
+
+def BumpPrice(price, bump_mode, bump_size):
+    return price * (1.0 + bump_size) if bump_mode == 1 else price + bump_size
+
+# 所有情景在同一批随机数据上计算，返回 [情景, 价格, 天数] 收支现值均值
+# coupon_rate 为 None 时返回 [情景, 价格, 天数, 2] 收支现值关于票息的直线，见 SettleSnowball
+def CalcValues(config, scenarios, prices, run_days, coupon_rate, calc_mode = calc_mode_scaled):
+    if calc_mode == calc_mode_pde:
+        return autocall_pde.CalcValues(config, scenarios, prices, run_days, coupon_rate)
+    if autocall_pde.IsPhoenix(config):
+        raise ValueError("凤凰结构只支持 calc_mode_pde 计算方式！")
+    if calc_mode == calc_mode_smooth:
+        return autocall_smooth.CalcValues(config, scenarios, prices, run_days, coupon_rate)
+    CheckConfig(config)
+    prices = np.asarray(prices, dtype = float)
+    year_days = float(config.year_days)
+    values = np.zeros((len(scenarios), len(prices), len(run_days)) + ((2,) if coupon_rate is None else ()))
+    groups = {}
+    for index, scenario in enumerate(scenarios):
+        groups.setdefault(scenario[0 : 2], []).append(index)
+    if calc_mode == calc_mode_observe:
+        if config.price_limit_style != 0 and config.price_limit_ratio > 0.0:
+            raise ValueError("观察日方式不支持涨跌停限制！")
+        grid_size = len(config.knock_o_days) + 2
+    for path_from in range(0, config.runs_size, calc_chunk_rows):
+        path_to = min(path_from + calc_chunk_rows, config.runs_size)
+        if calc_mode == calc_mode_observe:
+            # 前 grid_size 列用于各段价格，其后 grid_size 列转为均匀分布用于各段最小值抽样
+            normals = pathgen.MakeNormals(config, path_from, path_to, 2 * grid_size, bridge = False, narrow = True)
+            uniforms = vanilla_european.NormCdf(normals[:, grid_size :])
+        else:
+            normals = pathgen.MakeNormals(config, path_from, path_to)
+        for (sigma, drift_rate), indexes in groups.items():
+            drift = drift_rate - config.basis_rate
+            if calc_mode != calc_mode_observe:
+                ratios = pathgen.MakeRatioPaths(normals, sigma, drift, 1.0 / year_days, config.price_limit_ratio, config.price_limit_style)
+            for index in indexes:
+                _, _, disc_rate, day_shift, bump_mode, bump_size = scenarios[index]
+                for i, run_day in enumerate(run_days):
+                    fixed, first = GetOffset(config, run_day + day_shift)
+                    cols = config.runs_step - fixed
+                    if calc_mode == calc_mode_observe:
+                        grid_cols = GetGridCols(config, fixed, first)
+                        grid_ratios = pathgen.MakeGridRatioPaths(normals, sigma, drift, 1.0 / year_days, grid_cols)
+                        bumped = [BumpPrice(price, bump_mode, bump_size) for price in prices]
+                        values[index, :, i] += EvalSnowballObserve(config, grid_ratios, uniforms, grid_cols, bumped, fixed, first, disc_rate, coupon_rate, sigma).sum(axis = 0)
+                        continue
+                    if calc_mode == calc_mode_scaled:
+                        bumped = [BumpPrice(price, bump_mode, bump_size) for price in prices]
+                        values[index, :, i] += EvalSnowballScaled(config, ratios[:, : cols], bumped, fixed, first, disc_rate, coupon_rate).sum(axis = 0)
+                        continue
+                    path_prices = np.empty((path_to - path_from, cols + 1))
+                    for j, price in enumerate(prices):
+                        price = BumpPrice(price, bump_mode, bump_size)
+                        path_prices[:, 0] = price
+                        np.multiply(ratios[:, : cols], price, out = path_prices[:, 1 :])
+                        values[index, j, i] += EvalSnowball(config, path_prices, fixed, first, disc_rate, coupon_rate).sum(axis = 0)
+    return values / config.runs_size
+
+def GetRunDays(config):
+    return list(range(config.run_from, config.run_from + config.run_days))
+
+def ToSurface(config, values):
+    surface = np.zeros((len(config.calc_price), config.runs_step))
+    surface[:, config.run_from : config.run_from + config.run_days] = values
+    return surface
+
+# 读取插件 ini 文件中的差分计算设置，如 plugins/derivx_autocall_snowball/derivx_autocall_snowball.ini，文件中缺少的项取 diff_settings 中的值
+def LoadDiffSettings(file_path):
+    root = xml.etree.ElementTree.parse(file_path).getroot()
+    settings = {}
+    for greek, name in diff_ini_names.items():
+        setting = dict(diff_settings[greek])
+        for key, item in (("type", "DiffCalcType_"), ("mode", "DiffCalcMode_"), ("size", "DiffCalcSize_")):
+            node = root.find(item + name)
+            if node is not None:
+                setting[key] = float(node.text) if key == "size" else int(node.text)
+        settings[greek] = setting
+    return settings
+
+# 单个希腊值的差分计算设置，config.diff_settings 可只给出需要覆盖的项，如 {"d": {"size": 0.005}}
+def GetDiffSetting(config, greek):
+    if greek not in diff_settings:
+        raise ValueError("未知的希腊值标识：%s" % greek)
+    setting = dict(diff_settings[greek])
+    setting.update(getattr(config, "diff_settings", {}).get(greek, {}))
+    if setting["type"] not in (0, 1, 2) or setting["mode"] not in (0, 1) or setting["size"] <= 0.0:
+        raise ValueError("差分计算设置无效！%s %s" % (greek, setting))
+    if greek == "g" and setting["type"] != 2:
+        raise ValueError("Gamma 只支持中心差分！")
+    if greek == "t" and (setting["mode"] != 0 or setting["size"] != int(setting["size"])):
+        raise ValueError("Theta 只支持加法方式、整数天数粒度！")
+    return setting
+
+# 希腊值所需情景及差分组合系数
+def GetGreekScenarios(config, greek):
+    setting = GetDiffSetting(config, greek)
+    diff_type, diff_mode, size = setting["type"], setting["mode"], setting["size"]
+    if greek == "d" or greek == "g":
+        up = MakeScenario(config, bump_mode = diff_mode, bump_size = size)
+        dn = MakeScenario(config, bump_mode = diff_mode, bump_size = -size)
+    elif greek == "v":
+        sigma = config.sigma * size if diff_mode == 1 else size
+        up = MakeScenario(config, sigma = config.sigma + sigma)
+        dn = MakeScenario(config, sigma = config.sigma - sigma)
+    elif greek == "r":
+        rate = config.risk_free_rate * size if diff_mode == 1 else size
+        drift_u = config.risk_free_rate if config.is_futures == True else config.risk_free_rate + rate # 期货期权利率变动不影响漂移
+        drift_d = config.risk_free_rate if config.is_futures == True else config.risk_free_rate - rate
+        up = MakeScenario(config, drift_rate = drift_u, disc_rate = config.risk_free_rate + rate)
+        dn = MakeScenario(config, drift_rate = drift_d, disc_rate = config.risk_free_rate - rate)
+    else:
+        if diff_type != 0 and config.run_from < size:
+            raise ValueError("向后或中心差分 Theta 的起始天数不能小于差分天数！%d < %d" % (config.run_from, size))
+        up = MakeScenario(config, day_shift = int(size))
+        dn = MakeScenario(config, day_shift = -int(size))
+    if greek == "g":
+        return [up, dn]
+    return [up, dn] if diff_type == 2 else ([up] if diff_type == 0 else [dn])
+
+# Theta 为每天的收支变化，Vega 和 Rho 与插件一致为波动率、利率变动 1% 的收支变化
+def CombineGreek(config, greek, base, bumps):
+    setting = GetDiffSetting(config, greek)
+    diff_type, diff_mode, size = setting["type"], setting["mode"], setting["size"]
+    if greek == "t":
+        step = size
+    elif greek == "d" or greek == "g":
+        step = np.asarray(config.calc_price, dtype = float)[:, None] * size if diff_mode == 1 else size
+    elif greek == "v":
+        step = (config.sigma * size if diff_mode == 1 else size) * 100.0
+    else:
+        step = (config.risk_free_rate * size if diff_mode == 1 else size) * 100.0
+    if greek == "g":
+        return (bumps[0] + bumps[1] - 2.0 * base) / (step * step)
+    if diff_type == 2:
+        return (bumps[0] - bumps[1]) / (2.0 * step)
+    if diff_type == 0:
+        return (bumps[0] - base) / step
+    return (base - bumps[0]) / step
+
+def CalcPayoff(config, calc_mode = calc_mode_scaled):
+    values = CalcValues(config, [MakeScenario(config)], config.calc_price, GetRunDays(config), config.coupon_rate, calc_mode)
+    return ToSurface(config, values[0])
+
+def CalcGreeks(config, calc_mode = calc_mode_scaled):
+    return CalcGreeksMulti(config, [config.calc_greek], calc_mode)[config.calc_greek]
+
+# 多个希腊值共用的情景列表，第一个为基准情景，plans 为各希腊值所用情景的序号，skip 中的希腊值不需要差分情景
+def PlanGreeks(config, greeks, skip = ()):
+    scenarios = [MakeScenario(config)]
+    plans = {}
+    for greek in greeks:
+        if greek == "p" or greek == "c" or greek in skip:
+            continue
+        indexes = []
+        for scenario in GetGreekScenarios(config, greek):
+            if scenario not in scenarios:
+                scenarios.append(scenario)
+            indexes.append(scenarios.index(scenario))
+        plans[greek] = indexes
+    return scenarios, plans
+
+# 一次计算多个希腊值，greeks 为希腊值标识序列，另可包含 "p" 收益曲面和 "c" 客户票息
+# calc_mode_smooth 时 autocall_smooth.estimate_greeks 中的希腊值由估计量直接得到，不使用差分设置
+def CalcGreeksMulti(config, greeks, calc_mode = calc_mode_scaled):
+    estimates = {}
+    estimated = [greek for greek in greeks if calc_mode == calc_mode_smooth and greek in autocall_smooth.estimate_greeks]
+    scenarios, plans = PlanGreeks(config, greeks, estimated)
+    if len(estimated) > 0:
+        if autocall_pde.IsPhoenix(config):
+            raise ValueError("凤凰结构只支持 calc_mode_pde 计算方式！")
+        values, estimates = autocall_smooth.CalcValues(config, scenarios, config.calc_price, GetRunDays(config), config.coupon_rate, estimated)
+    else:
+        values = CalcValues(config, scenarios, config.calc_price, GetRunDays(config), config.coupon_rate, calc_mode)
+    result = {}
+    for greek in greeks:
+        if greek == "p":
+            result[greek] = ToSurface(config, values[0])
+        elif greek == "c":
+            result[greek] = CalcCoupon(config, calc_mode = calc_mode)
+        elif greek in estimates:
+            result[greek] = ToSurface(config, estimates[greek])
+        else:
+            bumps = [values[index] for index in plans[greek]]
+            result[greek] = ToSurface(config, CombineGreek(config, greek, values[0], bumps))
+    return result
+
+# 收支现值关于客户票息的直线，在初始价格和 run_from 时点一次模拟得到，收支现值 = intercept + slope * coupon_rate
+# intercept 为敲入亏损、ukiuko 票息和保证金等与票息无关的收支，slope 为各路径贴现计息年数的均值
+def CalcCouponLine(config, calc_mode = calc_mode_scaled):
+    values = CalcValues(config, [MakeScenario(config)], [config.start_price], [config.run_from], None, calc_mode)
+    return {"intercept": values[0, 0, 0, 0], "slope": values[0, 0, 0, 1]}
+
+# 按直线求收支现值等于 target_value 的票息，target_value 可为序列，一次得到多个目标收益对应的票息
+def SolveCoupon(line, target_value = 0.0):
+    if line["slope"] == 0.0:
+        raise ValueError("客户票息求解失败，收支现值与票息无关！")
+    return (np.asarray(target_value, dtype = float) - line["intercept"]) / line["slope"]
+
+# 客户票息，在初始价格和 run_from 时点求收支现值为零的 coupon_rate
+# 同一组路径上收支现值对票息是线性的，直接由直线求解，无需反复模拟迭代
+def CalcCoupon(config, target_value = 0.0, calc_mode = calc_mode_scaled):
+    coupon = SolveCoupon(CalcCouponLine(config, calc_mode), target_value)
+    return coupon if coupon.ndim > 0 else float(coupon)
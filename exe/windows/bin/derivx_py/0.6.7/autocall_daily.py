@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、雪球逐日增量重估，DailyState 保存单个交易的估值状态：随机数据参数、标准化布朗路径、各路径 log 比率路径及其后缀最小值、
+#    已实现的收盘价和敲入、敲出状态，建立时与 autocall 的 calc_mode_scaled 使用同一组随机数据；
+# 2、每日收盘后以 Advance 传入当日实际收盘价，按实际收盘价判断敲入、敲出后 run_from 前移一天，剩余期限的路径取同一组布朗路径的后段，
+#    GBM 各步增量相互独立，后段路径以实际收盘价重新起算即为给定该收盘价时的有效样本，不重新生成随机数据，日间结果使用公共随机数；
+# 3、波动率和漂移利率不变时直接使用缓存的 log 比率路径，剩余期限内的最低价由后缀最小值一次取得，每日只读取敲出观察日、到期日和估值日各一行，
+#    计算量与路径数量乘以观察日数量相当，不再与剩余天数成正比；波动率、利率变化时由布朗路径重建 log 比率路径，仍不重新生成随机数据；
+#    Theta 情景与 autocall.CalcValues 一样和基准情景从同一行起算，使用相同的前段增量，只是剩余天数不同，敲入最低价按实际区间另取；
+# 4、路径数据按 [交易日, 路径] 存放，每日读取的各行连续，布朗路径和每组 log 比率路径、后缀最小值各占 runs_size * runs_step * 8 字节，
+#    按 (波动率, 漂移利率) 最多缓存 cache_limit 组，共约 (1 + 2 * cache_limit) * runs_size * runs_step * 8 字节内存，
+#    p、d、g、v、t、r 全部计算时为 11 倍，内存不足时可调小 cache_limit，代价是每日重建部分情景的路径；
+# 5、Save、LoadState 将状态写入、读出 .npz 文件，供每日批处理在不同进程间延续，文件只含布朗路径（with_brown 为 False 时不含）和已实现状态，
+#    log 比率路径和后缀最小值在读出后重建，布朗路径不在文件中时按随机数据参数重新生成，
+#    随机数据参数、建立时点、market_close 或 run_from 与保存时不同的状态不能继续使用，读出时抛出 ValueError 异常；
+# 6、市场参数（sigma、risk_free_rate、calc_price 等）在 state.config 上直接修改，CalcPayoff、CalcGreeksMulti 只计算当前 run_from 一天；
+
+# 注意：不支持涨跌停限制和凤凰结构，Theta 只支持向前差分（与插件一致），已敲出的交易不再估值，其余暂不支持的参数与 autocall 一致。
+
+import copy
+import json
+import hashlib
+import collections
+
+import numpy as np
+
+import autocall
+import pathgen
+import autocall_pde
+
+cache_limit = 5 # 按 (波动率, 漂移利率) 缓存的 log 比率路径组数，中心差分的 Vega、Rho 与基准情景共 5 组，超出时淘汰最久未用的一组
+
+def CheckConfig(config):
+    if autocall_pde.IsPhoenix(config):
+        raise ValueError("逐日增量重估不支持凤凰结构！")
+    autocall.CheckConfig(config)
+    if config.price_limit_style != 0 and config.price_limit_ratio > 0.0:
+        raise ValueError("逐日增量重估不支持涨跌停限制！")
+
+# 随机数据参数和建立时点，build_from 为建立状态时的 run_from，布朗桥构造与之有关
+def MakeKey(config, build_from):
+    key = {
+        "rand_seed": [int(seed) for seed in config.rand_seed],
+        "rand_rows": int(config.rand_rows),
+        "rand_cols": int(config.rand_cols),
+        "runs_size": int(config.runs_size),
+        "runs_step": int(config.runs_step),
+        "dual_smooth": bool(getattr(config, "dual_smooth", False)),
+        "rand_quasi": bool(getattr(config, "rand_quasi", False)),
+        "brownian_bridge": bool(getattr(config, "brownian_bridge", False)),
+        "build_from": int(build_from)
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys = True).encode("utf-8")).hexdigest()
+
+# 逐日增量方式，paths、lows 第 j 行为第 base + j 个交易日的 log 比率和此后各日 log 比率的最小值，结果为 [路径, 价格]
+# 路径从第 offset 行以计算价格重新起算，第 c 列对应第 fixed + c 个交易日，Theta 情景的 fixed 较大，与 autocall 一样只用前段增量
+# 敲出只取观察日所在行，敲入在路径延伸到最后一行时只取后缀最小值的一行，否则取区间内各行的最小值
+def EvalSnowballDaily(config, paths, lows, offset, prices, fixed, first, disc_rate, coupon_rate):
+    runs_step = config.runs_step
+    count, cols = paths.shape[1], runs_step - fixed
+    if offset + cols >= len(paths):
+        raise ValueError("剩余天数超出已建立的路径！%d + %d >= %d" % (offset, cols, len(paths)))
+    start_price = config.start_price
+    origin = paths[offset]
+    ones = np.ones(count)
+    def Ratio(col):
+        return ones if col == 0 else np.exp(paths[offset + col] - origin)
+
+    end_day = runs_step + config.extend_end_days
+    pay_day = np.full((count, len(prices)), float(end_day))
+    knock_o = np.zeros((count, len(prices)), dtype = bool)
+    for day, rate in zip(config.knock_o_days, config.knock_o_rate):
+        col = day - fixed
+        if col < first or col > cols:
+            continue
+        hit = (np.multiply.outer(Ratio(col), prices) >= rate * start_price) & ~knock_o
+        pay_day[hit] = day + config.extend_end_days
+        knock_o |= hit
+
+    if config.knock_i_occur == True:
+        knock_i = np.ones((count, len(prices)), dtype = bool)
+    elif config.knock_i_valid != True:
+        knock_i = np.zeros((count, len(prices)), dtype = bool)
+    else:
+        if config.knock_i_only_at_end == True:
+            ratio_low = Ratio(cols)
+        else:
+            if cols == 0:
+                ratio_low = ones
+            elif offset + cols == len(paths) - 1:
+                ratio_low = np.exp(lows[offset + max(first, 1)] - origin)
+            else:
+                ratio_low = np.exp(paths[offset + max(first, 1) : offset + cols + 1].min(axis = 0) - origin)
+            if first == 0:
+                ratio_low = np.minimum(ratio_low, 1.0)
+        knock_i = np.multiply.outer(ratio_low, prices) <= config.knock_i_ratio * start_price
+
+    return autocall.SettleSnowball(config, knock_o, pay_day, knock_i, np.multiply.outer(Ratio(cols), prices), fixed, disc_rate, coupon_rate)
+
+class DailyState(object):
+    def __init__(self, config, build = True):
+        CheckConfig(config)
+        self.config = copy.copy(config)
+        self.config.run_days = 1 # 逐日重估只计算当日
+        self.build_from = config.run_from
+        self.base = autocall.GetOffset(config, config.run_from)[0] # 路径第 0 行对应的交易日
+        self.key = MakeKey(config, self.build_from)
+        self.fixings = {} # 交易日: 实际收盘价
+        self.knock_o_day = 0 # 实际敲出的交易日，0 为未敲出
+        self.brown = None
+        self.caches = collections.OrderedDict() # {(波动率, 漂移利率): (paths, lows)}
+        if build == True:
+            self.Build()
+
+    # 标准化布朗路径，第 j 行为前 j 步标准正态随机数据之和，与 calc_mode_scaled 在建立时点使用的随机数据相同
+    def Build(self):
+        config = self.config
+        steps = config.runs_step - self.base
+        self.brown = np.zeros((steps + 1, config.runs_size))
+        for path_from in range(0, config.runs_size, autocall.calc_chunk_rows):
+            path_to = min(path_from + autocall.calc_chunk_rows, config.runs_size)
+            normals = pathgen.MakeNormals(config, path_from, path_to)
+            self.brown[1 :, path_from : path_to] = np.cumsum(normals[:, : steps], axis = 1).T
+        self.caches.clear()
+
+    def GetPaths(self, sigma, drift):
+        key = (float(sigma), float(drift))
+        if key in self.caches:
+            self.caches.move_to_end(key)
+            return self.caches[key]
+        while len(self.caches) >= max(cache_limit, 1):
+            self.caches.popitem(last = False)
+        dt = 1.0 / self.config.year_days
+        steps = np.arange(self.brown.shape[0], dtype = float)[:, None]
+        paths = (drift - 0.5 * sigma * sigma) * dt * steps + sigma * np.sqrt(dt) * self.brown
+        lows = np.minimum.accumulate(paths[:: -1], axis = 0)[:: -1]
+        self.caches[key] = (paths, lows)
+        return self.caches[key]
+
+    # 记录第 run_from + 1 个交易日的实际收盘价，按收盘价判断敲出、敲入后 run_from 前移一天
+    # market_close 为 True 时该收盘价即当日估值使用的计算价格，已在当日估值中观察，这里同样记录
+    def Advance(self, fixing):
+        config = self.config
+        if self.knock_o_day > 0:
+            raise ValueError("交易已于第 %d 个交易日敲出！" % self.knock_o_day)
+        day = config.run_from + 1
+        if day > config.runs_step:
+            raise ValueError("交易已到期！")
+        fixing = float(fixing)
+        self.fixings[day] = fixing
+        for knock_o_day, rate in zip(config.knock_o_days, config.knock_o_rate):
+            if knock_o_day == day and fixing >= rate * config.start_price:
+                self.knock_o_day = day
+        if config.knock_i_valid == True and fixing <= config.knock_i_ratio * config.start_price:
+            if config.knock_i_only_at_end != True or day == config.runs_step:
+                config.knock_i_occur = True
+        config.run_from = day
+
+    # 当前 run_from 各情景的收支现值，返回值与 autocall.CalcValues 一致，天数只有一天
+    def CalcValues(self, scenarios, prices, coupon_rate):
+        config = self.config
+        if self.knock_o_day > 0:
+            raise ValueError("交易已于第 %d 个交易日敲出！" % self.knock_o_day)
+        prices = np.asarray(prices, dtype = float)
+        values = np.zeros((len(scenarios), len(prices), 1) + ((2,) if coupon_rate is None else ()))
+        start = autocall.GetOffset(config, config.run_from)[0]
+        offset = start - self.base # 各情景都从估值日所在行起算
+        if offset < 0:
+            raise ValueError("估值日早于建立状态的交易日！%d < %d" % (start, self.base))
+        for index, scenario in enumerate(scenarios):
+            sigma, drift_rate, disc_rate, day_shift, bump_mode, bump_size = scenario
+            fixed, first = autocall.GetOffset(config, config.run_from + day_shift)
+            if fixed < start:
+                raise ValueError("逐日增量重估的 Theta 只支持向前差分！%d" % day_shift)
+            paths, lows = self.GetPaths(sigma, drift_rate - config.basis_rate)
+            bumped = autocall.BumpPrice(prices, bump_mode, bump_size)
+            for path_from in range(0, config.runs_size, autocall.calc_chunk_rows):
+                path_to = min(path_from + autocall.calc_chunk_rows, config.runs_size)
+                value = EvalSnowballDaily(config, paths[:, path_from : path_to], lows[:, path_from : path_to], offset, bumped, fixed, first, disc_rate, coupon_rate)
+                values[index, :, 0] += value.sum(axis = 0)
+        return values / config.runs_size
+
+    def CalcPayoff(self):
+        values = self.CalcValues([autocall.MakeScenario(self.config)], self.config.calc_price, self.config.coupon_rate)
+        return autocall.ToSurface(self.config, values[0])
+
+    # 与 autocall.CalcGreeksMulti 相同，各差分情景共用同一组路径
+    def CalcGreeksMulti(self, greeks):
+        config = self.config
+        scenarios, plans = autocall.PlanGreeks(config, greeks)
+        values = self.CalcValues(scenarios, config.calc_price, config.coupon_rate)
+        result = {}
+        for greek in greeks:
+            if greek == "p":
+                result[greek] = autocall.ToSurface(config, values[0])
+            elif greek == "c":
+                line = self.CalcValues([autocall.MakeScenario(config)], [config.start_price], None)[0, 0, 0]
+                result[greek] = float(autocall.SolveCoupon({"intercept": line[0], "slope": line[1]}))
+            else:
+                bumps = [values[index] for index in plans[greek]]
+                result[greek] = autocall.ToSurface(config, autocall.CombineGreek(config, greek, values[0], bumps))
+        return result
+
+    # 写入 .npz 文件，只含布朗路径和已实现状态，with_brown 为 False 时布朗路径也不写入，读出时重新生成
+    def Save(self, file_path, with_brown = True):
+        meta = {
+            "key": self.key,
+            "build_from": self.build_from,
+            "market_close": bool(self.config.market_close),
+            "run_from": int(self.config.run_from),
+            "knock_i_occur": bool(self.config.knock_i_occur),
+            "knock_o_day": int(self.knock_o_day),
+            "fixings": [[day, price] for day, price in sorted(self.fixings.items())]
+        }
+        arrays = {"brown": self.brown} if with_brown == True else {}
+        with open(file_path, "wb") as file:
+            np.savez(file, meta = np.array(json.dumps(meta)), **arrays)
+
+# 读取 Save 写入的状态，config 为当前交易参数，市场参数可与保存时不同，market_close 和 run_from 须与保存时相同，敲入状态取自文件
+# 读出后按 config 的波动率和漂移利率重建基准情景的 log 比率路径，其余情景在首次使用时重建
+def LoadState(file_path, config):
+    with np.load(file_path) as data:
+        meta = json.loads(str(data["meta"]))
+        if MakeKey(config, meta["build_from"]) != meta["key"]:
+            raise ValueError("逐日重估状态与交易参数不一致！%s" % file_path)
+        if bool(config.market_close) != meta["market_close"]:
+            raise ValueError("逐日重估状态的 market_close 与交易参数不一致！%s != %s" % (meta["market_close"], config.market_close))
+        if int(config.run_from) != meta["run_from"]:
+            raise ValueError("逐日重估状态的 run_from 与交易参数不一致！%d != %d" % (meta["run_from"], config.run_from))
+        config = copy.copy(config)
+        config.run_from = meta["build_from"]
+        state = DailyState(config, build = False)
+        if "brown" in data:
+            state.brown = data["brown"]
+        else:
+            state.Build()
+    state.config.run_from = meta["run_from"]
+    state.config.knock_i_occur = meta["knock_i_occur"]
+    state.knock_o_day = meta["knock_o_day"]
+    state.fixings = dict((int(day), price) for day, price in meta["fixings"])
+    state.GetPaths(state.config.sigma, state.config.risk_free_rate - state.config.basis_rate)
+    return state
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、单标的雪球、凤凰结构的有限差分 PDE 定价引擎，入参与 test_derivx_autocall_snowball、test_derivx_autocall_phoenix 中的 Config 一致，
+#    Config 含付息比率 knock_p_ratio 的按凤凰结构计算，通过 autocall 的 calc_mode_pde 计算方式使用，CalcPayoff、CalcGreeks、CalcCoupon 等接口不变；
+# 2、对数价格均匀网格，未敲入、已敲入两个状态各一组价值，自到期日一次逆推得到全部交易日、全部价格的价值，
+#    逐日敲入在每个交易日收盘将未敲入状态障碍以下部分替换为已敲入状态，敲出、付息在 knock_o_days 收盘按跳跃条件处理；
+# 3、时间方向每个交易日 day_steps 步 Crank-Nicolson，每日收盘跳跃条件之后首步以两个半步隐式 Euler 代替（Rannacher 启动），
+#    系数在同一情景内不变，每日的逆推算子以追赶法预先合成为一个带状矩阵，逆推时每日只做一次带状矩阵乘法；
+# 4、跳跃条件按网格单元位于障碍两侧的比例平滑，计算价格处的价值按四点三次插值，Delta、Gamma 的价格偏移和 Theta 的时间后移直接取自同一次逆推，
+#    Vega、Rho 各情景共用同一网格，只对波动率、利率不同的情景另做逆推；
+# 5、贴现和保证金利息依赖于结束日，按线性分解为若干以不同利率逆推的分量，结果口径与 autocall 的蒙特卡洛引擎一致；
+# 6、凤凰结构 coupon_rate 为单次票息，观察日收盘不低于付息价格即计一次票息，knock_o_observe_pay 为 False 时票息随结束日贴现，
+#    收支现值关于票息的直线同样适用，CalcCoupon 得到单次票息；
+
+# 注意：不支持涨跌停限制，其余暂不支持的参数与 autocall 一致。
+
+import numpy as np
+
+import autocall
+
+grid_nodes = 600 # 对数价格网格节点数
+grid_width = 6.0 # 网格在计算价格和障碍之外延伸的标准差倍数
+day_steps = 4 # 每个交易日时间步数
+band_tolerance = 1e-14 # 每日逆推矩阵截断阈值
+
+# 价值分量，未敲入、已敲入两个状态各一组
+comp_payoff = 0 # 与票息无关的收支
+comp_accrual = 1 # 每单位票息的收支
+comp_finish = 2 # 结束日支付一单位的现值，凤凰结构累计票息在结束日支付时使用
+comp_margin_a = 3 # 保证金利息分解项，见 GetRates
+comp_margin_b = 4
+comp_count = 5
+
+state_out = 0 # 未敲入
+state_in = 1 # 已敲入
+
+def IsPhoenix(config):
+    return hasattr(config, "knock_p_ratio")
+
+def CheckConfig(config):
+    autocall.CheckConfig(config)
+    if config.price_limit_style != 0 and config.price_limit_ratio > 0.0:
+        raise ValueError("PDE 引擎不支持涨跌停限制！")
+
+# 各分量的逆推利率，保证金 margin_rate * (exp(margin_interest * years) - 1) 贴现与否均可写成两个指数项之差，
+# 每项 exp(a * years) 的期望即以利率 -a 逆推、结束日取值为一
+def GetRates(config, disc_rate):
+    rates = np.zeros(comp_count)
+    rates[comp_payoff] = rates[comp_accrual] = rates[comp_finish] = disc_rate if config.discount_payoff == True else 0.0
+    if config.discount_margin == True:
+        rates[comp_margin_a] = disc_rate - config.margin_interest
+        rates[comp_margin_b] = disc_rate
+    else:
+        rates[comp_margin_a] = -config.margin_interest
+    return rates
+
+def MakeGrid(config, scenarios, prices, run_days):
+    sigma = max(scenario[0] for scenario in scenarios)
+    bumped = [autocall.BumpPrice(price, scenario[4], scenario[5]) for scenario in scenarios for price in prices]
+    levels = [config.start_price * rate for rate in config.knock_o_rate] + [config.knock_i_ratio * config.start_price, config.strike_price]
+    if IsPhoenix(config):
+        levels.append(config.knock_p_ratio * config.start_price)
+    years = max(config.runs_step - min(run_days), 1) / float(config.year_days)
+    width = grid_width * sigma * np.sqrt(years)
+    low = np.log(min(min(bumped), min(levels))) - width
+    high = np.log(max(max(bumped), max(levels))) + width
+    return np.linspace(low, high, grid_nodes)
+
+# 三对角方程组追赶法求解，rhs 每列一个右端项
+def SolveTridiagonal(lower, center, upper, rhs):
+    n = len(center)
+    ratio = [0.0] * n
+    result = np.empty_like(rhs)
+    pivot = center[0]
+    result[0] = rhs[0] / pivot
+    for i in range(1, n):
+        ratio[i - 1] = upper[i - 1] / pivot
+        pivot = center[i] - lower[i] * ratio[i - 1]
+        result[i] = (rhs[i] - lower[i] * result[i - 1]) / pivot
+    for i in range(n - 2, -1, -1):
+        result[i] -= ratio[i] * result[i + 1]
+    return result
+
+# 一个交易日的逆推矩阵，边界节点按价格方向线性外推，消元后内部节点仍为三对角方程组
+def MakeDayOperator(grid, sigma, drift, rate, dt):
+    n = len(grid)
+    h = grid[1] - grid[0]
+    nu = drift - 0.5 * sigma * sigma
+    diffusion = 0.5 * sigma * sigma / (h * h)
+    coef_l, coef_c, coef_u = diffusion - 0.5 * nu / h, -2.0 * diffusion - rate, diffusion + 0.5 * nu / h
+    prices = np.exp(grid)
+    q_l = (prices[0] - prices[1]) / (prices[1] - prices[2])
+    q_u = (prices[-1] - prices[-2]) / (prices[-2] - prices[-3])
+    def Step(values, theta, step):
+        rhs = values[1 : -1] + (1.0 - theta) * step * (coef_l * values[: -2] + coef_c * values[1 : -1] + coef_u * values[2 :])
+        lower = [-theta * step * coef_l] * (n - 2)
+        center = [1.0 - theta * step * coef_c] * (n - 2)
+        upper = [-theta * step * coef_u] * (n - 2)
+        center[0] += lower[0] * (1.0 + q_l)
+        upper[0] -= lower[0] * q_l
+        center[-1] += upper[-1] * (1.0 + q_u)
+        lower[-1] -= upper[-1] * q_u
+        result = np.empty_like(values)
+        result[1 : -1] = SolveTridiagonal(lower, center, upper, rhs)
+        result[0] = (1.0 + q_l) * result[1] - q_l * result[2]
+        result[-1] = (1.0 + q_u) * result[-2] - q_u * result[-3]
+        return result
+    step = dt / day_steps
+    result = np.eye(n)
+    for _ in range(2): # Rannacher 启动
+        result = Step(result, 1.0, 0.5 * step)
+    for _ in range(day_steps - 1):
+        result = Step(result, 0.5, step)
+    return MakeBand(result)
+
+# 逆推矩阵只保留绝对值超过 band_tolerance 的对角带，一日内价格扩散范围有限，带宽远小于节点数
+# 结果第 i 行为矩阵第 i 行第 i - width 至 i + width 列
+def MakeBand(matrix):
+    n = len(matrix)
+    width = 0
+    for k in range(1, n):
+        if max(np.abs(np.diagonal(matrix, k)).max(), np.abs(np.diagonal(matrix, -k)).max()) > band_tolerance:
+            width = k
+    padded = np.zeros((n, n + 2 * width))
+    padded[:, width : width + n] = matrix
+    return padded[np.arange(n)[:, None], np.arange(n)[:, None] + np.arange(2 * width + 1)]
+
+# 各节点以相邻 2 * width + 1 个节点的价值批量做向量内积
+def ApplyBand(band, values):
+    width = (band.shape[1] - 1) // 2
+    n = len(values)
+    padded = np.zeros((n + 2 * width,) + values.shape[1 :])
+    padded[width : width + n] = values
+    windows = np.lib.stride_tricks.as_strided(padded, (n, 2 * width + 1) + padded.shape[1 :], padded.strides[: 1] + padded.strides, writeable = False) # [节点, 相邻节点, 列]，不复制数据
+    return np.matmul(band[:, None, :], windows)[:, 0, :]
+
+# 网格节点的跳跃条件权重，按网格单元 [x - h/2, x + h/2] 位于 level 以上（upper 为 True）或以下的比例平滑
+def GridWeights(grid):
+    h = grid[1] - grid[0]
+    def Weights(level, upper):
+        above = np.clip((grid + 0.5 * h - np.log(level)) / h, 0.0, 1.0)[:, None]
+        return above if upper == True else 1.0 - above
+    return Weights
+
+# 计算价格的跳跃条件权重，与蒙特卡洛引擎一样按价格精确比较
+def PointWeights(prices):
+    def Weights(level, upper):
+        return ((prices >= level) if upper == True else (prices <= level)).astype(float)[:, None]
+    return Weights
+
+# 结束时各分量取值，延后清算天数按各分量利率贴现
+def FinishValues(config, rates, payoff, accrual):
+    values = np.zeros((len(payoff), comp_count))
+    values[:, comp_payoff] = payoff
+    values[:, comp_accrual] = accrual
+    values[:, comp_finish :] = 1.0
+    return values * np.exp(-rates * config.extend_end_days / float(config.year_days))
+
+# 到期日收盘观察前的价值，[节点, 状态, 分量]
+def MakeTerminal(config, grid, rates):
+    year_days = float(config.year_days)
+    end_day = config.runs_step + config.extend_end_days
+    prices = np.exp(grid)
+    loss = config.knock_i_participate * np.minimum(prices - config.strike_price, 0.0) / config.start_price
+    loss = np.maximum(loss, -config.knock_i_max_loss)
+    zeros = np.zeros(len(grid))
+    values = np.empty((len(grid), 2, comp_count))
+    if IsPhoenix(config):
+        values[:, state_out] = FinishValues(config, rates, zeros, zeros)
+    elif getattr(config, "ukiuko_coupon_use", False) == True:
+        keep_fixed = config.ukiuko_coupon * (end_day / year_days if config.ukiuko_coupon_ann == True else 1.0)
+        values[:, state_out] = FinishValues(config, rates, zeros + keep_fixed, zeros)
+    else:
+        values[:, state_out] = FinishValues(config, rates, zeros, zeros + end_day / year_days)
+    values[:, state_in] = FinishValues(config, rates, loss, zeros)
+    return values
+
+# 第 day 个交易日收盘的敲入、敲出和付息观察，原位修改 values，weights 见 GridWeights、PointWeights
+def Observe(config, rates, values, day, weights):
+    knock_i_valid = getattr(config, "knock_i_valid", True) == True # 凤凰结构总有敲入障碍
+    if knock_i_valid == True and (config.knock_i_only_at_end != True or day == config.runs_step):
+        below = weights(config.knock_i_ratio * config.start_price, False)
+        values[:, state_out] += below * (values[:, state_in] - values[:, state_out])
+    knock_o_rates = dict(zip(config.knock_o_days, config.knock_o_rate))
+    if day in knock_o_rates:
+        zeros = np.zeros(len(values))
+        accrual = zeros if IsPhoenix(config) else zeros + (day + config.extend_end_days) / float(config.year_days)
+        above = weights(knock_o_rates[day] * config.start_price, True)[:, :, None]
+        values += above * (FinishValues(config, rates, zeros, accrual)[:, None, :] - values)
+        if IsPhoenix(config):
+            above = weights(config.knock_p_ratio * config.start_price, True)
+            paid = 1.0 if getattr(config, "knock_o_observe_pay", False) == True else values[:, :, comp_finish]
+            values[:, :, comp_accrual] += above * paid
+
+# 以 (sigma, drift_rate, disc_rate) 一次逆推，返回 days 中各交易日收盘观察前的价值 {day: [节点, 状态, 分量]}
+# 收盘观察在 CalcValues 中对计算价格逐点进行，计算价格恰在障碍上时结果与蒙特卡洛引擎一致
+def Rollback(config, grid, rates, sigma, drift_rate, days):
+    drift = drift_rate - config.basis_rate
+    dt = 1.0 / config.year_days
+    groups = {}
+    for comp, rate in enumerate(rates):
+        groups.setdefault(rate, []).append(comp)
+    bands = dict((rate, MakeDayOperator(grid, sigma, drift, rate, dt)) for rate in groups)
+    weights = GridWeights(grid)
+    values = MakeTerminal(config, grid, rates)
+    n = len(grid)
+    result = {}
+    for day in range(config.runs_step, min(days) - 1, -1):
+        if day < config.runs_step:
+            for rate, comps in groups.items():
+                values[:, :, comps] = ApplyBand(bands[rate], values[:, :, comps].reshape(n, -1)).reshape(n, 2, len(comps))
+        if day in days:
+            result[day] = values.copy()
+        Observe(config, rates, values, day, weights)
+    return result
+
+# 均匀网格四点三次插值，values 首维为节点
+def Interpolate(grid, values, x):
+    h = grid[1] - grid[0]
+    i = np.clip(np.floor((x - grid[0]) / h).astype(int), 1, len(grid) - 3)
+    t = ((x - grid[0]) / h - i).reshape((-1,) + (1,) * (values.ndim - 1))
+    return (-t * (t - 1.0) * (t - 2.0) / 6.0 * values[i - 1] + (t + 1.0) * (t - 1.0) * (t - 2.0) / 2.0 * values[i]
+            - (t + 1.0) * t * (t - 2.0) / 2.0 * values[i + 1] + (t + 1.0) * t * (t - 1.0) / 6.0 * values[i + 2])
+
+# 与 autocall.CalcValues 结果格式一致，返回 [情景, 价格, 天数] 收支现值，coupon_rate 为 None 时返回收支现值关于票息的直线
+def CalcValues(config, scenarios, prices, run_days, coupon_rate):
+    CheckConfig(config)
+    prices = np.asarray(prices, dtype = float)
+    values = np.zeros((len(scenarios), len(prices), len(run_days)) + ((2,) if coupon_rate is None else ()))
+    grid = MakeGrid(config, scenarios, prices, run_days)
+    state = state_in if config.knock_i_occur == True else state_out
+    groups = {}
+    for index, scenario in enumerate(scenarios):
+        groups.setdefault(scenario[0 : 3], []).append(index)
+    for (sigma, drift_rate, disc_rate), indexes in groups.items():
+        rates = GetRates(config, disc_rate)
+        offsets = {}
+        for index in indexes:
+            for run_day in run_days:
+                offsets[(index, run_day)] = autocall.GetOffset(config, run_day + scenarios[index][3])
+        solved = Rollback(config, grid, rates, sigma, drift_rate, set(fixed for fixed, _ in offsets.values()))
+        for index in indexes:
+            _, _, _, _, bump_mode, bump_size = scenarios[index]
+            bumped = autocall.BumpPrice(prices, bump_mode, bump_size)
+            for i, run_day in enumerate(run_days):
+                fixed, first = offsets[(index, run_day)]
+                comps = Interpolate(grid, solved[fixed], np.log(bumped))
+                if first == 0: # 已收盘，当日收盘价即计算价格
+                    Observe(config, rates, comps, fixed, PointWeights(bumped))
+                comps = comps[:, state]
+                value = comps[:, comp_payoff] - config.margin_rate * (comps[:, comp_margin_a] - comps[:, comp_margin_b])
+                if coupon_rate is None:
+                    value = np.stack((value, comps[:, comp_accrual]), axis = -1)
+                else:
+                    value = value + coupon_rate * comps[:, comp_accrual]
+                values[index, :, i] = value if config.trade_long == True else -value
+    return values
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、雪球平滑估计蒙特卡洛引擎，通过 autocall 的 calc_mode_smooth 计算方式使用，只模拟敲出观察日和到期日，
+#    各计算价格的路径在未敲出条件下各自抽样，不能按价格缩放，每条路径的计算量随计算价格数量增长，主要用于希腊值计算；
+# 2、敲出观察日按一步存活抽样：由上一模拟步解析计算当日未敲出概率，敲出收支按概率计入，路径在未敲出条件下抽样继续，
+#    观察日之间的逐日敲入按布朗桥穿越概率（离散观察修正）计入，各路径收支现值对计算价格和波动率连续，障碍处没有跳跃；
+# 3、Delta、Vega 按路径导数计算，随模拟步递推价格、未敲出概率和未敲入概率对 log 价格、波动率的导数，不做价格、波动率偏移；
+# 4、Gamma 在障碍处导数不连续，按首段似然比与首段敲入概率的路径导数混合估计，以同批路径均值为基准降低方差，
+#    首段为估值日至首个模拟步，敲出观察日前一两天估值时首段很短，噪声随之增加；
+#    估值日未收盘时首段起点不是敲入观察日，首个观察日价格在首段内按布朗桥条件分布解析积分，起点略低于障碍时不视为已敲入，
+#    首段只有一天时敲入在首段终点不连续，Delta 同样改按首段似然比估计，无偏但噪声大于路径导数；
+# 5、CalcGreeksMulti 中 Delta、Gamma、Vega 由估计量直接得到，Theta、Rho 和收益曲面仍按差分情景在同一组随机数据上计算，全部结果来自一次模拟；
+
+# 注意：不支持只在到期日观察敲入和涨跌停限制，与逐日方式相比有很小的离散化偏差，其余暂不支持的参数与 autocall 一致。
+
+import numpy as np
+
+import sobol
+import autocall
+import pathgen
+import vanilla_european
+
+estimate_greeks = ("d", "g", "v") # 由估计量直接得到的希腊值
+survive_floor = 1e-12 # 未敲出概率低于此值时按此值抽样，此后路径权重可忽略
+survive_exponent = 700.0 # FirstSurvive 中指数项的上限，避免远低于障碍时溢出
+
+def CheckConfig(config):
+    autocall.CheckConfig(config)
+    if config.knock_i_valid == True and config.knock_i_occur != True and config.knock_i_only_at_end == True:
+        raise ValueError("平滑估计方式不支持只在到期日观察敲入！")
+    if config.price_limit_style != 0 and config.price_limit_ratio > 0.0:
+        raise ValueError("平滑估计方式不支持涨跌停限制！")
+
+# 模拟步，敲出观察日和到期日，以距 fixed 的步数计，首个敲入观察日不单独模拟，首段尽量长以降低似然比估计的方差，
+# 估值日未收盘时首个敲入观察日由 FirstSurvive 在首段内解析计入
+def GetGridCols(config, fixed, first):
+    cols = config.runs_step - fixed
+    grid = set(day - fixed for day in config.knock_o_days if first <= day - fixed <= cols and day - fixed > 0)
+    if cols > 0:
+        grid.add(cols)
+    return sorted(grid)
+
+# 估值日未收盘时首段起点不是观察日，不能按平移障碍计算起点处的穿越，首段 days 天的首个观察日价格在两端之间按布朗桥条件分布解析积分，
+# 该日按实际障碍观察，其后按平移障碍 level 的穿越概率计入，返回首段未敲入概率及其对起点 x0、终点 x1、波动率的偏导数和对起点的二阶偏导数
+def FirstSurvive(x0, x1, days, log_barrier, level, level_s, sigma, dt):
+    zeros = np.zeros(np.broadcast(x0, x1).shape)
+    if days < 2: # 首段只有终点一个观察日
+        return (x1 > log_barrier) + zeros, zeros, zeros, zeros, zeros
+    width = sigma * np.sqrt(dt * (days - 1) * days)
+    ratio = 2.0 / (sigma * sigma * days * dt)
+    a, c = x0 - level, x1 - level
+    inside = c > 0.0
+    d1 = ((days - 1) * x0 + x1 - days * log_barrier) / width
+    d2 = d1 - 2.0 * c / width
+    exponent = -ratio * a * c
+    density_1 = vanilla_european.NormPdf(d1)
+    density_2 = vanilla_european.one_sqrt_2pi * np.exp(np.minimum(exponent - 0.5 * d2 * d2, survive_exponent))
+    tail = np.exp(np.minimum(exponent, survive_exponent)) * vanilla_european.NormCdf(d2)
+    slope = (days - 1) / width
+    exponent_a = -ratio * c
+    exponent_s = -2.0 * exponent / sigma + ratio * level_s * (a + c)
+    survive = vanilla_european.NormCdf(d1) - tail
+    survive_a = slope * (density_1 - density_2) - exponent_a * tail
+    survive_c = (density_1 + density_2) / width + ratio * a * tail
+    survive_s = -density_1 * d1 / sigma - exponent_s * tail + density_2 * (d2 / sigma - 2.0 * level_s / width)
+    survive_aa = slope * slope * (d2 * density_2 - d1 * density_1) - 2.0 * slope * exponent_a * density_2 - exponent_a * exponent_a * tail
+    return tuple(np.where(inside, item, 0.0) for item in (np.maximum(survive, 0.0), survive_a, survive_c, survive_s, survive_aa))
+
+# 敲入亏损对到期 log 价格的导数，只含与票息无关的部分
+def LossSlope(config, price_end, fixed, disc_rate):
+    start_price = config.start_price
+    loss = config.knock_i_participate * (price_end - config.strike_price) / start_price
+    slope = np.where((price_end < config.strike_price) & (loss > -config.knock_i_max_loss), config.knock_i_participate * price_end / start_price, 0.0)
+    if config.discount_payoff == True:
+        years = (config.runs_step + config.extend_end_days - fixed) / float(config.year_days)
+        slope = slope * np.exp(-disc_rate * years)
+    return slope if config.trade_long == True else -slope
+
+# 各路径收支现值之和，结果为 [价格, 2]，末维与 SettleSnowball 的直线一致，uniforms 第 k 列用于第 k 段
+# derive 为 True 时另返回对 log 价格的路径导数、对 log 价格二阶导数的估计量和对波动率的路径导数之和，形状相同
+def EvalSmooth(config, uniforms, grid_cols, prices, fixed, first, disc_rate, sigma, drift, derive = False):
+    count = uniforms.shape[0]
+    year_days = float(config.year_days)
+    start_price = config.start_price
+    end_day = float(config.runs_step + config.extend_end_days)
+    x0 = np.log(np.asarray(prices, dtype = float))
+    shape = (count, len(x0))
+    knock_o_rate = dict(zip(config.knock_o_days, config.knock_o_rate))
+    def Settle(day):
+        return autocall.SettleSnowball(config, True, float(day + config.extend_end_days), 0.0, 0.0, fixed, disc_rate, None)
+    def Sum(weight, payoff):
+        return weight.sum(axis = 0)[:, None] * payoff
+
+    # 逐日敲入按向外平移的连续障碍计算穿越概率，level_s 为平移后障碍对波动率的导数
+    knock_i_check = config.knock_i_valid == True and config.knock_i_occur != True
+    log_barrier = np.log(config.knock_i_ratio * start_price)
+    level_s = -autocall.bridge_beta * np.sqrt(1.0 / year_days)
+    level = log_barrier + level_s * sigma
+
+    value = np.zeros((len(x0), 2))
+    alive = np.ones(shape) # 未敲出概率
+    no_ki = np.zeros(shape) if config.knock_i_occur == True else np.ones(shape) # 未敲入概率
+    if knock_i_check == True and first == 0:
+        no_ki[:, x0 <= log_barrier] = 0.0
+    if first == 0 and fixed in knock_o_rate: # 已收盘，当日收盘价即计算价格
+        hit = x0 >= np.log(knock_o_rate[fixed] * start_price)
+        value[hit] = count * Settle(fixed)
+        alive[:, hit] = 0.0
+    x = np.repeat(x0[None, :], count, axis = 0)
+
+    # 导数以 _x、_s 后缀表示对 log 价格、波动率的导数
+    zeros = np.zeros(shape)
+    x_x, x_s = np.ones(shape), zeros
+    alive_x, alive_s = zeros, zeros
+    no_ki_x, no_ki_s = zeros, zeros
+    value_x, value_s = np.zeros((len(x0), 2)), np.zeros((len(x0), 2))
+    no_ki_rest = no_ki # 不含首段的未敲入概率
+    cross_1x, cross_1xx = zeros, zeros # 首段终点不变时首段穿越概率对 log 价格的一阶、二阶导数
+    alive_0 = alive[0]
+    rest, rest_w = np.zeros((len(x0), 2)), np.zeros((len(x0), 2)) # 首段之后的收支及其乘以似然比权重之和
+    rest_w1 = np.zeros((len(x0), 2)) # 首段之后的收支乘以一阶似然比权重之和
+    endpoint_ki = knock_i_check == True and first == 1 and len(grid_cols) > 0 and grid_cols[0] == 1 # 首段只有终点一个敲入观察日
+
+    prev = 0
+    for k, col in enumerate(grid_cols):
+        span = (col - prev) / year_days
+        scale = sigma * np.sqrt(span)
+        mean = x + (drift - 0.5 * sigma * sigma) * span
+        u = uniforms[:, k : k + 1]
+        day = fixed + col
+        knock_o_day = day in knock_o_rate
+        if knock_o_day == True:
+            dist = (np.log(knock_o_rate[day] * start_price) - mean) / scale
+            survive = vanilla_european.NormCdf(dist)
+            payoff = Settle(day)
+            knock_o = alive * (1.0 - survive)
+            value += Sum(knock_o, payoff)
+            normal = sobol.NormInv(np.maximum(u * survive, survive_floor)) # 未敲出条件下抽样
+        else:
+            survive = 1.0
+            normal = np.repeat(sobol.NormInv(u), len(x0), axis = 1)
+        x_next = mean + scale * normal
+        if derive == True:
+            mean_x, mean_s = x_x, x_s - sigma * span
+            if k == 0:
+                first_scale, first_normal = scale, normal
+                weight = normal / scale
+                weight = weight * weight - 1.0 / (scale * scale) # 首段似然比二阶权重
+                weight_1 = normal / scale # 首段似然比一阶权重
+                first_payoff = payoff if knock_o_day == True else None
+                first_dist = dist[0] if knock_o_day == True else None
+                first_survive = survive[0] if knock_o_day == True else 1.0
+            elif knock_o_day == True:
+                rest += Sum(knock_o, payoff)
+                rest_w += Sum(knock_o * weight, payoff)
+                rest_w1 += Sum(knock_o * weight_1, payoff)
+            if knock_o_day == True:
+                density = vanilla_european.NormPdf(dist)
+                survive_x = -density * mean_x / scale
+                survive_s = -density * (mean_s + dist * np.sqrt(span)) / scale
+                value_x += Sum(alive_x * (1.0 - survive) - alive * survive_x, payoff)
+                value_s += Sum(alive_s * (1.0 - survive) - alive * survive_s, payoff)
+                factor = np.where(u * survive > survive_floor, u / vanilla_european.NormPdf(normal), 0.0)
+                x_next_x = mean_x + scale * factor * survive_x
+                x_next_s = mean_s + np.sqrt(span) * normal + scale * factor * survive_s
+            else:
+                survive_x, survive_s = 0.0, 0.0
+                x_next_x = mean_x
+                x_next_s = mean_s + np.sqrt(span) * normal
+        if knock_i_check == True and k == 0 and first == 1:
+            survive_ki, survive_a, survive_c, survive_ks, survive_aa = FirstSurvive(x, x_next, col, log_barrier, level, level_s, sigma, 1.0 / year_days)
+            cross = 1.0 - survive_ki
+            if derive == True:
+                cross_x = -(survive_a * x_x + survive_c * x_next_x)
+                cross_s = -(survive_a * x_s + survive_c * x_next_s + survive_ks)
+                no_ki_x, no_ki_s = no_ki_x * (1.0 - cross) - no_ki * cross_x, no_ki_s * (1.0 - cross) - no_ki * cross_s
+                cross_1x, cross_1xx = -survive_a, -survive_aa
+            no_ki = no_ki * (1.0 - cross)
+        elif knock_i_check == True:
+            a, c = x - level, x_next - level
+            inside = (a > 0.0) & (c > 0.0)
+            ratio = 2.0 / (scale * scale)
+            cross = np.where(inside, np.exp(-ratio * np.maximum(a, 0.0) * np.maximum(c, 0.0)), 1.0)
+            if derive == True:
+                cross_x = np.where(inside, -ratio * cross * (x_x * c + a * x_next_x), 0.0)
+                cross_s = np.where(inside, -ratio * cross * ((x_s - level_s) * c + a * (x_next_s - level_s) - 2.0 * a * c / sigma), 0.0)
+                no_ki_x, no_ki_s = no_ki_x * (1.0 - cross) - no_ki * cross_x, no_ki_s * (1.0 - cross) - no_ki * cross_s
+                if k == 0:
+                    cross_1x = np.where(inside, -ratio * c * cross, 0.0)
+                    cross_1xx = np.where(inside, (ratio * c) ** 2 * cross, 0.0)
+                else:
+                    no_ki_rest = no_ki_rest * (1.0 - cross)
+            no_ki = no_ki * (1.0 - cross)
+        if derive == True:
+            alive_x, alive_s = alive_x * survive + alive * survive_x, alive_s * survive + alive * survive_s
+            x_x, x_s = x_next_x, x_next_s
+        alive = alive * survive
+        x = x_next
+        prev = col
+
+    price_end = np.exp(x)
+    keep = autocall.SettleSnowball(config, False, end_day, 0.0, price_end, fixed, disc_rate, None)
+    loss = autocall.SettleSnowball(config, False, end_day, 1.0, price_end, fixed, disc_rate, None)
+    gap = loss - keep
+    end = alive[:, :, None] * (keep + (1.0 - no_ki)[:, :, None] * gap)
+    value += end.sum(axis = 0)
+    if derive != True:
+        return value
+
+    # 到期 log 价格的导数只影响敲入亏损
+    slope = (1.0 - no_ki) * LossSlope(config, price_end, fixed, disc_rate)
+    value_x += (alive_x[:, :, None] * (keep + (1.0 - no_ki)[:, :, None] * gap) - (alive * no_ki_x)[:, :, None] * gap).sum(axis = 0)
+    value_x[:, 0] += (alive * slope * x_x).sum(axis = 0)
+    value_s += (alive_s[:, :, None] * (keep + (1.0 - no_ki)[:, :, None] * gap) - (alive * no_ki_s)[:, :, None] * gap).sum(axis = 0)
+    value_s[:, 0] += (alive * slope * x_s).sum(axis = 0)
+    if len(grid_cols) == 0: # 已到期，收支由计算价格直接确定
+        second = np.zeros((len(x0), 2))
+        second[:, 0] = (alive * slope).sum(axis = 0)
+        return value, value_x, second, value_s
+
+    # 首段终点的密度对 log 价格求导得到似然比权重，首段敲入概率在终点不变时仍依赖 log 价格，按路径导数计入
+    # 首段之后的收支减去同批均值 base 后再乘以权重，均值部分的贡献由首段未敲出概率的二阶导数解析计入
+    rest += end.sum(axis = 0)
+    rest_w += (end * weight[:, :, None]).sum(axis = 0)
+    base = rest / count
+    second = rest_w - base * weight.sum(axis = 0)[:, None]
+    first_w = first_normal / first_scale
+    second += ((alive * no_ki_rest)[:, :, None] * gap * (2.0 * first_w * cross_1x + cross_1xx)[:, :, None]).sum(axis = 0)
+    if first_payoff is not None:
+        curve = first_dist * vanilla_european.NormPdf(first_dist) / (first_scale * first_scale)
+        second += count * curve[:, None] * (alive_0[:, None] * first_payoff - base / np.maximum(first_survive, survive_floor)[:, None])
+    # 首段只有终点一个敲入观察日时敲入在首段终点不连续，路径导数不含障碍处的跳跃，Delta 改按首段似然比估计
+    if endpoint_ki == True:
+        rest_w1 += (end * weight_1[:, :, None]).sum(axis = 0)
+        value_x = rest_w1 - base * weight_1.sum(axis = 0)[:, None]
+        if first_payoff is not None:
+            value_x += count * (vanilla_european.NormPdf(first_dist) / first_scale)[:, None] * (first_payoff - base / np.maximum(first_survive, survive_floor)[:, None])
+    return value, value_x, second, value_s
+
+# 所有情景在同一组随机数据上计算，返回值与 autocall.CalcValues 一致
+# greeks 为 estimate_greeks 中的希腊值标识序列时另返回 {希腊值: [价格, 天数]}，按第一个情景（即 autocall.MakeScenario(config)）估计
+def CalcValues(config, scenarios, prices, run_days, coupon_rate, greeks = None):
+    CheckConfig(config)
+    prices = np.asarray(prices, dtype = float)
+    derive = greeks is not None and len(greeks) > 0
+    values = np.zeros((len(scenarios), len(prices), len(run_days), 2))
+    derivs = np.zeros((3, len(prices), len(run_days), 2)) # 一阶、二阶 log 价格导数和波动率导数
+    grid_size = len(config.knock_o_days) + 1
+    for path_from in range(0, config.runs_size, autocall.calc_chunk_rows):
+        path_to = min(path_from + autocall.calc_chunk_rows, config.runs_size)
+        uniforms = vanilla_european.NormCdf(pathgen.MakeNormals(config, path_from, path_to, grid_size, bridge = False, narrow = True))
+        for index, scenario in enumerate(scenarios):
+            sigma, drift_rate, disc_rate, day_shift, bump_mode, bump_size = scenario
+            bumped = autocall.BumpPrice(prices, bump_mode, bump_size)
+            for i, run_day in enumerate(run_days):
+                fixed, first = autocall.GetOffset(config, run_day + day_shift)
+                grid_cols = GetGridCols(config, fixed, first)
+                drift = drift_rate - config.basis_rate
+                if derive == True and index == 0:
+                    result = EvalSmooth(config, uniforms, grid_cols, bumped, fixed, first, disc_rate, sigma, drift, True)
+                    for j in range(3):
+                        derivs[j, :, i] += result[j + 1]
+                    result = result[0]
+                else:
+                    result = EvalSmooth(config, uniforms, grid_cols, bumped, fixed, first, disc_rate, sigma, drift)
+                values[index, :, i] += result
+    values /= config.runs_size
+    derivs /= config.runs_size
+    if coupon_rate is not None:
+        values = values[..., 0] + coupon_rate * values[..., 1]
+        derivs = derivs[..., 0] + coupon_rate * derivs[..., 1]
+    if derive != True:
+        return values
+    # 由 log 价格导数换算为价格导数，Vega 与 autocall.CombineGreek 一致按波动率变动 1% 计
+    scale = prices.reshape((-1, 1) + (1,) * (derivs.ndim - 3))
+    estimates = {"d": derivs[0] / scale, "g": (derivs[1] - derivs[0]) / (scale * scale), "v": derivs[2] / 100.0}
+    for greek in greeks:
+        if greek not in estimate_greeks:
+            raise ValueError("平滑估计方式不能直接估计该希腊值：%s" % greek)
+    return values, dict((greek, estimates[greek]) for greek in greeks)
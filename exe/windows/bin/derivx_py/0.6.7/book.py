@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、交易组合批量估值，CalcBook 接收多笔交易的 Config 列表，按模拟参数分组，每组只生成一次随机数据和路径，组内全部交易的收支在同一组路径上计算；
+# 2、模拟参数见 MakeSimKey：随机数据参数、路径数量、价格变动步数、年化天数、波动率、无风险利率、基差、涨跌停限制，
+#    启用布朗桥时还包括布朗桥的观察步，同一标的、同一期限结构的交易通常落在同一组，几千笔交易只需几十次模拟；
+# 3、组内各交易的结果与逐笔调用 autocall.CalcGreeksMulti（calc_mode_scaled）完全一致，希腊值的差分情景仍按各交易自己的差分设置，
+#    波动率、利率偏移情景的路径在组内按 (波动率, 漂移利率) 共用，价格偏移和 Theta 情景直接在同一组比率路径上计算；
+# 4、结果按输入顺序逐笔返回，每笔为 {希腊值标识: 结果} 字典，格式与 autocall.CalcGreeksMulti 一致；
+# 5、凤凰结构逐笔按 autocall.calc_mode_pde 计算，不参与分组；
+
+# 注意：CalcBook 只支持雪球和凤凰结构（目前只有二者有 NumPy 引擎），障碍、累计、气囊、彩虹、阶梯票息等交易不在支持范围内，
+#      需使用对应插件计算，组合中含有此类交易时整个组合抛出 ValueError 异常，雪球暂不支持的参数与 autocall 一致。
+
+import numpy as np
+
+import autocall
+import pathgen
+import autocall_pde
+
+product_snowball = 1
+product_phoenix = 2
+
+# 由 Config 的参数判断产品类型，没有 NumPy 引擎的产品返回 None
+def GetProduct(config):
+    if autocall_pde.IsPhoenix(config):
+        return product_phoenix
+    if not hasattr(config, "knock_o_days") or not hasattr(config, "knock_i_ratio"):
+        return None # 障碍、累计、固定票息等
+    for name in ["asset_size", "knock_i_days", "rise_lever"]: # 彩虹、巴黎、增强
+        if hasattr(config, name):
+            return None
+    coupon_rate = getattr(config, "coupon_rate", None)
+    if coupon_rate is None or np.ndim(coupon_rate) > 0: # 气囊等没有票息，阶梯票息
+        return None
+    return product_snowball
+
+# 模拟参数，相同的交易使用同一组随机数据和比率路径
+def MakeSimKey(config):
+    key = (tuple(int(seed) for seed in config.rand_seed), int(config.rand_rows), int(config.rand_cols),
+           config.rand_quasi == True, config.dual_smooth == True, int(config.runs_size), int(config.runs_step),
+           float(config.year_days), float(config.sigma), float(config.risk_free_rate), float(config.basis_rate),
+           float(config.price_limit_ratio), int(config.price_limit_style))
+    if getattr(config, "brownian_bridge", False) == True:
+        key += (tuple(pathgen.GetObserveSteps(config)),) # 布朗桥构造与观察步有关
+    return key
+
+# 雪球交易按模拟参数分组，返回 {模拟参数: [交易序号]}
+def GroupBook(configs):
+    unsupported = [index for index, config in enumerate(configs) if GetProduct(config) is None]
+    if len(unsupported) > 0:
+        raise ValueError("组合中以下交易暂无 NumPy 引擎，需使用对应插件计算：%s" % ", ".join(str(index) for index in unsupported))
+    groups = {}
+    for index, config in enumerate(configs):
+        if GetProduct(config) == product_snowball:
+            groups.setdefault(MakeSimKey(config), []).append(index)
+    return groups
+
+# 一组交易在同一组随机数据上计算，trades 为 {交易序号: (情景列表, 收支现值, 票息直线)}，结果累加到 trades 中
+def CalcGroup(configs, indexes, trades):
+    head = configs[indexes[0]]
+    year_days = float(head.year_days)
+    for path_from in range(0, head.runs_size, autocall.calc_chunk_rows):
+        path_to = min(path_from + autocall.calc_chunk_rows, head.runs_size)
+        normals = pathgen.MakeNormals(head, path_from, path_to)
+        paths = {}
+        def GetRatios(sigma, drift):
+            if (sigma, drift) not in paths:
+                paths[(sigma, drift)] = pathgen.MakeRatioPaths(normals, sigma, drift, 1.0 / year_days, head.price_limit_ratio, head.price_limit_style)
+            return paths[(sigma, drift)]
+        for index in indexes:
+            config = configs[index]
+            scenarios, values, line = trades[index]
+            for j, (sigma, drift_rate, disc_rate, day_shift, bump_mode, bump_size) in enumerate(scenarios):
+                ratios = GetRatios(sigma, drift_rate - config.basis_rate)
+                bumped = [autocall.BumpPrice(price, bump_mode, bump_size) for price in config.calc_price]
+                for i, run_day in enumerate(autocall.GetRunDays(config)):
+                    fixed, first = autocall.GetOffset(config, run_day + day_shift)
+                    cols = config.runs_step - fixed
+                    values[j, :, i] += autocall.EvalSnowballScaled(config, ratios[:, : cols], bumped, fixed, first, disc_rate, config.coupon_rate).sum(axis = 0)
+            if line is not None:
+                ratios = GetRatios(config.sigma, config.risk_free_rate - config.basis_rate)
+                fixed, first = autocall.GetOffset(config, config.run_from)
+                cols = config.runs_step - fixed
+                line += autocall.EvalSnowballScaled(config, ratios[:, : cols], [config.start_price], fixed, first, config.risk_free_rate, None).sum(axis = (0, 1))
+
+# 组合批量估值，greeks 含义与 autocall.CalcGreeksMulti 一致，返回与 configs 顺序一致的结果列表
+def CalcBook(configs, greeks = ("p",)):
+    groups = GroupBook(configs)
+    results = [None] * len(configs)
+    trades, plans = {}, {}
+    for index, config in enumerate(configs):
+        if GetProduct(config) == product_phoenix:
+            results[index] = autocall.CalcGreeksMulti(config, greeks, autocall.calc_mode_pde)
+            continue
+        autocall.CheckConfig(config)
+        scenarios, plans[index] = autocall.PlanGreeks(config, greeks)
+        values = np.zeros((len(scenarios), len(config.calc_price), config.run_days))
+        trades[index] = (scenarios, values, np.zeros(2) if "c" in greeks else None)
+    for indexes in groups.values():
+        CalcGroup(configs, indexes, trades)
+    for index, (scenarios, values, line) in trades.items():
+        config = configs[index]
+        values = values / config.runs_size
+        result = {}
+        for greek in greeks:
+            if greek == "p":
+                result[greek] = autocall.ToSurface(config, values[0])
+            elif greek == "c":
+                line = line / config.runs_size
+                result[greek] = float(autocall.SolveCoupon({"intercept": line[0], "slope": line[1]}))
+            else:
+                bumps = [values[k] for k in plans[index][greek]]
+                result[greek] = autocall.ToSurface(config, autocall.CombineGreek(config, greek, values[0], bumps))
+        results[index] = result
+    return results
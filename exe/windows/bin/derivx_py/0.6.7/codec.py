@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、任务结果的二进制数组编码和解码，替代 JSON 嵌套列表传输收益曲面、希腊值曲面等大矩阵；
+# 2、解码时直接在原缓冲区上构建 NumPy 数组，不做数据拷贝；
+# 3、结果数据不是二进制数组格式时按 JSON 格式解析，保持与原有插件结果兼容；
+# 4、二进制数组格式只在本目录的 Python 代码之间使用（如 PackResult、remotepool 的分块结果），与插件参数的 serialize_type 无关；
+
+# 二进制数组格式（小端）：
+# 头部 16 字节：标识 "DXND"(4) + 版本(1) + 类型码(1) + 维数(1) + 保留(1) + 数据字节数(8)
+# 维度信息：维数 * 8 字节，无符号整数
+# 数据区：起始位置按 8 字节对齐，C 连续存储
+
+import json
+import struct
+
+import numpy as np
+
+codec_magic = b"DXND" # 格式标识
+codec_version = 1 # 格式版本
+
+result_json = 0 # 结果数据格式，JSON
+result_ndarray = 1 # 结果数据格式，二进制数组
+
+head_format = "<4sBBBBQ" # 头部格式
+head_length = struct.calcsize(head_format) # 头部长度
+
+# 数据类型码
+dtype_float64 = 1
+dtype_float32 = 2
+dtype_int64 = 3
+dtype_int32 = 4
+dtype_uint8 = 5
+
+dtype_codes = {
+    dtype_float64: np.dtype("<f8"),
+    dtype_float32: np.dtype("<f4"),
+    dtype_int64: np.dtype("<i8"),
+    dtype_int32: np.dtype("<i4"),
+    dtype_uint8: np.dtype("u1")
+}
+
+def GetDataOffset(ndim):
+    offset = head_length + ndim * 8
+    return (offset + 7) // 8 * 8 # 8 字节对齐
+
+def GetDtypeCode(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.byteorder == ">":
+        dtype = dtype.newbyteorder("<")
+    for code, item in dtype_codes.items():
+        if item == dtype:
+            return code
+    raise ValueError("不支持的数组数据类型：%s" % dtype)
+
+def PackHead(shape, dtype = np.float64):
+    code = GetDtypeCode(dtype)
+    shape = tuple(int(n) for n in shape)
+    nbytes = int(np.prod(shape, dtype = np.int64)) * dtype_codes[code].itemsize
+    offset = GetDataOffset(len(shape))
+    head = bytearray(offset)
+    struct.pack_into(head_format, head, 0, codec_magic, codec_version, code, len(shape), 0, nbytes)
+    struct.pack_into("<%dQ" % len(shape), head, head_length, *shape)
+    return bytes(head)
+
+def UnpackHead(buffer):
+    view = memoryview(buffer).cast("B")
+    if len(view) < head_length:
+        raise ValueError("二进制数组数据长度不足！%d" % len(view))
+    magic, version, code, ndim, _, nbytes = struct.unpack_from(head_format, view, 0)
+    if magic != codec_magic:
+        raise ValueError("二进制数组数据标识错误！%s" % magic)
+    if version != codec_version:
+        raise ValueError("二进制数组数据版本不支持！%d" % version)
+    if code not in dtype_codes:
+        raise ValueError("二进制数组数据类型不支持！%d" % code)
+    shape = struct.unpack_from("<%dQ" % ndim, view, head_length)
+    return dtype_codes[code], shape, GetDataOffset(ndim), nbytes
+
+def IsPacked(data):
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        return False
+    view = memoryview(data).cast("B")
+    return len(view) >= head_length and bytes(view[:4]) == codec_magic
+
+def PackArray(array, dtype = np.float64):
+    array = np.ascontiguousarray(array, dtype = np.dtype(dtype).newbyteorder("<"))
+    return PackHead(array.shape, array.dtype) + array.tobytes()
+
+def UnpackArray(buffer):
+    dtype, shape, offset, nbytes = UnpackHead(buffer)
+    length = memoryview(buffer).nbytes
+    if length < offset + nbytes:
+        raise ValueError("二进制数组数据不完整！%d < %d" % (length, offset + nbytes))
+    count = nbytes // dtype.itemsize
+    return np.frombuffer(buffer, dtype = dtype, count = count, offset = offset).reshape(shape) # 不拷贝数据
+
+def PackResult(result_data, result_format = result_json):
+    if result_format == result_ndarray:
+        return PackArray(result_data)
+    if isinstance(result_data, np.ndarray):
+        result_data = result_data.tolist()
+    return json.dumps(result_data)
+
+def ParseResult(result):
+    result_data = result["result_data"] if isinstance(result, dict) else result
+    if isinstance(result_data, np.ndarray):
+        return result_data # 如 remotepool 分块结果
+    if IsPacked(result_data):
+        return UnpackArray(result_data)
+    if isinstance(result_data, (bytes, bytearray, memoryview)):
+        result_data = bytes(result_data).decode("utf-8")
+    if isinstance(result_data, str):
+        result_data = json.loads(result_data)
+    if isinstance(result_data, list):
+        return np.array(result_data)
+    return result_data # 标量或字典等按 JSON 结果原样返回
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、多进程本地任务执行器，cyberx.Kernel 每个进程全局唯一，ProcessExecutor 启动 workers 个工作进程，每个进程各自持有 Kernel 和已导入的模块，
+#    一个驱动进程即可同时使用全部 CPU 核心，不必运行多个独立脚本；
+# 2、任务可为 tasker.Tasker、Tasker.ToArgs() 参数字典或可调用对象，前两者在工作进程中以 kernel.AssignTask 同步执行，返回原始结果字典，
+#    可调用对象直接在工作进程中调用，如 autocall.CalcGreeksMulti 等 NumPy 引擎函数，需为可按模块导入的函数；
+# 3、Submit 返回 concurrent.futures.Future，Map 按输入顺序逐个返回结果，Future 未开始执行前可以 cancel 取消；
+# 4、任务按 affinity 分片到各工作进程的队列，affinity 相同的任务（如同一标的、同一组随机数据）优先在同一进程执行，便于复用进程内缓存，
+#    未指定时轮流分配；每个工作进程最多预取 prefetch 个任务，自身队列为空时从最长的队列尾部窃取任务，各进程负载不均时不会空闲等待；
+# 5、工作进程中 Kernel 在首个 Tasker 任务时创建，local_cpu_thread 取 kernel_threads，只执行 NumPy 引擎函数时不创建 Kernel；
+# 6、工作进程异常退出时其已分配、未完成的任务以 RuntimeError 结束，队列中其余任务由其他进程窃取执行；
+# 7、任务和结果以 pickle 序列化后在进程间传递，Submit 时不能序列化的任务（如 lambda）直接抛出 ValueError，
+#    工作进程中不能序列化或不能读回的结果、异常（如生成器、构造参数特殊的异常类型）改为带原说明的 RuntimeError，任务不会无结果挂起；
+
+# 注意：工作进程以 spawn 方式启动，在 Windows 上使用时驱动脚本的入口需放在 if __name__ == "__main__": 之下。
+
+import os
+import time
+import queue
+import pickle
+import threading
+import collections
+import multiprocessing
+import concurrent.futures
+
+import syscfg
+import tasker
+
+worker_prefetch = 2 # 每个工作进程最多预取的任务数量
+collect_timeout = 0.5 # 结果收集线程检查工作进程状态的间隔秒数
+
+# 结果在工作进程中序列化并试读，失败时改为 RuntimeError，返回 (是否成功, 序列化数据)
+def PackResult(success, result):
+    try:
+        payload = pickle.dumps(result)
+        pickle.loads(payload) # 有的异常类型可以序列化但不能读回
+        return success, payload
+    except Exception as e:
+        if success == True:
+            result = RuntimeError("任务结果不能在进程间传递！%s: %s" % (type(result).__name__, e))
+        else:
+            result = RuntimeError("%s: %s" % (type(result).__name__, result))
+        return False, pickle.dumps(result)
+
+def WorkerMain(worker_id, sys_args, task_queue, result_queue):
+    kernel = None
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+        job_id, payload = item
+        try:
+            task, args = pickle.loads(payload)
+            if callable(task):
+                result = task(*args)
+            else:
+                if kernel is None:
+                    import cyberx
+                    kernel = cyberx.Kernel(sys_args) # 进程内唯一
+                result = kernel.AssignTask(task)
+            success = True
+        except Exception as e:
+            success, result = False, e
+        result_queue.put((worker_id, job_id) + PackResult(success, result))
+
+class ProcessExecutor(object):
+    def __init__(self, workers = None, kernel_threads = 1, prefetch = worker_prefetch, sys_args = None):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        if self.workers < 1 or prefetch < 1:
+            raise ValueError("工作进程数量和预取任务数量必须为正整数！%s %s" % (self.workers, prefetch))
+        self.prefetch = prefetch
+        sys_args = dict(sys_args if sys_args is not None else syscfg.SysCfg().ToArgs())
+        sys_args["local_cpu_thread"] = kernel_threads
+        context = multiprocessing.get_context("spawn")
+        self.result_queue = context.Queue()
+        self.task_queues = [context.Queue() for i in range(self.workers)]
+        self.processes = [context.Process(target = WorkerMain, args = (i, sys_args, self.task_queues[i], self.result_queue), daemon = True) for i in range(self.workers)]
+        for process in self.processes:
+            process.start()
+        self.lock = threading.Lock()
+        self.shards = [collections.deque() for i in range(self.workers)] # 各工作进程待分配的任务
+        self.running = [{} for i in range(self.workers)] # 各工作进程已分配的任务 {job_id: future}
+        self.alive = [True] * self.workers
+        self.job_id = 0
+        self.next_shard = 0
+        self.closed = False
+        self.collector = threading.Thread(target = self.Collect, daemon = True)
+        self.collector.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Shutdown()
+        return False
+
+    # task 为 Tasker、参数字典或可调用对象，args 为可调用对象的参数
+    def Submit(self, task, *args, affinity = None):
+        if isinstance(task, tasker.Tasker):
+            task = task.ToArgs()
+        if not callable(task) and not isinstance(task, dict):
+            raise ValueError("任务类型无效！%s" % type(task).__name__)
+        try:
+            payload = pickle.dumps((task, args))
+        except Exception as e:
+            raise ValueError("任务不能传递到工作进程！%s: %s" % (type(e).__name__, e))
+        future = concurrent.futures.Future()
+        with self.lock:
+            if self.closed == True:
+                raise RuntimeError("执行器已关闭！")
+            if not any(self.alive):
+                raise RuntimeError("全部工作进程已退出！")
+            self.job_id += 1
+            if affinity is None:
+                shard = self.next_shard
+                self.next_shard = (self.next_shard + 1) % self.workers
+            else:
+                shard = hash(affinity) % self.workers
+            self.shards[shard].append((self.job_id, payload, future))
+            for worker in range(self.workers):
+                self.Dispatch(worker)
+        return future
+
+    # tasks 中各项为 Tasker、参数字典或 (可调用对象, 参数...) 元组，按输入顺序返回结果，timeout 为全部结果的等待秒数
+    def Map(self, tasks, timeout = None, affinity = None):
+        futures = []
+        for task in tasks:
+            if isinstance(task, tuple):
+                futures.append(self.Submit(task[0], *task[1 :], affinity = affinity))
+            else:
+                futures.append(self.Submit(task, affinity = affinity))
+        end_time = None if timeout is None else time.monotonic() + timeout
+        def Results():
+            try:
+                for future in futures:
+                    yield future.result(None if end_time is None else max(end_time - time.monotonic(), 0.0))
+            finally:
+                for future in futures:
+                    future.cancel()
+        return Results()
+
+    def Shutdown(self, wait = True):
+        with self.lock:
+            if self.closed == True:
+                return
+            self.closed = True
+        if wait == True:
+            for future in self.Pending():
+                try:
+                    future.exception()
+                except concurrent.futures.CancelledError:
+                    pass
+        with self.lock:
+            for worker in range(self.workers):
+                for _, _, future in self.shards[worker]:
+                    future.cancel()
+                self.shards[worker].clear()
+                self.task_queues[worker].put(None)
+        for process in self.processes:
+            process.join(None if wait == True else 0)
+        self.collector.join(None if wait == True else 0)
+
+    def Pending(self):
+        with self.lock:
+            futures = [item[2] for shard in self.shards for item in shard]
+            for running in self.running:
+                futures.extend(running.values())
+        return futures
+
+    # 由调用方持有 lock，工作进程已分配任务不足 prefetch 时先取自身队列，为空时从最长队列尾部窃取
+    def Dispatch(self, worker):
+        while self.alive[worker] == True and len(self.running[worker]) < self.prefetch:
+            if len(self.shards[worker]) > 0:
+                job_id, payload, future = self.shards[worker].popleft()
+            else:
+                victim = max(range(self.workers), key = lambda i: len(self.shards[i]))
+                if len(self.shards[victim]) == 0:
+                    return
+                job_id, payload, future = self.shards[victim].pop()
+            if future.set_running_or_notify_cancel() != True:
+                continue # 已取消
+            self.running[worker][job_id] = future
+            self.task_queues[worker].put((job_id, payload))
+
+    def Collect(self):
+        while True:
+            try:
+                worker, job_id, success, payload = self.result_queue.get(timeout = collect_timeout)
+            except queue.Empty:
+                if self.CheckWorkers() == True:
+                    return
+                continue
+            with self.lock:
+                future = self.running[worker].pop(job_id)
+                self.Dispatch(worker)
+            try:
+                result = pickle.loads(payload)
+            except Exception as e:
+                success, result = False, RuntimeError("任务结果不能读取！%s: %s" % (type(e).__name__, e))
+            if success == True:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    # 返回是否已全部结束，异常退出的工作进程的已分配任务以 RuntimeError 结束，其队列中的任务留给其他进程窃取
+    def CheckWorkers(self):
+        failed = []
+        with self.lock:
+            for worker, process in enumerate(self.processes):
+                if self.alive[worker] == True and not process.is_alive():
+                    self.alive[worker] = False
+                    failed.extend(self.running[worker].values())
+                    self.running[worker].clear()
+            if not any(self.alive):
+                for shard in self.shards:
+                    failed.extend(item[2] for item in shard if item[2].set_running_or_notify_cancel() == True)
+                    shard.clear()
+            else:
+                for worker in range(self.workers):
+                    self.Dispatch(worker)
+            finished = self.closed == True and not any(process.is_alive() for process in self.processes)
+        for future in failed:
+            future.set_exception(RuntimeError("工作进程异常退出！"))
+        return finished or not any(self.alive)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、整条期权链的隐含波动率向量化求解，支持 "bs"（欧式 BS 模型）和 "ba"（美式 BAW 模型）；
+# 2、初值采用 Corrado-Miller 有理近似，之后做带区间保护的 Newton 迭代，步长越出区间或 Vega 过小时改为二分；
+# 3、每轮迭代后已收敛的报价不再参与计算，结果为每个报价的隐含波动率和求解状态；
+
+import numpy as np
+
+import vanilla_american
+import vanilla_european
+
+# 求解状态
+iv_status_converged = 0 # 已收敛
+iv_status_max_iterations = 1 # 达到最大迭代次数仍未收敛，返回最后一次迭代值
+iv_status_below_bound = 2 # 报价不高于波动率下限对应价格，无解
+iv_status_above_bound = 3 # 报价高于波动率上限对应价格，无解
+iv_status_invalid = 4 # 参数无效，如报价、价格、期限不为正
+
+iv_min = 0.0001 # 波动率下限
+iv_max = 5.0 # 波动率上限
+
+vega_bump = 1e-5 # "ba" 模型数值 Vega 的波动率变动
+
+def CalcModelPrice(model, s, k, r, q, v, t, is_call):
+    if model == "bs":
+        return vanilla_european.CalcPriceArray(s, k, r, q, v, t, is_call)
+    if model == "ba":
+        return vanilla_american.CalcPriceArray(s, k, r, q, v, t, is_call)
+    raise ValueError("不支持的隐含波动率模型：%s" % model)
+
+# 未除以 100 的 Vega，即价格对波动率的导数，"ba" 模型同时返回临界价格供下次迭代作为初值
+def CalcModelVega(model, s, k, r, q, v, t, is_call, guess = None):
+    if model == "bs":
+        price = vanilla_european.CalcGreeksArray(s, k, r, q, v, t, True, is_call, greeks = "pv")
+        return price["p"], price["v"] * 100.0, None
+    if model != "ba":
+        raise ValueError("不支持的隐含波动率模型：%s" % model)
+    # 波动率变动很小，临界价格以当前波动率的结果为初值，一两次迭代即可收敛
+    critical = vanilla_american.CalcCriticalPrice(k, r, q, v, t, is_call, guess)
+    critical_u = vanilla_american.CalcCriticalPrice(k, r, q, v + vega_bump, t, is_call, critical)
+    critical_d = vanilla_american.CalcCriticalPrice(k, r, q, v - vega_bump, t, is_call, critical)
+    price = vanilla_american.CalcPriceArray(s, k, r, q, v, t, is_call, critical)
+    price_u = vanilla_american.CalcPriceArray(s, k, r, q, v + vega_bump, t, is_call, critical_u)
+    price_d = vanilla_american.CalcPriceArray(s, k, r, q, v - vega_bump, t, is_call, critical_d)
+    return price, (price_u - price_d) / (2.0 * vega_bump), critical
+
+# Corrado-Miller 初值，以贴现后的标的价格和行权价代入
+def GuessIV(p, s, k, r, q, t, is_call):
+    s_q = s * np.exp(-q * t)
+    k_r = k * np.exp(-r * t)
+    call = np.where(is_call, p, p + s_q - k_r) # 看跌按平价关系转为看涨
+    half = call - 0.5 * (s_q - k_r)
+    root = np.sqrt(np.maximum(half * half - (s_q - k_r) * (s_q - k_r) / np.pi, 0.0))
+    guess = np.sqrt(2.0 * np.pi / t) / (s_q + k_r) * (half + root)
+    guess = np.where(np.isfinite(guess), guess, 0.2)
+    return np.clip(guess, iv_min * 2.0, iv_max * 0.5)
+
+def CalcIVArray(model, p, s, k, r, q, t, is_call = True, tolerance = 1e-10, max_iterations = 100):
+    p, s, k, r, q, t, is_call = vanilla_european.ToArrays(p, s, k, r, q, t, is_call)
+    shape = p.shape
+    p, s, k, r, q, t, is_call = [item.ravel() for item in (p, s, k, r, q, t, is_call)]
+    iv = np.full(len(p), np.nan)
+    status = np.full(len(p), iv_status_invalid, dtype = np.int32)
+    valid = np.flatnonzero((p > 0.0) & (s > 0.0) & (k > 0.0) & (t > 0.0) & np.isfinite(p))
+    def args(index):
+        return s[index], k[index], r[index], q[index]
+    # 价格随波动率单调递增，以上下限价格确定有解区间
+    price_lo = CalcModelPrice(model, *args(valid), iv_min, t[valid], is_call[valid])
+    price_hi = CalcModelPrice(model, *args(valid), iv_max, t[valid], is_call[valid])
+    # 报价不高于下限价格时波动率无法确定，如美式期权处于提前行权区域、报价等于内在价值
+    status[valid[p[valid] <= price_lo + tolerance]] = iv_status_below_bound
+    status[valid[p[valid] > price_hi + tolerance]] = iv_status_above_bound
+    inside = (p[valid] > price_lo + tolerance) & (p[valid] <= price_hi + tolerance)
+    active = valid[inside]
+    lower = np.full(len(p), iv_min)
+    upper = np.full(len(p), iv_max)
+    iv[active] = GuessIV(p[active], *args(active), t[active], is_call[active])
+    if model == "ba":
+        # 美式期权提前行权溢价通常很小，以同一报价的欧式隐含波动率为初值
+        iv_bs, status_bs = CalcIVArray("bs", p[active], *args(active), t[active], is_call[active], tolerance, max_iterations)
+        iv[active] = np.where(status_bs == iv_status_converged, np.clip(iv_bs, iv_min, iv_max), iv[active])
+    status[active] = iv_status_max_iterations
+    critical = np.full(len(p), np.nan)
+    for _ in range(max_iterations):
+        if len(active) == 0:
+            break
+        price, vega, critical_i = CalcModelVega(model, *args(active), iv[active], t[active], is_call[active], critical[active])
+        if critical_i is not None:
+            critical[active] = critical_i
+        diff = price - p[active]
+        done = np.abs(diff) <= tolerance
+        lower[active] = np.where(diff < 0.0, iv[active], lower[active])
+        upper[active] = np.where(diff > 0.0, iv[active], upper[active])
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            newton = iv[active] - diff / vega
+        bisect = 0.5 * (lower[active] + upper[active])
+        safe = np.isfinite(newton) & (newton > lower[active]) & (newton < upper[active])
+        update = np.where(safe, newton, bisect)
+        done |= np.abs(update - iv[active]) <= tolerance * 1e-3 # 区间已收缩至浮点精度
+        iv[active] = np.where(done, iv[active], update)
+        status[active[done]] = iv_status_converged
+        active = active[~done]
+    return iv.reshape(shape), status.reshape(shape)
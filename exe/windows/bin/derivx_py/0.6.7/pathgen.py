@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、NumPy 随机数据和价格路径生成，供 Python 端定价引擎使用；
+# 2、随机数据按固定行数分块生成，每块由 rand_seed 全部种子和块序号确定，结果与计算分块方式无关；
+# 3、价格路径以初始价格为 1.0 的比率形式给出，任意初始价格的路径等于比率路径乘以初始价格；
+# 4、rand_quasi 为 True 时使用 sobol 模块的加扰 Sobol 准随机数据，第 i 行为第 i 个点，多线程生成且结果与线程数无关；
+# 5、设置 path_store 后随机数据从 pathstore 的内存映射文件读取，多个任务和进程共用；
+# 6、brownian_bridge 为 True 时以布朗桥构造路径，随机数据前几列依次用于期末和各敲出观察日，其余各日随后填充，
+#    准随机数据的前几维决定观察日价格，可明显提高 Sobol 数据的收敛速度，伪随机数据下结果分布不变；
+
+import bisect
+
+import numpy as np
+
+import sobol
+
+rand_block_rows = 4096 # 随机数据分块行数
+
+bridge_plans = {} # 布朗桥构造计划缓存
+bridge_plan_limit = 64
+
+path_store = None # 设置为 pathstore.PathStore 实例后 MakeNormals 从内存映射文件读取随机数据，不再重复生成
+
+def MakeRandBlock(rand_seed, rand_cols, block):
+    if len(rand_seed) == 0:
+        raise ValueError("随机数据种子 rand_seed 不能为空！")
+    sequence = np.random.SeedSequence(entropy = [int(seed) for seed in rand_seed], spawn_key = (int(block),))
+    return np.random.default_rng(sequence).standard_normal((rand_block_rows, rand_cols))
+
+def MakeRandRows(rand_seed, rand_cols, row_from, row_to, rand_quasi = False):
+    if row_to <= row_from:
+        return np.zeros((0, rand_cols))
+    if rand_quasi == True:
+        return sobol.MakeSobolRows(rand_seed, rand_cols, row_from, row_to)
+    parts = []
+    for block in range(row_from // rand_block_rows, (row_to - 1) // rand_block_rows + 1):
+        data = MakeRandBlock(rand_seed, rand_cols, block)
+        beg = max(row_from - block * rand_block_rows, 0)
+        end = min(row_to - block * rand_block_rows, rand_block_rows)
+        parts.append(data[beg : end])
+    return np.concatenate(parts, axis = 0)
+
+def MakeRandData(rand_rows, rand_cols, rand_seed, rand_quasi = False):
+    return MakeRandRows(rand_seed, rand_cols, 0, rand_rows, rand_quasi)
+
+# 路径与随机数据行的对应关系
+# 对偶平滑时相邻两条路径使用同一行随机数据的正负值
+def GetPathRows(rand_rows, dual_smooth, path_from, path_to):
+    paths = np.arange(path_from, path_to)
+    if dual_smooth == True:
+        rows = (paths // 2) % rand_rows
+        signs = np.where(paths % 2 == 0, 1.0, -1.0)
+    else:
+        rows = paths % rand_rows
+        signs = np.ones(len(paths))
+    return rows, signs
+
+# 布朗桥构造顺序中依次取中点，使先构造的点尽量把区间等分
+def BisectOrder(points):
+    order = []
+    queue = [(0, len(points))]
+    while len(queue) > 0:
+        beg, end = queue.pop(0)
+        if beg >= end:
+            continue
+        mid = (beg + end) // 2
+        order.append(points[mid])
+        queue.append((beg, mid))
+        queue.append((mid + 1, end))
+    return order
+
+# 布朗桥构造计划，先期末，再各观察日，最后其余各日，第 k 个构造点使用第 k 列随机数据
+# 返回每个构造点的 (步, 左邻步, 右邻步, 左权重, 右权重, 标准差)，以步数为时间单位，第 0 步取值为零
+def MakeBridgePlan(runs_step, observe_steps):
+    observe = sorted(set(step for step in observe_steps if 0 < step < runs_step))
+    observe_set = set(observe)
+    others = [step for step in range(1, runs_step) if step not in observe_set]
+    order = [runs_step] + BisectOrder(observe) + BisectOrder(others)
+    done = [0]
+    plan = []
+    for step in order:
+        index = bisect.bisect_left(done, step)
+        left = done[index - 1]
+        if index < len(done):
+            right = done[index]
+            span = float(right - left)
+            plan.append((step, left, right, (right - step) / span, (step - left) / span, np.sqrt((step - left) * (right - step) / span)))
+        else:
+            plan.append((step, left, left, 1.0, 0.0, np.sqrt(float(step - left))))
+        bisect.insort(done, step)
+    return plan
+
+def GetBridgePlan(runs_step, observe_steps):
+    key = (int(runs_step), tuple(observe_steps))
+    if key not in bridge_plans:
+        if len(bridge_plans) >= bridge_plan_limit:
+            bridge_plans.clear()
+        bridge_plans[key] = MakeBridgePlan(runs_step, observe_steps)
+    return bridge_plans[key]
+
+# 将按构造顺序排列的随机数据转为逐步增量，结果仍为独立标准正态，可直接用于 MakeRatioPaths
+def ApplyBridge(normals, observe_steps):
+    count, runs_step = normals.shape
+    walk = np.zeros((count, runs_step + 1))
+    for k, (step, left, right, weight_l, weight_r, sd) in enumerate(GetBridgePlan(runs_step, observe_steps)):
+        walk[:, step] = weight_l * walk[:, left] + weight_r * walk[:, right] + sd * normals[:, k]
+    return np.diff(walk, axis = 1)
+
+# 布朗桥观察步，以 run_from 估值时点计，其余估值时点仍是有效的布朗桥，只是观察日不一定排在前面
+def GetObserveSteps(config):
+    fixed = config.run_from + (1 if getattr(config, "market_close", False) == True else 0)
+    return [day - fixed for day in getattr(config, "knock_o_days", []) if day > fixed]
+
+# bridge 为 False 时不做布朗桥构造，narrow 为 True 时只按 runs_step 列生成随机数据，供只模拟观察日等只需少量列的方式使用
+# 伪随机数据按 runs_step 列生成的结果与按 rand_cols 列生成后截取不同，设置 path_store 时仍取存储数据的前 runs_step 列
+def MakeNormals(config, path_from, path_to, runs_step = None, bridge = True, narrow = False):
+    if runs_step is None:
+        runs_step = config.runs_step
+    if config.rand_cols < runs_step:
+        raise ValueError("随机数据列数 rand_cols 小于价格变动步数！%d < %d" % (config.rand_cols, runs_step))
+    if path_store is not None:
+        data = np.array(path_store.GetNormals(config)[path_from : path_to, : runs_step])
+    else:
+        rows, signs = GetPathRows(config.rand_rows, config.dual_smooth, path_from, path_to)
+        row_from, row_to = int(rows.min()), int(rows.max()) + 1
+        data = MakeRandRows(config.rand_seed, runs_step if narrow == True else config.rand_cols, row_from, row_to, config.rand_quasi)
+        data = data[rows - row_from, : runs_step] * signs[:, None]
+    if bridge == True and getattr(config, "brownian_bridge", False) == True:
+        data = ApplyBridge(data, GetObserveSteps(config))
+    return data
+
+# 涨跌停限制方式，0 不限制，1 超限部分移至下日，2 超限部分直接削掉
+def ApplyPriceLimit(rise_fall, price_limit_ratio, price_limit_style):
+    if price_limit_style == 0 or price_limit_ratio <= 0.0:
+        return rise_fall
+    limit_d = 1.0 - price_limit_ratio
+    limit_u = 1.0 + price_limit_ratio
+    result = np.empty_like(rise_fall)
+    carry = np.ones(rise_fall.shape[0])
+    for j in range(rise_fall.shape[1]):
+        ratio = rise_fall[:, j] * carry
+        result[:, j] = np.clip(ratio, limit_d, limit_u)
+        if price_limit_style == 1:
+            carry = ratio / result[:, j]
+    return result
+
+# 比率路径，第 j 列为第 j + 1 步价格与初始价格之比
+def MakeRatioPaths(normals, sigma, drift, dt, price_limit_ratio = 0.0, price_limit_style = 0):
+    steps = (drift - 0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * normals
+    if price_limit_style == 0 or price_limit_ratio <= 0.0:
+        return np.exp(np.cumsum(steps, axis = 1))
+    rise_fall = ApplyPriceLimit(np.exp(steps), price_limit_ratio, price_limit_style)
+    return np.cumprod(rise_fall, axis = 1)
+
+# 只在 grid_cols 各步生成比率路径，第 k 列为第 grid_cols[k] 步价格与初始价格之比，第 k 列随机数据用于第 k 段
+def MakeGridRatioPaths(normals, sigma, drift, dt, grid_cols):
+    spans = np.diff(np.concatenate(([0], grid_cols))) * dt
+    steps = (drift - 0.5 * sigma * sigma) * spans + sigma * np.sqrt(spans) * normals[:, : len(spans)]
+    return np.exp(np.cumsum(steps, axis = 1))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、随机数据文件存储，按路径顺序的标准正态随机数据写入 .npy 文件，之后各任务、各进程以只读内存映射方式打开，不再重复生成；
+# 2、文件以 (生成器, rand_seed, rand_rows, rand_cols, runs_size, dual_smooth, rand_quasi) 为键命名，
+#    参数相同的交易无论 sigma、利率等是否相同均共用同一文件，路径由 pathgen.MakeRatioPaths 按各自参数重建；
+# 3、生成时先写入临时文件再改名，多个进程同时生成同一文件时不会读到不完整的数据；
+# 4、目录内文件总大小超过 size_limit 时按最近使用时间淘汰，正在被其他进程映射而无法删除的文件跳过；
+# 5、设置 pathgen.path_store 后 pathgen.MakeNormals 优先从存储读取，autocall 等引擎无需改动即可使用；
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+import pathgen
+
+store_generator = "numpy_pcg64_block_%d" % pathgen.rand_block_rows # 生成方式标识，随机数据生成方式变化时文件自动失效
+store_prefix = "rand_"
+store_suffix = ".npy"
+
+class PathStore(object):
+    def __init__(self, store_path, size_limit = 16 * 1024 ** 3):
+        self.store_path = store_path
+        self.size_limit = size_limit # 字节
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(store_path, exist_ok = True)
+
+    def MakeKey(self, config):
+        key = {
+            "generator": store_generator,
+            "rand_seed": [int(seed) for seed in config.rand_seed],
+            "rand_rows": int(config.rand_rows),
+            "rand_cols": int(config.rand_cols),
+            "runs_size": int(config.runs_size),
+            "dual_smooth": bool(getattr(config, "dual_smooth", False)),
+            "rand_quasi": bool(getattr(config, "rand_quasi", False))
+        }
+        return hashlib.sha1(json.dumps(key, sort_keys = True).encode("utf-8")).hexdigest()
+
+    def GetFile(self, config):
+        return os.path.join(self.store_path, store_prefix + self.MakeKey(config) + store_suffix)
+
+    # 返回 runs_size 行 rand_cols 列的只读内存映射，第 i 行为第 i 条路径使用的随机数据（已含对偶符号）
+    def GetNormals(self, config):
+        file = self.GetFile(config)
+        if os.path.exists(file):
+            self.hits += 1
+            os.utime(file) # 更新使用时间供淘汰排序
+        else:
+            self.misses += 1
+            self.Write(config, file)
+            self.Evict(keep = file)
+        return np.load(file, mmap_mode = "r")
+
+    def Write(self, config, file):
+        temp = "%s.%d.tmp" % (file, os.getpid())
+        data = np.lib.format.open_memmap(temp, mode = "w+", dtype = np.float64, shape = (config.runs_size, config.rand_cols))
+        try:
+            for path_from in range(0, config.runs_size, pathgen.rand_block_rows):
+                path_to = min(path_from + pathgen.rand_block_rows, config.runs_size)
+                rows, signs = pathgen.GetPathRows(config.rand_rows, getattr(config, "dual_smooth", False), path_from, path_to)
+                row_from, row_to = int(rows.min()), int(rows.max()) + 1
+                block = pathgen.MakeRandRows(config.rand_seed, config.rand_cols, row_from, row_to, getattr(config, "rand_quasi", False))
+                data[path_from : path_to] = block[rows - row_from] * signs[:, None]
+            data.flush()
+        finally:
+            del data
+        os.replace(temp, file) # 其他进程已生成同一文件时直接覆盖，内容相同
+
+    def GetFiles(self):
+        files = []
+        for name in os.listdir(self.store_path):
+            if name.startswith(store_prefix) and name.endswith(store_suffix):
+                file = os.path.join(self.store_path, name)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue # 已被其他进程淘汰
+                files.append((stat.st_mtime, stat.st_size, file))
+        return sorted(files)
+
+    def Evict(self, keep = None):
+        files = self.GetFiles()
+        total = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if total <= self.size_limit:
+                break
+            if file == keep:
+                continue
+            try:
+                os.remove(file)
+                total -= size
+            except OSError:
+                pass # Windows 下其他进程仍在映射的文件无法删除
+        return total
+
+    def Clear(self):
+        for _, _, file in self.GetFiles():
+            try:
+                os.remove(file)
+            except OSError:
+                pass
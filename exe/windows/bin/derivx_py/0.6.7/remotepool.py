@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、多服务器远程任务连接池，RemotePool 与 network_client 中 clients 列出的多台计算服务器各保持一个长连接，
+#    每个任务发往在途任务最少的服务器，同一连接上可同时有多个在途任务（流水线），结果按请求标识对应，可不按发送顺序返回；
+# 2、各计算服务器上运行 TaskServer 网关，由本机 Kernel 以本地计算任务执行收到的任务，也可指定 handler 函数，
+#    在本机回环地址的不同端口启动多个 TaskServer 即可在单台机器上测试连接池；
+# 3、每隔 heart_check 秒向各连接发送心跳，连续 heart_lost_times 个间隔未收到任何数据视为连接丢失，连接断开或心跳丢失时
+#    该连接上的在途任务改投其他服务器，每个任务最多改投 retry_limit 次，丢失的服务器在之后的心跳间隔中自动重连；
+# 4、连接超时取 con_timeout 毫秒，单个数据帧长度不超过 data_length，超出时请求直接失败、结果以 return_code 非零返回；
+# 5、Submit 返回 concurrent.futures.Future，AssignTask 同步等待，结果字典与 Kernel.AssignTask 一致；
+# 6、result_data 为 NumPy 数组、codec 二进制数组或超出 data_length 的数值 JSON 数组时，服务器按二进制分块流式返回，
+#    每块不超过 chunk_bytes 和 data_length，结果大小不再受 data_length 限制，服务器和客户端都不生成整个结果的 JSON 文本；
+# 7、客户端收到结果头部后按数组类型和维度预分配 NumPy 数组，各块直接从连接读入数组相应位置，结果中 result_data 为该数组，
+#    SubmitStream 返回 ResultStream，IterRows 按行逐段返回已收到的部分结果，可边接收边处理，任务改投后复用同一数组；
+
+# 数据帧格式（小端）：
+# 头部 20 字节：标识 "DXRP"(4) + 版本(1) + 帧类型(1) + 保留(2) + 请求标识(4) + 数据字节数(8)
+# 数据区：请求和结果为 UTF-8 编码的 JSON，心跳没有数据区，
+#         分块结果头部为不含 result_data 的结果 JSON 加 result_dtype、result_shape 两项，
+#         分块数据为块在数组中的字节偏移(8) + 数组数据，按偏移顺序发送，全部块收到后结果完成
+
+# 注意：TaskServer 不做身份验证，只应在受信任的内网中使用。
+
+import json
+import time
+import socket
+import struct
+import threading
+import concurrent.futures
+
+import numpy as np
+
+import codec
+import syscfg
+import tasker
+
+frame_magic = b"DXRP" # 格式标识
+frame_version = 1 # 格式版本
+frame_format = "<4sBBHIQ" # 头部格式
+frame_length = struct.calcsize(frame_format) # 头部长度
+
+# 帧类型
+frame_request = 1
+frame_result = 2
+frame_ping = 3
+frame_pong = 4
+frame_stream = 5 # 分块结果头部
+frame_chunk = 6 # 分块结果数据
+
+chunk_bytes = 1024 * 1024 # 分块结果每块数据字节数，另受 data_length 限制
+chunk_offset = struct.Struct("<Q") # 块偏移格式
+heart_lost_times = 2 # 连续多少个心跳间隔未收到数据视为连接丢失
+retry_limit = 2 # 连接丢失时在途任务改投其他服务器的次数
+server_workers = 4 # TaskServer 同时执行的任务数量
+
+def PackHead(frame_type, request_id, length):
+    return struct.pack(frame_format, frame_magic, frame_version, frame_type, 0, request_id, length)
+
+def PackFrame(frame_type, request_id, body = b""):
+    return PackHead(frame_type, request_id, len(body)) + body
+
+# 读满 view，可直接读入 NumPy 数组的内存
+def RecvInto(sock, view):
+    offset = 0
+    while offset < len(view):
+        count = sock.recv_into(view[offset :])
+        if count == 0:
+            raise ConnectionError("连接已关闭！")
+        offset += count
+
+def RecvExact(sock, size):
+    buffer = bytearray(size)
+    RecvInto(sock, memoryview(buffer))
+    return buffer
+
+def RecvHead(sock, data_length):
+    magic, version, frame_type, _, request_id, length = struct.unpack(frame_format, RecvExact(sock, frame_length))
+    if magic != frame_magic or version != frame_version:
+        raise ConnectionError("数据帧格式无效！%s %d" % (magic, version))
+    if length > data_length:
+        raise ConnectionError("数据帧长度超出 data_length！%d > %d" % (length, data_length))
+    return frame_type, request_id, length
+
+def RecvFrame(sock, data_length):
+    frame_type, request_id, length = RecvHead(sock, data_length)
+    return frame_type, request_id, RecvExact(sock, length)
+
+def MakeError(return_code, return_info):
+    return {"return_code": return_code, "return_info": return_info}
+
+# 需分块返回的数值结果数组，parse 时 JSON 文本的 result_data 也解析为数组，不需要分块时返回 None
+def GetArray(result, parse = False):
+    result_data = result.get("result_data") if isinstance(result, dict) else None
+    if isinstance(result_data, np.ndarray) or codec.IsPacked(result_data) or (parse == True and isinstance(result_data, str)):
+        try:
+            array = codec.ParseResult(result_data)
+        except ValueError:
+            return None
+        if isinstance(array, np.ndarray) and array.dtype.kind in "biufc":
+            return array
+    return None
+
+class TaskServer(object):
+    def __init__(self, address = "127.0.0.1", port = 0, handler = None, workers = server_workers, data_length = None):
+        self.handler = handler if handler is not None else self.RunKernel
+        self.data_length = data_length if data_length is not None else syscfg.SysCfg().network_client["data_length"]
+        self.kernel = None
+        self.kernel_lock = threading.Lock()
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((address, port))
+        self.listener.listen(64)
+        self.address, self.port = self.listener.getsockname()
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self.sockets = []
+        self.closed = False
+        threading.Thread(target = self.Accept, daemon = True).start()
+
+    # 默认由本机 Kernel 执行，任务改为本地计算任务
+    def RunKernel(self, args):
+        with self.kernel_lock:
+            if self.kernel is None:
+                import cyberx
+                self.kernel = cyberx.Kernel(syscfg.SysCfg().ToArgs()) # 全局唯一
+        args = dict(args)
+        args["distribute_type"] = tasker.distribute_local
+        return self.kernel.AssignTask(args) # 同步
+
+    def Accept(self):
+        while self.closed != True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.sockets.append(sock)
+            threading.Thread(target = self.Serve, args = (sock,), daemon = True).start()
+
+    def Serve(self, sock):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                frame_type, request_id, body = RecvFrame(sock, self.data_length)
+                if frame_type == frame_ping:
+                    with send_lock:
+                        sock.sendall(PackFrame(frame_pong, request_id))
+                elif frame_type == frame_request:
+                    self.executor.submit(self.Execute, sock, send_lock, request_id, body)
+        except (OSError, ConnectionError, RuntimeError): # RuntimeError 为 Close 后不再接受任务
+            pass
+        finally:
+            sock.close()
+
+    def Execute(self, sock, send_lock, request_id, body):
+        try:
+            result = self.handler(json.loads(body.decode("utf-8")))
+            array = GetArray(result)
+            if array is None:
+                body = json.dumps(result).encode("utf-8")
+                if len(body) > self.data_length:
+                    array = GetArray(result, parse = True) # 超长的数值 JSON 结果改为分块返回
+        except Exception as e:
+            array = None
+            body = json.dumps(MakeError(-1, "任务执行异常！%s" % e)).encode("utf-8")
+        if array is None and len(body) > self.data_length:
+            body = json.dumps(MakeError(-1, "结果数据长度超出 data_length！%d > %d" % (len(body), self.data_length))).encode("utf-8")
+        try:
+            if array is not None:
+                self.SendStream(sock, send_lock, request_id, result, array)
+            else:
+                with send_lock:
+                    sock.sendall(PackFrame(frame_result, request_id, body))
+        except OSError:
+            pass # 连接已断开，客户端会改投其他服务器
+
+    # 先发结果头部，再按偏移顺序逐块发送数组数据，每块单独持有 send_lock，其他任务的结果和心跳可在块间发出
+    def SendStream(self, sock, send_lock, request_id, result, array):
+        head = {name: value for name, value in result.items() if name != "result_data"}
+        head["result_dtype"] = array.dtype.str
+        head["result_shape"] = list(array.shape)
+        with send_lock:
+            sock.sendall(PackFrame(frame_stream, request_id, json.dumps(head).encode("utf-8")))
+        data = memoryview(np.ascontiguousarray(array).reshape(-1).view(np.uint8))
+        size = max(min(chunk_bytes, self.data_length - chunk_offset.size), 1)
+        for offset in range(0, len(data), size):
+            chunk = data[offset : offset + size]
+            with send_lock:
+                sock.sendall(PackHead(frame_chunk, request_id, chunk_offset.size + len(chunk)) + chunk_offset.pack(offset))
+                sock.sendall(chunk)
+
+    def Close(self):
+        self.closed = True
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR) # 唤醒阻塞在 accept 中的线程，仅 close 时仍会接受新连接
+        except OSError:
+            pass
+        self.listener.close()
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self.executor.shutdown(wait = False)
+
+# 单个任务的结果，分块结果按块读入预分配的数组
+class ResultStream(object):
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.condition = threading.Condition()
+        self.result = None # 分块结果头部
+        self.array = None
+        self.data = None # 数组的字节视图
+        self.received = 0 # 本次发送已收到的字节数
+        self.ready = 0 # 已连续收到的字节数，改投后重新接收时不减少
+
+    # 收到分块结果头部，改投后数组类型和维度相同时复用已有数组，返回是否已收齐
+    def Start(self, result, dtype, shape):
+        with self.condition:
+            if self.array is None or self.array.dtype != dtype or self.array.shape != shape:
+                self.array = np.empty(shape, dtype = dtype)
+                self.data = memoryview(self.array.reshape(-1).view(np.uint8))
+                self.ready = 0
+            self.result = result
+            self.received = 0
+            return len(self.data) == 0
+
+    # 块读入位置，不是当前待收的块时返回 None
+    def GetTarget(self, offset, size):
+        if self.data is None or offset != self.received or offset + size > len(self.data):
+            return None
+        return self.data[offset : offset + size]
+
+    # 返回是否已收齐
+    def Advance(self, size):
+        with self.condition:
+            self.received += size
+            self.ready = max(self.ready, self.received)
+            self.condition.notify_all()
+            return self.received == len(self.data)
+
+    def Finish(self):
+        result = dict(self.result)
+        result["result_data"] = self.array
+        self.SetResult(result)
+
+    def SetResult(self, result):
+        with self.condition:
+            if not self.future.done():
+                self.future.set_result(result)
+            self.condition.notify_all()
+
+    def SetException(self, exception):
+        with self.condition:
+            if not self.future.done():
+                self.future.set_exception(exception)
+            self.condition.notify_all()
+
+    def Result(self, timeout = None):
+        return self.future.result(timeout)
+
+    def GetReadyRows(self):
+        if self.array is None or self.array.ndim == 0 or self.array.shape[0] == 0:
+            return 0
+        return self.ready // (self.array.nbytes // self.array.shape[0] or 1)
+
+    # 按第一维逐段返回已收到的行，为数组的视图，结果完成后结束，JSON 结果完成时一次返回解析后的数组
+    def IterRows(self, timeout = None):
+        end_time = None if timeout is None else time.monotonic() + timeout
+        rows_done = 0
+        while True:
+            with self.condition:
+                while self.GetReadyRows() <= rows_done and not self.future.done():
+                    if self.condition.wait(None if end_time is None else max(end_time - time.monotonic(), 0.0)) != True:
+                        raise concurrent.futures.TimeoutError("等待结果超时！")
+                rows = self.GetReadyRows()
+            if rows > rows_done:
+                yield self.array[rows_done : rows]
+                rows_done = rows
+                continue
+            result = self.future.result()
+            if self.array is None and result["return_code"] == 0:
+                array = codec.ParseResult(result)
+                if isinstance(array, np.ndarray):
+                    yield array if array.ndim > 0 else array.reshape(1)
+            elif self.array is not None and self.array.ndim == 0:
+                yield self.array.reshape(1)
+            return
+
+class Connection(object):
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.sock = None
+        self.alive = False
+        self.pending = {} # {request_id: (stream, body, tries)}
+        self.send_lock = threading.Lock()
+        self.last_seen = 0.0
+        self.sent = 0
+        self.completed = 0
+
+    def Send(self, frame):
+        with self.send_lock:
+            self.sock.sendall(frame)
+
+class RemotePool(object):
+    def __init__(self, clients = None, heart_check = None, con_timeout = None, data_length = None):
+        network = syscfg.SysCfg().network_client
+        if clients is None:
+            clients = [client for client in network["clients"] if client["work"] == True]
+        if len(clients) == 0:
+            raise ValueError("没有可用的计算服务器设置！")
+        self.heart_check = heart_check if heart_check is not None else network["heart_check"] # 秒
+        self.con_timeout = (con_timeout if con_timeout is not None else network["con_timeout"]) / 1000.0 # 毫秒
+        self.data_length = data_length if data_length is not None else network["data_length"]
+        self.lock = threading.RLock()
+        self.connections = [Connection(client["address"], client["port"]) for client in clients]
+        self.request_id = 0
+        self.closed = False
+        self.stop_event = threading.Event()
+        for connection in self.connections:
+            self.Connect(connection)
+        self.heartbeat = threading.Thread(target = self.Heartbeat, daemon = True)
+        self.heartbeat.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.Close()
+        return False
+
+    def Connect(self, connection):
+        try:
+            sock = socket.create_connection((connection.address, connection.port), timeout = self.con_timeout)
+        except OSError:
+            return False
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            if self.closed == True:
+                sock.close()
+                return False
+            connection.sock = sock
+            connection.alive = True
+            connection.last_seen = time.monotonic()
+        threading.Thread(target = self.Read, args = (connection, sock), daemon = True).start()
+        return True
+
+    def Read(self, connection, sock):
+        try:
+            while True:
+                frame_type, request_id, length = RecvHead(sock, self.data_length)
+                connection.last_seen = time.monotonic()
+                if frame_type == frame_chunk:
+                    offset = chunk_offset.unpack(RecvExact(sock, chunk_offset.size))[0]
+                    self.OnChunk(connection, sock, request_id, offset, length - chunk_offset.size)
+                    continue
+                body = RecvExact(sock, length)
+                if frame_type == frame_result:
+                    self.OnResult(connection, request_id, body)
+                elif frame_type == frame_stream:
+                    self.OnStream(connection, request_id, body)
+        except (OSError, ConnectionError, ValueError, struct.error):
+            self.Lost(connection, sock)
+
+    def OnResult(self, connection, request_id, body):
+        with self.lock:
+            item = connection.pending.pop(request_id, None)
+            if item is not None:
+                connection.completed += 1
+        if item is None:
+            return # 已改投其他服务器
+        try:
+            item[0].SetResult(json.loads(body.decode("utf-8")))
+        except ValueError as e:
+            item[0].SetException(e)
+
+    def OnStream(self, connection, request_id, body):
+        with self.lock:
+            item = connection.pending.get(request_id)
+        if item is None:
+            return # 已改投其他服务器，之后的块直接丢弃
+        result = json.loads(body.decode("utf-8"))
+        dtype = np.dtype(result.pop("result_dtype"))
+        shape = tuple(result.pop("result_shape"))
+        if item[0].Start(result, dtype, shape) == True:
+            self.Complete(connection, request_id, item[0])
+
+    # 块数据直接读入结果数组，不在 lock 内读取
+    def OnChunk(self, connection, sock, request_id, offset, size):
+        with self.lock:
+            item = connection.pending.get(request_id)
+        target = item[0].GetTarget(offset, size) if item is not None else None
+        if target is None:
+            RecvExact(sock, size) # 已改投其他服务器
+            return
+        RecvInto(sock, target)
+        with self.lock:
+            if connection.pending.get(request_id) is not item:
+                return # 读取期间连接已丢失
+            complete = item[0].Advance(size)
+        if complete == True:
+            self.Complete(connection, request_id, item[0])
+
+    def Complete(self, connection, request_id, stream):
+        with self.lock:
+            if connection.pending.pop(request_id, None) is None:
+                return
+            connection.completed += 1
+        stream.Finish()
+
+    # 连接断开或心跳丢失，在途任务改投其他服务器
+    def Lost(self, connection, sock):
+        with self.lock:
+            if connection.sock is not sock or connection.alive != True:
+                return
+            connection.alive = False
+            pending, connection.pending = connection.pending, {}
+            for request_id, (stream, body, tries) in sorted(pending.items()):
+                if tries >= retry_limit:
+                    stream.SetException(ConnectionError("任务改投次数超出限制！%d" % request_id))
+                else:
+                    self.Dispatch(request_id, body, stream, tries + 1)
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+
+    # 由调用方持有 lock，发往在途任务最少的服务器，相同时发往累计发送较少的服务器
+    def Dispatch(self, request_id, body, stream, tries):
+        alive = [connection for connection in self.connections if connection.alive == True]
+        if len(alive) == 0:
+            stream.SetException(ConnectionError("没有可用的计算服务器！"))
+            return
+        connection = min(alive, key = lambda connection: (len(connection.pending), connection.sent))
+        connection.pending[request_id] = (stream, body, tries)
+        connection.sent += 1
+        try:
+            connection.Send(PackFrame(frame_request, request_id, body))
+        except OSError:
+            self.Lost(connection, connection.sock)
+
+    # task 为 Tasker 或参数字典
+    def Submit(self, task):
+        return self.SubmitStream(task).future
+
+    # 返回 ResultStream，可在结果完成前以 IterRows 逐段取得已收到的部分结果
+    def SubmitStream(self, task):
+        args = task.ToArgs() if isinstance(task, tasker.Tasker) else task
+        body = json.dumps(args).encode("utf-8")
+        stream = ResultStream()
+        if len(body) > self.data_length:
+            stream.SetException(ValueError("任务数据长度超出 data_length！%d > %d" % (len(body), self.data_length)))
+            return stream
+        with self.lock:
+            if self.closed == True:
+                raise RuntimeError("连接池已关闭！")
+            self.request_id = self.request_id % 0xFFFFFFFF + 1
+            self.Dispatch(self.request_id, body, stream, 0)
+        return stream
+
+    # 同步执行，timeout 未指定时取任务的 timeout_wait，为 0 时不限
+    def AssignTask(self, task, timeout = None):
+        args = task.ToArgs() if isinstance(task, tasker.Tasker) else task
+        if timeout is None and args.get("timeout_wait", 0) > 0:
+            timeout = args["timeout_wait"]
+        return self.Submit(args).result(timeout)
+
+    def Heartbeat(self):
+        while not self.stop_event.wait(self.heart_check):
+            now = time.monotonic()
+            for connection in self.connections:
+                if connection.alive != True:
+                    self.Connect(connection) # 重连
+                elif now - connection.last_seen > self.heart_check * heart_lost_times:
+                    self.Lost(connection, connection.sock)
+                else:
+                    try:
+                        connection.Send(PackFrame(frame_ping, 0))
+                    except OSError:
+                        self.Lost(connection, connection.sock)
+
+    def Stats(self):
+        with self.lock:
+            return [{"address": connection.address, "port": connection.port, "alive": connection.alive,
+                     "pending": len(connection.pending), "sent": connection.sent, "completed": connection.completed}
+                    for connection in self.connections]
+
+    def Close(self):
+        failed = []
+        with self.lock:
+            self.closed = True
+            self.stop_event.set()
+            for connection in self.connections:
+                failed.extend(stream for stream, _, _ in connection.pending.values())
+                connection.pending = {}
+                connection.alive = False
+                if connection.sock is not None:
+                    try:
+                        connection.sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    connection.sock.close()
+        for stream in failed:
+            stream.SetException(ConnectionError("连接池已关闭！"))
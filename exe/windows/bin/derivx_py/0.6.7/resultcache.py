@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、定价任务结果缓存，同一交易、同一市场参数、同一 calc_greek 的重复请求直接返回已有结果，不再重新模拟；
+# 2、键为 (plugin_id, method_id, 规范化的 common_args 和 custom_args, 插件 .ini 文件内容, 库版本和插件版本) 的 sha1，
+#    common_args 解析后按键排序重新序列化，参数顺序、空白不同的相同任务得到同一键，超时、拆分等不影响结果的任务参数不参与；
+# 3、内存层按最近使用淘汰，按结果字节数计入 size_limit，命中时直接返回只读数组，原始参数字符串相同的请求跳过规范化，耗时为微秒级；
+# 4、设置 store_path 时另有磁盘层，数组结果以 .npy 保存，内存层未命中时读取并放回内存层，多个进程可共用同一目录；
+# 5、每个结果记录 common_args 中 market_fields 各项及调用方另给的 market 标签（如标的代码），Invalidate 按字段值显式删除内存层和磁盘层中的结果；
+# 6、Stats 返回命中、未命中、磁盘命中、淘汰次数及内存层字节数等统计；
+
+# 注意：缓存不感知插件 .dll 文件本身的变化，插件升级而版本号未变时需调用 Clear 清空缓存。
+
+import os
+import json
+import hashlib
+import threading
+import collections
+
+import numpy as np
+
+import codec
+import syscfg
+import tasker
+
+library_version = "0.6.7" # derivx_py 版本，结果格式或算法变化时缓存自动失效
+market_fields = ["sigma", "risk_free_rate", "basis_rate", "calc_price", "run_from"] # 记录用于 Invalidate 的市场参数
+key_args = ["plugin_id", "method_id", "common_args", "custom_args"] # 参与键计算的任务参数
+memo_limit = 4096 # 原始参数字符串到键的缓存数量
+store_suffix = ".npy"
+meta_suffix = ".json"
+
+def Normalize(args_json):
+    return json.loads(args_json) if isinstance(args_json, str) and args_json != "" else args_json
+
+def GetSize(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (int, float)):
+        return 8
+    return len(json.dumps(value))
+
+class ResultCache(object):
+    def __init__(self, size_limit = 256 * 1024 ** 2, store_path = None, plugin_path = "./plugins", version = library_version):
+        self.size_limit = size_limit # 内存层字节
+        self.store_path = store_path
+        self.plugin_path = plugin_path
+        self.version = version
+        self.plugin_versions = {plugin["name"]: plugin["version"] for plugin in syscfg.SysCfg().plugins}
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict() # {key: (value, size, market)}
+        self.size_total = 0
+        self.memo = collections.OrderedDict() # {原始参数: key}
+        self.ini_hashes = {} # {file: (mtime, size, sha1)}
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if store_path is not None:
+            os.makedirs(store_path, exist_ok = True)
+
+    # 插件 .ini 文件内容的 sha1，文件未变化时不重新读取，文件不存在时为空
+    def GetIniHash(self, plugin_id):
+        file = os.path.join(self.plugin_path, plugin_id, plugin_id + ".ini")
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return ""
+        cached = self.ini_hashes.get(file)
+        if cached is None or cached[0] != stat.st_mtime or cached[1] != stat.st_size:
+            with open(file, "rb") as f:
+                cached = (stat.st_mtime, stat.st_size, hashlib.sha1(f.read()).hexdigest())
+            self.ini_hashes[file] = cached
+        return cached[2]
+
+    # args 为 Tasker 或 Tasker.ToArgs() 参数字典
+    def MakeKey(self, args):
+        if isinstance(args, tasker.Tasker):
+            args = args.ToArgs()
+        ini_hash = self.GetIniHash(args["plugin_id"])
+        raw = (args["plugin_id"], args["method_id"], args["common_args"], tuple(args["custom_args"]), ini_hash)
+        with self.lock:
+            key = self.memo.get(raw)
+            if key is not None:
+                self.memo.move_to_end(raw)
+                return key
+        key = {name: args[name] for name in key_args}
+        key["common_args"] = Normalize(key["common_args"])
+        key["custom_args"] = [Normalize(custom) for custom in key["custom_args"]]
+        key["ini_hash"] = ini_hash
+        key["version"] = self.version
+        key["plugin_version"] = self.plugin_versions.get(args["plugin_id"], "")
+        key = hashlib.sha1(json.dumps(key, sort_keys = True, separators = (",", ":")).encode("utf-8")).hexdigest()
+        with self.lock:
+            self.memo[raw] = key
+            if len(self.memo) > memo_limit:
+                self.memo.popitem(last = False)
+        return key
+
+    # 结果的市场参数标签，取 common_args 中 market_fields 各项，market 中的项覆盖或补充
+    def GetMarket(self, args, market = None):
+        if isinstance(args, tasker.Tasker):
+            args = args.ToArgs()
+        common_args = Normalize(args["common_args"])
+        result = {name: common_args[name] for name in market_fields if isinstance(common_args, dict) and name in common_args}
+        result.update(market or {})
+        return result
+
+    def GetFile(self, key, suffix = store_suffix):
+        return os.path.join(self.store_path, key + suffix)
+
+    def Get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.store_path is not None and os.path.exists(self.GetFile(key)):
+            try:
+                value = np.load(self.GetFile(key))
+                with open(self.GetFile(key, meta_suffix), "r", encoding = "utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                value = None # 已被其他进程删除或未写完
+            if value is not None:
+                value = value.item() if meta.get("scalar", False) == True else value
+                with self.lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return self.PutMemory(key, value, meta.get("market", {}))
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def Put(self, key, value, market = None):
+        if isinstance(value, list):
+            value = np.array(value)
+        value = self.PutMemory(key, value, market or {})
+        if self.store_path is not None and (isinstance(value, np.ndarray) or isinstance(value, (int, float))):
+            self.Write(key, value, market or {})
+        return value
+
+    def PutMemory(self, key, value, market):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False # 命中时返回同一数组，防止调用方修改缓存内容
+        size = GetSize(value)
+        with self.lock:
+            if key in self.entries:
+                self.size_total -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size, market)
+            self.size_total += size
+            while self.size_total > self.size_limit and len(self.entries) > 1:
+                _, (_, size, _) = self.entries.popitem(last = False)
+                self.size_total -= size
+                self.evictions += 1
+        return value
+
+    # 先写元数据再写数组，均先写入临时文件再改名，存在 .npy 文件时元数据已完整
+    def Write(self, key, value, market):
+        meta = {"market": market, "scalar": not isinstance(value, np.ndarray)}
+        for suffix, data in [(meta_suffix, None), (store_suffix, np.asarray(value))]:
+            file = self.GetFile(key, suffix)
+            temp = "%s.%d.tmp" % (file, os.getpid())
+            with open(temp, "wb") as f:
+                if data is None:
+                    f.write(json.dumps(meta).encode("utf-8"))
+                else:
+                    np.save(f, data)
+            os.replace(temp, file)
+
+    # 同步执行任务，命中时直接返回缓存结果，否则以 kernel.AssignTask 计算后按 codec.ParseResult 解析并缓存
+    def AssignTask(self, kernel, task, market = None):
+        args = task.ToArgs() if isinstance(task, tasker.Tasker) else task
+        key = self.MakeKey(args)
+        value = self.Get(key)
+        if value is not None:
+            return value
+        result = kernel.AssignTask(args) # 同步
+        if result["return_code"] != 0:
+            raise ValueError("任务执行失败！%s %s" % (result["return_code"], result["return_info"]))
+        return self.Put(key, codec.ParseResult(result), self.GetMarket(args, market))
+
+    # 删除市场参数标签与 fields 各项均相同的结果，返回删除数量，fields 为空时全部删除
+    def Invalidate(self, **fields):
+        target = json.loads(json.dumps(fields)) # 与标签一样按 JSON 比较，元组、列表视为相同
+        def Match(market):
+            return all(name in market and market[name] == value for name, value in target.items())
+        removed = set()
+        with self.lock:
+            for key in [key for key, (_, _, market) in self.entries.items() if Match(market)]:
+                self.size_total -= self.entries.pop(key)[1]
+                removed.add(key)
+        if self.store_path is not None:
+            for name in os.listdir(self.store_path):
+                if not name.endswith(meta_suffix):
+                    continue
+                key = name[: -len(meta_suffix)]
+                try:
+                    with open(self.GetFile(key, meta_suffix), "r", encoding = "utf-8") as f:
+                        market = json.load(f).get("market", {})
+                except (OSError, ValueError):
+                    continue
+                if Match(market):
+                    for suffix in [store_suffix, meta_suffix]:
+                        try:
+                            os.remove(self.GetFile(key, suffix))
+                        except OSError:
+                            pass # Windows 下其他进程仍在读取的文件无法删除
+                    removed.add(key)
+        return len(removed)
+
+    def Clear(self):
+        return self.Invalidate()
+
+    def Stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total > 0 else 0.0, "entries": len(self.entries),
+                    "size_total": self.size_total, "size_limit": self.size_limit}
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、Python 端 NumPy 随机过程路径生成，入参与 test_derivx_stochastic_model 中的 Config_XXX 一致，method_id 与 func_make_data_xxx 一致；
+# 2、IterPaths 按 block_rows 条路径分块逐块返回，内存占用只与分块大小有关，可用于百万级路径的期末分布、直方图、收益等流式统计；
+# 3、随机数据由 pathgen 按固定行数分块生成，第 i 条路径始终使用第 i % rand_rows 行随机数据，结果与分块大小和起始路径无关；
+# 4、路径按 float64 计算，dtype 为 np.float32 时每块结果再转换，单精度结果同样与分块方式无关；
+# 5、config 含 rand_quasi 且为 True 时使用加扰 Sobol 准随机数据，每个点的维数为随机数据维数乘以 runs_step；
+# 6、每条路径 runs_step 列，第 j 列为第 j + 1 步的价格，CGBM 每条路径按标的展开为 asset 行，与插件结果排列一致；
+
+# 注意：GBB 布朗桥终点取对数价格的期望终值，HEST 的 sigma 为初始波动率，theta 为方差的长期均值，
+#      均采用完全截断 Euler 格式，SABR 价格触及零后吸收，USER 仅用于插件随机数据测试，此处不提供。
+
+import numpy as np
+
+import pathgen
+import vanilla_european
+
+func_make_data_gbm  = 1
+func_make_data_cgbm = 2
+func_make_data_gbb  = 3
+func_make_data_cir  = 4
+func_make_data_jdp  = 5
+func_make_data_hest = 6
+func_make_data_sabr = 7
+
+path_block_rows = 8192 # 默认每块路径数量，取 pathgen.rand_block_rows 的整数倍可避免随机数据分块重复生成
+
+jump_count_limit = 50 # JDP 单步跳跃次数上限
+
+# 各模型每步所需随机数据维数
+def GetRandDims(config, method_id):
+    if method_id == func_make_data_cgbm:
+        return int(config.asset)
+    if method_id == func_make_data_jdp:
+        return 3 # 扩散、跳跃次数、跳跃幅度
+    if method_id == func_make_data_hest or method_id == func_make_data_sabr:
+        return 2 # 价格、波动率
+    if method_id in (func_make_data_gbm, func_make_data_gbb, func_make_data_cir):
+        return 1
+    raise ValueError("不支持的随机过程模型：%d" % method_id)
+
+# 返回 [路径, 维, 步] 标准正态随机数据
+def MakeNormals(config, method_id, path_from, path_to):
+    runs_step = config.runs_step
+    dims = GetRandDims(config, method_id)
+    if config.rand_rows <= 0:
+        raise ValueError("随机数据行数 rand_rows 必须为正！")
+    rows, signs = pathgen.GetPathRows(config.rand_rows, getattr(config, "dual_smooth", False), path_from, path_to)
+    row_from, row_to = int(rows.min()), int(rows.max()) + 1
+    data = pathgen.MakeRandRows(config.rand_seed, dims * runs_step, row_from, row_to, getattr(config, "rand_quasi", False))
+    data = data[rows - row_from] * signs[:, None]
+    return data.reshape(len(rows), dims, runs_step)
+
+def MakePaths_GBM(config, normals):
+    dt = 1.0 / config.year_days
+    ratios = pathgen.MakeRatioPaths(normals[:, 0], config.sigma, config.risk_free_rate - config.basis_rate, dt)
+    return config.price * ratios
+
+def MakePaths_CGBM(config, normals):
+    asset, runs_step = int(config.asset), config.runs_step
+    dt = 1.0 / config.year_days
+    price = np.asarray(config.price, dtype = np.float64)[:, None]
+    sigma = np.asarray(config.sigma, dtype = np.float64)[:, None]
+    drift = (np.asarray(config.risk_free_rate, dtype = np.float64) - np.asarray(config.basis_rate, dtype = np.float64))[:, None]
+    chol = np.linalg.cholesky(np.asarray(config.corco, dtype = np.float64))
+    correlated = np.einsum("ij,pjs->pis", chol, normals) # 各标的随机数据按相关系数矩阵混合
+    steps = (drift - 0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * correlated
+    paths = price * np.exp(np.cumsum(steps, axis = 2))
+    return paths.reshape(-1, runs_step)
+
+def MakePaths_GBB(config, normals):
+    runs_step = config.runs_step
+    dt = 1.0 / config.year_days
+    sigma = config.sigma
+    drift = config.risk_free_rate - config.basis_rate - 0.5 * sigma * sigma
+    walk = np.cumsum(sigma * np.sqrt(dt) * normals[:, 0], axis = 1)
+    times = np.arange(1, runs_step + 1) / float(runs_step)
+    bridge = walk - np.multiply.outer(walk[:, -1], times) # 终点固定于对数价格期望终值
+    return config.price * np.exp(drift * dt * np.arange(1, runs_step + 1) + bridge)
+
+def MakePaths_CIR(config, normals):
+    runs_step = config.runs_step
+    dt = 1.0 / config.year_days
+    paths = np.empty((normals.shape[0], runs_step))
+    value = np.full(normals.shape[0], float(config.price))
+    for j in range(runs_step):
+        positive = np.maximum(value, 0.0)
+        value = value + config.kappa * (config.theta - positive) * dt + config.sigma * np.sqrt(positive * dt) * normals[:, 0, j]
+        paths[:, j] = value
+    return np.maximum(paths, 0.0)
+
+# 跳跃次数由第二维随机数据转为均匀分布后按泊松分布反函数得到
+def MakeJumpCounts(normals, lamb_dt):
+    uniform = vanilla_european.NormCdf(normals)
+    counts = np.zeros(normals.shape)
+    prob = np.exp(-lamb_dt)
+    cdf = prob
+    for k in range(1, jump_count_limit + 1):
+        above = uniform > cdf
+        if not above.any():
+            break
+        counts += above
+        prob *= lamb_dt / k
+        cdf += prob
+    return counts
+
+def MakePaths_JDP(config, normals):
+    dt = 1.0 / config.year_days
+    sigma, lamb, mu, delta = config.sigma, config.lamb, config.mu, config.delta
+    jump_mean = np.exp(mu + 0.5 * delta * delta) - 1.0
+    counts = MakeJumpCounts(normals[:, 1], lamb * dt)
+    jumps = counts * mu + delta * np.sqrt(counts) * normals[:, 2]
+    steps = (config.risk_free_rate - lamb * jump_mean - 0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * normals[:, 0] + jumps
+    return config.price * np.exp(np.cumsum(steps, axis = 1))
+
+def MakePaths_HEST(config, normals):
+    runs_step = config.runs_step
+    dt = 1.0 / config.year_days
+    rho = config.rho
+    paths = np.empty((normals.shape[0], runs_step))
+    log_price = np.full(normals.shape[0], np.log(config.price))
+    variance = np.full(normals.shape[0], float(config.sigma) ** 2)
+    for j in range(runs_step):
+        positive = np.maximum(variance, 0.0)
+        z_s = normals[:, 0, j]
+        z_v = rho * z_s + np.sqrt(1.0 - rho * rho) * normals[:, 1, j]
+        log_price += (config.risk_free_rate - 0.5 * positive) * dt + np.sqrt(positive * dt) * z_s
+        variance = variance + config.kappa * (config.theta - positive) * dt + config.sigma_sigma * np.sqrt(positive * dt) * z_v
+        paths[:, j] = log_price
+    return np.exp(paths)
+
+def MakePaths_SABR(config, normals):
+    runs_step = config.runs_step
+    dt = 1.0 / config.year_days
+    rho, nu = config.rho, config.sigma_sigma
+    paths = np.empty((normals.shape[0], runs_step))
+    forward = np.full(normals.shape[0], float(config.price))
+    alpha = np.full(normals.shape[0], float(config.sigma))
+    for j in range(runs_step):
+        z_f = normals[:, 0, j]
+        z_a = rho * z_f + np.sqrt(1.0 - rho * rho) * normals[:, 1, j]
+        forward = np.maximum(forward + alpha * np.power(forward, config.beta) * np.sqrt(dt) * z_f, 0.0)
+        alpha = alpha * np.exp(nu * np.sqrt(dt) * z_a - 0.5 * nu * nu * dt)
+        paths[:, j] = forward
+    return paths
+
+make_paths = {
+    func_make_data_gbm: MakePaths_GBM,
+    func_make_data_cgbm: MakePaths_CGBM,
+    func_make_data_gbb: MakePaths_GBB,
+    func_make_data_cir: MakePaths_CIR,
+    func_make_data_jdp: MakePaths_JDP,
+    func_make_data_hest: MakePaths_HEST,
+    func_make_data_sabr: MakePaths_SABR
+}
+
+def MakePaths(config, method_id, path_from, path_to, dtype = np.float64):
+    if method_id not in make_paths:
+        raise ValueError("不支持的随机过程模型：%d" % method_id)
+    if path_to <= path_from:
+        raise ValueError("路径区间无效！%d >= %d" % (path_from, path_to))
+    normals = MakeNormals(config, method_id, path_from, path_to)
+    return make_paths[method_id](config, normals).astype(dtype, copy = False)
+
+# 逐块返回 (起始路径, 路径块)，path_to 默认为 runs_size
+def IterPaths(config, method_id, block_rows = path_block_rows, dtype = np.float64, path_from = 0, path_to = None):
+    if block_rows <= 0:
+        raise ValueError("每块路径数量 block_rows 必须为正！")
+    if path_to is None:
+        path_to = config.runs_size
+    for block_from in range(path_from, path_to, block_rows):
+        block_to = min(block_from + block_rows, path_to)
+        yield block_from, MakePaths(config, method_id, block_from, block_to, dtype)
+
+# 期末价格直方图，流式累加各块计数，CGBM 按标的分别统计
+def CalcTerminalHistogram(config, method_id, bins, block_rows = path_block_rows, dtype = np.float64):
+    bins = np.asarray(bins, dtype = np.float64)
+    groups = int(config.asset) if method_id == func_make_data_cgbm else 1
+    counts = np.zeros((groups, len(bins) - 1), dtype = np.int64)
+    for _, paths in IterPaths(config, method_id, block_rows, dtype):
+        final = paths[:, -1].reshape(-1, groups)
+        for i in range(groups):
+            counts[i] += np.histogram(final[:, i], bins)[0]
+    return counts if groups > 1 else counts[0]
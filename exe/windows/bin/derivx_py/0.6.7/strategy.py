@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、香草期权组合（多腿）的理论价格和希腊值，各腿在同一 (array_s x array_t) 网格上按广播一次计算；
+# 2、每腿包含行权价 k、波动率 v、多空 is_long、看涨看跌 is_call、数量 quantity，空头腿的价格和希腊值取反；
+# 3、组合整体 is_long 为 False 时希腊值取反，价格不受影响，与示例中 CalcGreeks_Spread_XXX 一致；
+# 4、提供常用价差组合的腿构造，与示例中 CalcPrice_Spread_XXX 的组合方式一致；
+
+import numpy as np
+
+import vanilla_european
+
+def MakeLeg(k, v, is_long = True, is_call = True, quantity = 1.0):
+    return {"k":k, "v":v, "is_long":is_long, "is_call":is_call, "quantity":quantity}
+
+def MakeLegs_Spread_Bull_Call(k_l_c_l, k_h_c_s, v_l_c_l, v_h_c_s):
+    return [MakeLeg(k_l_c_l, v_l_c_l, True, True), MakeLeg(k_h_c_s, v_h_c_s, False, True)]
+
+def MakeLegs_Spread_Bull_Put(k_l_p_l, k_h_p_s, v_l_p_l, v_h_p_s):
+    return [MakeLeg(k_l_p_l, v_l_p_l, True, False), MakeLeg(k_h_p_s, v_h_p_s, False, False)]
+
+def MakeLegs_Spread_Bear_Call(k_l_c_s, k_h_c_l, v_l_c_s, v_h_c_l):
+    return [MakeLeg(k_l_c_s, v_l_c_s, False, True), MakeLeg(k_h_c_l, v_h_c_l, True, True)]
+
+def MakeLegs_Spread_Bear_Put(k_l_p_s, k_h_p_l, v_l_p_s, v_h_p_l):
+    return [MakeLeg(k_l_p_s, v_l_p_s, False, False), MakeLeg(k_h_p_l, v_h_p_l, True, False)]
+
+def MakeLegs_Spread_Butterfly_Call(k_l_c_l, k_m_c_s, k_h_c_l, v_l_c_l, v_m_c_s, v_h_c_l):
+    return [MakeLeg(k_l_c_l, v_l_c_l, True, True), MakeLeg(k_m_c_s, v_m_c_s, False, True, 2.0), MakeLeg(k_h_c_l, v_h_c_l, True, True)]
+
+def MakeLegs_Spread_Butterfly_Put(k_l_p_l, k_m_p_s, k_h_p_l, v_l_p_l, v_m_p_s, v_h_p_l):
+    return [MakeLeg(k_l_p_l, v_l_p_l, True, False), MakeLeg(k_m_p_s, v_m_p_s, False, False, 2.0), MakeLeg(k_h_p_l, v_h_p_l, True, False)]
+
+def MakeLegs_Spread_Box_Bull_Call_Bear_Put(k_l_cp_ls, k_h_cp_sl, v_l_cp_ls, v_h_cp_sl):
+    return MakeLegs_Spread_Bull_Call(k_l_cp_ls, k_h_cp_sl, v_l_cp_ls, v_h_cp_sl) + MakeLegs_Spread_Bear_Put(k_l_cp_ls, k_h_cp_sl, v_l_cp_ls, v_h_cp_sl)
+
+def MakeLegs_Spread_Box_Bull_Put_Bear_Call(k_l_pc_ls, k_h_pc_sl, v_l_pc_ls, v_h_pc_sl):
+    return MakeLegs_Spread_Bull_Put(k_l_pc_ls, k_h_pc_sl, v_l_pc_ls, v_h_pc_sl) + MakeLegs_Spread_Bear_Call(k_l_pc_ls, k_h_pc_sl, v_l_pc_ls, v_h_pc_sl)
+
+# 各腿参数排成首维，与 s、t 广播后首维为腿
+def GetLegArrays(legs, ndim):
+    if len(legs) == 0:
+        raise ValueError("期权组合至少需要一条腿！")
+    shape = (len(legs),) + (1,) * ndim
+    k = np.array([leg["k"] for leg in legs], dtype = np.float64).reshape(shape)
+    v = np.array([leg["v"] for leg in legs], dtype = np.float64).reshape(shape)
+    is_call = np.array([leg["is_call"] for leg in legs], dtype = bool).reshape(shape)
+    weight = np.array([leg.get("quantity", 1.0) * (1.0 if leg["is_long"] == True else -1.0) for leg in legs], dtype = np.float64).reshape(shape)
+    return k, v, is_call, weight
+
+def CalcStrategyArray(legs, s, r, q, t, is_long = True, is_futures = False, is_foreign = False, greeks = "pdgvtr", model = "bs"):
+    if model != "bs":
+        raise ValueError("期权组合暂不支持模型：%s" % model)
+    s, r, q, t = np.broadcast_arrays(*[np.asarray(item, dtype = np.float64) for item in (s, r, q, t)])
+    k, v, is_call, weight = GetLegArrays(legs, s.ndim)
+    result = vanilla_european.CalcGreeksArray(s, k, r, q, v, t, True, is_call, is_futures, is_foreign, greeks)
+    long_sign = 1.0 if is_long == True else -1.0
+    for greek in result:
+        net = np.sum(weight * result[greek], axis = 0)
+        result[greek] = net if greek == "p" else long_sign * net
+    return result
+
+# 价格维度 array_s 与到期时间维度 array_t 的组合曲面，每项结果为 len(array_s) x len(array_t)
+def CalcStrategySurface(legs, array_s, r, q, array_t, is_long = True, is_futures = False, is_foreign = False, greeks = "pdgvtr", model = "bs"):
+    s = np.asarray(array_s, dtype = np.float64)[:, None]
+    t = np.asarray(array_t, dtype = np.float64)[None, :]
+    return CalcStrategyArray(legs, s, r, q, t, is_long, is_futures, is_foreign, greeks, model)
@@ -26,6 +26,7 @@
 # 3、演示 tasker 任务信息创建；
 # 4、演示 同步模式 和 异步模式 的 AssignTask 任务执行调用；
 # 5、演示异步回调函数的编写和使用；
+# 6、演示有限差分 PDE 引擎计算凤凰结构客户票息、收益曲面和希腊值曲面；
 
 # 注意：版本 >= 0.5.14 的，编译环境 Visual Studio 从 17.9.X 升级为 17.10.X 后，
 #      对于 Python 3.6、3.7、3.8、3.9、3.10、3.11 存在一些兼容问题，
@@ -386,6 +387,13 @@ def Test_DerivX_Autocall_Phoenix():
         #    ret_wait = event_task_finish.wait(timeout = tasker_test.timeout_wait) # 等待任务结果
         #    if ret_wait != True:
         #        print("等待任务结果超时！", tasker_id)
+    
+    # 有限差分 PDE 引擎，coupon_rate 为单次票息，收益曲面和全部希腊值曲面一次逆推得到，不支持涨跌停限制
+    #config.price_limit_style = 0
+    #import autocall
+    #print("coupon:", autocall.CalcCoupon(config, calc_mode = autocall.calc_mode_pde))
+    #result = autocall.CalcGreeksMulti(config, ["p"] + list(greek_flags.values()), autocall.calc_mode_pde)
+    #FigureResult(config, result["p"])
 
 if __name__ == "__main__":
     Test_DerivX_Autocall_Phoenix()
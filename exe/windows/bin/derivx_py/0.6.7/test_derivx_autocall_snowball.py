@@ -26,6 +26,21 @@
 # 3、演示 tasker 任务信息创建；
 # 4、演示 同步模式 和 异步模式 的 AssignTask 任务执行调用；
 # 5、演示异步回调函数的编写和使用；
+# 6、演示 NumPy 引擎同一组路径一次计算多个希腊值；
+# 7、演示 NumPy 引擎一次模拟求解客户票息及收支现值关于票息的直线；
+# 8、演示 NumPy 引擎随机数据内存映射文件存储，多个任务和进程共用；
+# 9、演示 NumPy 引擎多线程加扰 Sobol 准随机数据；
+# 10、演示 NumPy 引擎布朗桥路径构造；
+# 11、演示 NumPy 引擎只模拟敲出观察日的快速计算方式；
+# 12、演示有限差分 PDE 引擎一次逆推计算收益曲面和全部希腊值曲面；
+# 13、演示 NumPy 引擎读取插件 ini 差分计算设置及单个任务覆盖差分设置；
+# 14、演示 NumPy 引擎按路径导数和似然比一次模拟估计希腊值；
+# 15、演示 NumPy 引擎逐日增量重估，保存估值状态并按实际收盘价前移；
+# 16、演示 NumPy 引擎交易组合按模拟参数分组批量估值；
+# 17、演示多进程执行器，每个工作进程各自持有 Kernel，一个驱动进程使用全部 CPU 核心；
+# 18、演示 asyncio 方式的 AssignTask，一个事件循环同时等待多个任务；
+# 19、演示定价任务结果缓存，相同任务直接返回已有结果，按市场参数显式失效；
+# 20、演示带类型检查的 __slots__ 参数对象，只重新编码变化的字段，情景参数快速复制；
 
 # 注意：版本 >= 0.5.14 的，编译环境 Visual Studio 从 17.9.X 升级为 17.10.X 后，
 #      对于 Python 3.6、3.7、3.8、3.9、3.10、3.11 存在一些兼容问题，
@@ -42,6 +57,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
+import codec
 import syscfg
 import tasker
 # import cyberx
@@ -170,7 +186,7 @@ def OnResult_Coupon(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("coupon:", result)
     except Exception as e:
         print("OnResult_Coupon 异常！%s" % e)
@@ -181,7 +197,7 @@ def OnResult_Payoff(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("payoff:", result)
     except Exception as e:
         print("OnResult_Payoff 异常！%s" % e)
@@ -192,7 +208,7 @@ def OnResult_Greeks(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("greeks:", result)
     except Exception as e:
         print("OnResult_Greeks 异常！%s" % e)
@@ -208,6 +224,7 @@ def Test_DerivX_Autocall_Snowball():
     config.rand_seed = [0, 1, 2, 3, 4, 5, 6, 7] # 随机数据种子 # 非负整数，有效位数不超逻辑处理器数量，目前 quasi 仅第一位有效
     
     config.dual_smooth = True # 对偶平滑路径
+    #config.brownian_bridge = True # 布朗桥构造路径，期末和敲出观察日优先使用随机数据前几列，配合 rand_quasi 使用，仅 NumPy 引擎支持
     config.runs_size = 100000 # 模拟路径数量
     config.runs_step = 488 # 价格变动步数
     config.year_days = 244 # 年交易日数量
@@ -331,7 +348,7 @@ def Test_DerivX_Autocall_Snowball():
     #if result["return_code"] != 0:
     #    print(result["return_code"], result["return_info"])
     #else:
-    #    result = json.loads(result["result_data"])
+    #    result = codec.ParseResult(result)
     #    print("coupon:", result)
     
     #event_task_finish.clear()
@@ -345,15 +362,21 @@ def Test_DerivX_Autocall_Snowball():
     #    if ret_wait != True:
     #        print("等待任务结果超时！", tasker_id)
     
+    # NumPy 引擎，一次模拟得到收支现值关于票息的直线，直接读出不同目标收益对应的客户票息
+    #import autocall
+    #line = autocall.CalcCouponLine(config)
+    #print("coupon:", autocall.SolveCoupon(line), "line:", line)
+    #print("coupon at margins:", autocall.SolveCoupon(line, [0.0, 0.005, 0.01]))
+    
     tasker_test.method_id = func_calc_payoff
     
     #result = kernel.AssignTask(tasker_test.ToArgs()) # 同步
     #if result["return_code"] != 0:
     #    print(result["return_code"], result["return_info"])
     #else:
-    #    result = json.loads(result["result_data"])
-    #    FigureResult(config, np.array(result))
-    #    ExportResult(config, np.array(result), "/export_payoff.xlsx")
+    #    result = codec.ParseResult(result)
+    #    FigureResult(config, result)
+    #    ExportResult(config, result, "/export_payoff.xlsx")
     
     #event_task_finish.clear()
     #result = kernel.AssignTask(tasker_test.ToArgs(), OnResult_Payoff) # 异步
@@ -378,9 +401,9 @@ def Test_DerivX_Autocall_Snowball():
         #if result["return_code"] != 0:
         #    print(result["return_code"], result["return_info"])
         #else:
-        #    result = json.loads(result["result_data"])
-        #    FigureResult(config, np.array(result))
-        #    ExportResult(config, np.array(result), "/export_greeks_%s.xlsx" % name)
+        #    result = codec.ParseResult(result)
+        #    FigureResult(config, result)
+        #    ExportResult(config, result, "/export_greeks_%s.xlsx" % name)
         
         #event_task_finish.clear()
         #result = kernel.AssignTask(tasker_test.ToArgs(), OnResult_Greeks) # 异步
@@ -392,6 +415,94 @@ def Test_DerivX_Autocall_Snowball():
         #    ret_wait = event_task_finish.wait(timeout = tasker_test.timeout_wait) # 等待任务结果
         #    if ret_wait != True:
         #        print("等待任务结果超时！", tasker_id)
+    
+    # NumPy 引擎，rand_quasi 为 True 时使用加扰 Sobol 准随机数据，按线程数分段并行生成，结果与线程数无关，rand_seed 全部种子均有效
+    #import sobol
+    #sobol.local_cpu_thread = syscfg.SysCfg().local_cpu_thread
+    
+    # NumPy 引擎，随机数据写入内存映射文件，之后参数相同的任务直接读取，目录总大小超限时淘汰最久未用的文件
+    #import pathgen
+    #import pathstore
+    #pathgen.path_store = pathstore.PathStore("D:/derivx_store", size_limit = 16 * 1024 ** 3)
+    
+    # NumPy 引擎，同一组随机数据一次计算全部希腊值，与逐个提交任务相比不重复生成路径
+    #import autocall
+    #result = autocall.CalcGreeksMulti(config, list(greek_flags.values()))
+    #for name, flag in greek_flags.items():
+    #    FigureResult(config, result[flag])
+    #    ExportResult(config, result[flag], "/export_greeks_%s.xlsx" % name)
+    
+    # NumPy 引擎，只模拟敲出观察日和到期日，观察日之间的逐日敲入按布朗桥条件抽样判断，不支持涨跌停限制
+    #import autocall
+    #result = autocall.CalcPayoff(config, autocall.calc_mode_observe)
+    #FigureResult(config, result)
+    #print("coupon:", autocall.CalcCoupon(config, calc_mode = autocall.calc_mode_observe))
+    
+    # NumPy 引擎，差分计算设置取自插件 ini 文件，单个任务可只覆盖部分项，各差分情景与基准共用同一组随机数据
+    #import autocall
+    #autocall.diff_settings = autocall.LoadDiffSettings("./plugins/derivx_autocall_snowball/derivx_autocall_snowball.ini")
+    #config.diff_settings = {"d": {"size": 0.005}, "t": {"size": 2.0}} # Delta 价格变动 0.5%，Theta 向前 2 天差分，向后、中心差分需 run_from 不小于差分天数
+    #result = autocall.CalcGreeksMulti(config, list(greek_flags.values()))
+    #config.diff_settings = {}
+    
+    # 有限差分 PDE 引擎，没有模拟噪声，收益曲面和全部希腊值曲面一次逆推得到，不支持涨跌停限制
+    #import autocall
+    #result = autocall.CalcGreeksMulti(config, ["p"] + list(greek_flags.values()), autocall.calc_mode_pde)
+    #for name, flag in greek_flags.items():
+    #    FigureResult(config, result[flag])
+    
+    # NumPy 引擎，平滑估计方式，Delta、Vega 按路径导数、Gamma 按似然比估计，不做价格、波动率偏移，障碍附近 Gamma 噪声远小于差分方式
+    #import autocall
+    #result = autocall.CalcGreeksMulti(config, ["d", "g", "v"], autocall.calc_mode_smooth)
+    #FigureResult(config, result["g"])
+    
+    # NumPy 引擎，逐日增量重估，首日建立状态，之后每日传入实际收盘价前移一天，剩余期限沿用同一组路径，不重新模拟
+    #import autocall_daily
+    #state = autocall_daily.DailyState(config) # 或 autocall_daily.LoadState("D:/derivx_state/trade_001.npz", config)，config.run_from 为保存时的 run_from
+    #state.Advance(98.5) # 第 run_from + 1 个交易日的实际收盘价
+    #state.config.calc_price = [98.5]
+    #state.config.sigma = 0.16 # 市场参数变化时由保存的布朗路径重建路径
+    #result = state.CalcGreeksMulti(["p"] + list(greek_flags.values()))
+    #state.Save("D:/derivx_state/trade_001.npz")
+    
+    # NumPy 引擎，交易组合批量估值，模拟参数相同的交易共用同一组路径，结果按输入顺序逐笔返回
+    #configs = [config, Config()] # 各交易的 Config，可混合雪球和凤凰结构
+    #import book
+    #results = book.CalcBook(configs, ["p", "d", "c"])
+    #print("groups:", len(book.GroupBook(configs)), "coupon:", [result["c"] for result in results])
+    
+    # 多进程执行器，Tasker 任务在各工作进程的 Kernel 中同步执行，也可提交 NumPy 引擎函数，affinity 相同的任务优先在同一进程执行
+    #import autocall
+    #import executor
+    #with executor.ProcessExecutor(workers = 8, kernel_threads = 8) as pool:
+    #    future = pool.Submit(tasker_test, affinity = config.sigma)
+    #    print("coupon:", codec.ParseResult(future.result()))
+    #    for result in pool.Map([(autocall.CalcCoupon, config)] * 4):
+    #        print("coupon:", result)
+    
+    # asyncio 方式，多个任务同时在途，超时的任务以 CancelTask 取消
+    #import asyncio
+    #import aiokernel
+    #async_kernel = aiokernel.AsyncKernel(kernel, concurrency = 16)
+    #results = asyncio.get_event_loop().run_until_complete(async_kernel.AssignTasks([tasker_test] * 4, timeout = tasker_test.timeout_wait, return_exceptions = True))
+    #for result in results:
+    #    print(result if isinstance(result, Exception) else codec.ParseResult(result))
+    
+    # 定价任务结果缓存，相同插件、方法、参数、ini 设置和版本的任务直接返回已有结果，可另设磁盘层
+    #import resultcache
+    #cache = resultcache.ResultCache(size_limit = 512 * 1024 ** 2, store_path = "D:/derivx_cache")
+    #result = cache.AssignTask(kernel, tasker_test, market = {"underlying": "000905.SH"}) # 已解析的结果
+    #cache.Invalidate(underlying = "000905.SH") # 标的行情变化时删除相关结果
+    #print(cache.Stats())
+    
+    # 带类型检查的参数对象，赋值时检查类型和取值范围，ToJson 结果与 Config 相同，只改 calc_greek 时不重新编码其他字段
+    #import typedcfg
+    #typed = typedcfg.FromObject(typedcfg.SnowballConfig, config)
+    #typed.Validate()
+    #for flag in greek_flags.values():
+    #    typed.calc_greek = flag
+    #    tasker_test.common_args = typed.ToJson()
+    #scenarios = [typed.Clone(sigma = sigma) for sigma in [0.14, 0.16, 0.18]] # 情景参数共用已编码字段
 
 if __name__ == "__main__":
     Test_DerivX_Autocall_Snowball()
@@ -26,6 +26,7 @@
 # 3、演示使用 GetKernel 方法获取 kernel 实例；
 # 4、演示 tasker 任务信息创建；
 # 5、演示 同步模式 AssignTask 任务执行调用；
+# 6、演示 NumPy 引擎分块流式生成路径，可输出 float32，结果与分块大小无关；
 
 # 注意：版本 >= 0.5.14 的，编译环境 Visual Studio 从 17.9.X 升级为 17.10.X 后，
 #      对于 Python 3.6、3.7、3.8、3.9、3.10、3.11 存在一些兼容问题，
@@ -258,6 +259,12 @@ def Test_Stochastic_Model_GBM():
         result = json.loads(result["result_data"])
         ShowPlot_Frequency(np.array(result), "Final-Price-Frequency", "Final-Price")
         ShowPlot_Distribution(np.array(result), 1000, config.runs_step, "Price - Steps", "Price")
+    
+    # NumPy 引擎，分块流式生成路径，内存占用只与 block_rows 有关
+    #import stochastic
+    #final = np.concatenate([paths[:, -1] for _, paths in stochastic.IterPaths(config, func_make_data_gbm, block_rows = 8192, dtype = np.float32)])
+    #print(final.mean(), final.std())
+    #print(stochastic.CalcTerminalHistogram(config, func_make_data_gbm, np.linspace(0.0, 3.0, 51)))
 
 def Test_Stochastic_Model_CGBM():
     config = Config_CGBM()
@@ -26,6 +26,9 @@
 # 3、演示通过 Create 方法获取执行模块实例；
 # 4、演示 直接模式 DirectCall 任务执行调用；
 # 5、演示任务参数序列化和任务结果反序列化的封装；
+# 6、演示 NumPy 向量化求解整条期权链的隐含波动率（基于 BAW 公式）；
+# 7、演示 NumPy 向量化外推二叉树的价格和希腊值曲面计算，约 400 步即可达到普通二叉树 10000 步的精度；
+# 8、演示 NumPy 向量化 BAW 模型希腊值曲面计算，临界价格每个到期时间只求解一次并缓存；
 
 # 注意：模型 CalcPrice 计算所得的价格（期权费）是绝对金额，非年化百分比。
 
@@ -108,6 +111,9 @@ def Test_DerivX_Vanilla_American():
     #result = CalcIV(module, "ba", "n", 0.1566, 5.29, 6.0, 0.04, 0.0, 0.5, True) # Newton 法
     #result = CalcIV(module, "ba", "n", 0.7503, 5.29, 6.0, 0.04, 0.0, 0.5, False) # Newton 法
     #print(result)
+    #import implied_vol
+    #result, status = implied_vol.CalcIVArray("ba", [0.1566, 0.7503], 5.29, 6.0, 0.04, 0.0, 0.5, [True, False]) # 整条期权链一次求解
+    #print(result, status)
     
     #result = CalcPrice(module, "ba", 100.0, 100.0, 0.03, 0.08 - 0.03, 0.2, 1.0, True)
     #result = CalcPrice(module, "ba", 42.0, 40.0, 0.1, 0.0, 0.2, 0.5, True)
@@ -148,6 +154,9 @@ def Test_DerivX_Vanilla_American():
     #print(result)
     #result = CalcPrice(module, "bt", 50.0, 50.0, 0.1, 0.03, 0.4, 0.4167, False)
     #print(result)
+    #import vanilla_american
+    #result = vanilla_american.CalcTreePriceArray(50.0, 50.0, 0.1, 0.03, 0.4, 0.4167, [True, False]) # 外推二叉树，看涨看跌一次计算
+    #print(result)
     
     #result = CalcGreeks(module, "ba", "d", 49.0, 50.0, 0.05, 0.0, 0.2, 0.3846, True, True)
     #result = CalcGreeks(module, "ba", "g", 49.0, 50.0, 0.05, 0.0, 0.2, 0.3846, True)
@@ -198,12 +207,17 @@ def Test_DerivX_Vanilla_American():
     #surface = CalcGreeksSurface(module, "ba", "t", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False)
     #surface = CalcGreeksSurface(module, "ba", "r", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False, False, False)
     #FigureResult(np.array(array_s), np.array(array_t), np.array(surface))
+    #import vanilla_american
+    #surface = vanilla_american.CalcGreeksSurfaceArray("d", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False) # 价格差分直接使用缓存的临界价格
+    #FigureResult(np.array(array_s), np.array(array_t), surface)
     #surface = CalcGreeksSurface(module, "bt", "d", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False)
     #surface = CalcGreeksSurface(module, "bt", "g", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True)
     #surface = CalcGreeksSurface(module, "bt", "v", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True)
     #surface = CalcGreeksSurface(module, "bt", "t", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False)
     #surface = CalcGreeksSurface(module, "bt", "r", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False, False, False)
     #FigureResult(np.array(array_s), np.array(array_t), np.array(surface))
+    #surface = vanilla_american.CalcTreeGreeksSurfaceArray("d", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, False) # 全部网格点一次逆推，无需减少计算时间点
+    #FigureResult(np.array(array_s), np.array(array_t), surface)
 
 if __name__ == "__main__":
     Test_DerivX_Vanilla_American()
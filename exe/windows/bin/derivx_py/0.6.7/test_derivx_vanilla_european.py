@@ -27,6 +27,9 @@
 # 4、演示通过 Create 方法获取执行模块实例；
 # 5、演示 直接模式 DirectCall 任务执行调用；
 # 6、演示任务参数序列化和任务结果反序列化的封装；
+# 7、演示 NumPy 向量化 BS 模型一次计算希腊值曲面；
+# 8、演示 NumPy 向量化求解整条期权链的隐含波动率；
+# 9、演示 NumPy 向量化期权组合一次计算全部腿的价格和希腊值曲面；
 
 # 注意：模型 CalcPrice 计算所得的价格（期权费）是绝对金额，非年化百分比。
 
@@ -204,6 +207,9 @@ def Test_DerivX_Vanilla_European():
     #result = CalcIV(module, "bs", "n", 0.1566, 5.29, 6.0, 0.04, 0.0, 0.5, True) # Newton 法
     #result = CalcIV(module, "bs", "n", 0.7503, 5.29, 6.0, 0.04, 0.0, 0.5, False) # Newton 法
     #print(result)
+    #import implied_vol
+    #result, status = implied_vol.CalcIVArray("bs", [0.1566, 0.7503], 5.29, 6.0, 0.04, 0.0, 0.5, [True, False]) # 整条期权链一次求解
+    #print(result, status)
     
     #result = CalcPrice(module, "bs", 100.0, 100.0, 0.03, 0.08 - 0.03, 0.2, 1.0, True)
     #result = CalcPrice(module, "bs", 42.0, 40.0, 0.1, 0.0, 0.2, 0.5, True)
@@ -279,6 +285,9 @@ def Test_DerivX_Vanilla_European():
     #surface = CalcGreeksSurface(module, "bs", "t", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, True)
     #surface = CalcGreeksSurface(module, "bs", "r", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, True, False, False)
     #FigureResult(np.array(array_s), np.array(array_t), np.array(surface))
+    #import vanilla_european
+    #surface = vanilla_european.CalcGreeksSurfaceArray("d", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, True) # 与 "bs" 模型结果一致
+    #FigureResult(np.array(array_s), np.array(array_t), surface)
     #surface = CalcGreeksSurface(module, "bt", "d", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True, True)
     #surface = CalcGreeksSurface(module, "bt", "g", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True)
     #surface = CalcGreeksSurface(module, "bt", "v", array_s, 50.0, 0.05, 0.0, 0.2, array_t, True)
@@ -321,6 +330,10 @@ def Test_DerivX_Vanilla_European():
     #surface = CalcGreeksSurface_Spread_Bull_Call(module, model, "t", array_s, k_l, k_h, r, q, v_l, v_h, array_t, is_long)
     #surface = CalcGreeksSurface_Spread_Bull_Call(module, model, "r", array_s, k_l, k_h, r, q, v_l, v_h, array_t, is_long)
     #FigureResult(np.array(array_s), np.array(array_t), surface)
+    #import strategy
+    #legs = strategy.MakeLegs_Spread_Butterfly_Call(k_l, k_m, k_h, v_l, v_m, v_h) # 也可用 strategy.MakeLeg 自行组合任意多腿
+    #surfaces = strategy.CalcStrategySurface(legs, array_s, r, q, array_t, is_long) # 价格和全部希腊值一次算出
+    #FigureResult(np.array(array_s), np.array(array_t), surfaces["d"])
 
 if __name__ == "__main__":
     Test_DerivX_Vanilla_European()
@@ -22,6 +22,8 @@
 
 # 示例说明：
 # 1、测试远程执行调用
+# 2、演示多服务器远程任务连接池，按在途任务数量分配，心跳丢失时改投其他服务器
+# 3、演示连接池大结果分块传输，边接收边按行处理
 
 # 注意：版本 >= 0.5.14 的，编译环境 Visual Studio 从 17.9.X 升级为 17.10.X 后，
 #      对于 Python 3.6、3.7、3.8、3.9、3.10、3.11 存在一些兼容问题，
@@ -135,6 +137,22 @@ def Test_Remote():
     
     result = kernel.StopRemote() #
     print(result["return_code"], result["return_info"])
+    
+    # 多服务器连接池，各计算服务器上运行 remotepool.TaskServer(address = "0.0.0.0", port = 10101)，由其本机 Kernel 执行任务
+    # 未给出服务器列表时取 syscfg 的 network_client 中的 clients，心跳间隔、连接超时和数据长度同样取自 network_client，也可在本机不同端口启动多个 TaskServer 测试
+    #import remotepool
+    #pool = remotepool.RemotePool([{"address": "192.168.1.11", "port": 10101}, {"address": "192.168.1.12", "port": 10101}])
+    #futures = [pool.Submit(tasker_test) for i in range(1000)] # 多个任务同时在途
+    #for future in futures:
+    #    result = future.result(timeout = tasker_test.timeout_wait)
+    #    if result["return_code"] != 0:
+    #        print(result["return_code"], result["return_info"])
+    #stream = pool.SubmitStream(tasker_test) # 数值数组结果按块读入预分配数组，不受 data_length 限制
+    #for rows in stream.IterRows(timeout = tasker_test.timeout_wait):
+    #    print(rows.shape) # 已收到的行
+    #print(stream.Result()["result_data"].shape)
+    #print(pool.Stats())
+    #pool.Close()
 
 if __name__ == "__main__":
     Test_Remote()
@@ -44,6 +44,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
+import codec
 import syscfg
 import tasker
 # import cyberx
@@ -172,7 +173,7 @@ def OnResult_Coupon(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("coupon:", result)
     except Exception as e:
         print("OnResult_Coupon 异常！%s" % e)
@@ -183,7 +184,7 @@ def OnResult_Payoff(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("payoff:", result)
     except Exception as e:
         print("OnResult_Payoff 异常！%s" % e)
@@ -194,7 +195,7 @@ def OnResult_Greeks(result):
         if result["return_code"] != 0:
             print(result["return_code"], result["return_info"])
         else:
-            result = json.loads(result["result_data"])
+            result = codec.ParseResult(result)
             print("greeks:", result)
     except Exception as e:
         print("OnResult_Greeks 异常！%s" % e)
@@ -336,7 +337,7 @@ def Test_DerivX_Autocall_Snowball():
     #if result["return_code"] != 0:
     #    print(result["return_code"], result["return_info"])
     #else:
-    #    result = json.loads(result["result_data"])
+    #    result = codec.ParseResult(result)
     #    print("coupon:", result)
     
     #event_task_finish.clear()
@@ -356,9 +357,9 @@ def Test_DerivX_Autocall_Snowball():
     #if result["return_code"] != 0:
     #    print(result["return_code"], result["return_info"])
     #else:
-    #    result = json.loads(result["result_data"])
-    #    FigureResult(config, np.array(result))
-    #    ExportResult(config, np.array(result), "/export_payoff.xlsx")
+    #    result = codec.ParseResult(result)
+    #    FigureResult(config, result)
+    #    ExportResult(config, result, "/export_payoff.xlsx")
     
     #event_task_finish.clear()
     #result = kernel.AssignTask(tasker_test.ToArgs(), OnResult_Payoff) # 异步
@@ -383,9 +384,9 @@ def Test_DerivX_Autocall_Snowball():
         #if result["return_code"] != 0:
         #    print(result["return_code"], result["return_info"])
         #else:
-        #    result = json.loads(result["result_data"])
-        #    FigureResult(config, np.array(result))
-        #    ExportResult(config, np.array(result), "/export_greeks_%s.xlsx" % name)
+        #    result = codec.ParseResult(result)
+        #    FigureResult(config, result)
+        #    ExportResult(config, result, "/export_greeks_%s.xlsx" % name)
         
         #event_task_finish.clear()
         #result = kernel.AssignTask(tasker_test.ToArgs(), OnResult_Greeks) # 异步
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、带类型的 __slots__ 参数对象，MakeConfigClass 按字段列表生成参数类，SnowballConfig 与 test_derivx_autocall_snowball 中的 Config 字段、顺序和默认值一致；
+# 2、赋值时按字段类型转换并检查取值范围，NumPy 标量和数组转为 Python 类型，浮点字段的整数输入仍为整数，序列字段保存为元组，拼错的字段名直接抛出 AttributeError；
+# 3、字段值为 Python 数值时 ToJson 与原 Config 的 json.dumps(self.__dict__) 结果逐字节相同，各字段已编码的片段缓存在对象中，赋值只标记该字段，
+#    序列化时只重新编码变化的字段再拼接，未变化时直接返回上次结果，希腊值循环中只改 calc_greek 时不再重新编码整个参数；
+# 4、Clone 浅拷贝字段值并共用已编码片段，修改时才复制片段列表，用于情景偏移等大量相近参数；
+# 5、对象没有 __dict__，字段值为共用的 Python 对象，十万个参数对象的内存约为 __dict__ 方式的几分之一；
+# 6、可选字段（如 brownian_bridge、diff_settings）未赋值时不参与序列化，getattr 取默认值的写法不变；
+
+# 注意：字典字段（如 diff_settings）原地修改不会被记录，需整体重新赋值；Validate 另做字段之间的检查，赋值时不做。
+
+import json
+
+import numpy as np
+
+kind_int = 1
+kind_float = 2
+kind_bool = 3
+kind_str = 4
+kind_ints = 5 # 整数序列
+kind_floats = 6 # 浮点数序列
+kind_dict = 7
+
+class Field(object):
+    def __init__(self, name, kind, default = None, low = None, high = None, choices = None, optional = False):
+        self.name = name
+        self.kind = kind
+        self.default = default # optional 为 True 时不使用
+        self.low = low # 下界（含），序列字段检查每个元素
+        self.high = high # 上界（含）
+        self.choices = choices
+        self.optional = optional
+        self.prefix = json.dumps(name) + ": "
+
+def CheckRange(field, value):
+    if field.low is not None and value < field.low or field.high is not None and value > field.high:
+        low = "-inf" if field.low is None else field.low
+        high = "inf" if field.high is None else field.high
+        raise ValueError("参数 %s 取值超出范围！%s 不在 [%s, %s] 内" % (field.name, value, low, high))
+    if field.choices is not None and value not in field.choices:
+        raise ValueError("参数 %s 取值无效！%s 不在 %s 中" % (field.name, value, field.choices))
+
+def ConvertScalar(field, kind, value):
+    if kind == kind_bool:
+        if not isinstance(value, (bool, np.bool_)):
+            raise ValueError("参数 %s 类型无效，应为布尔值！%r" % (field.name, value))
+        return bool(value)
+    if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.integer, np.floating)):
+        raise ValueError("参数 %s 类型无效，应为数值！%r" % (field.name, value))
+    if kind == kind_int:
+        if value != int(value):
+            raise ValueError("参数 %s 类型无效，应为整数！%r" % (field.name, value))
+        value = int(value)
+    elif isinstance(value, (int, np.integer)):
+        value = int(value) # 浮点字段的整数输入保持为整数，序列化结果与原 Config 一致
+    else:
+        value = float(value)
+    CheckRange(field, value)
+    return value
+
+def Convert(field, value):
+    if field.kind == kind_str:
+        if not isinstance(value, str):
+            raise ValueError("参数 %s 类型无效，应为字符串！%r" % (field.name, value))
+        CheckRange(field, value)
+        return value
+    if field.kind == kind_dict:
+        if not isinstance(value, dict):
+            raise ValueError("参数 %s 类型无效，应为字典！%r" % (field.name, value))
+        return value
+    if field.kind == kind_ints or field.kind == kind_floats:
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("参数 %s 类型无效，应为序列！%r" % (field.name, value))
+        kind = kind_int if field.kind == kind_ints else kind_float
+        return tuple(ConvertScalar(field, kind, item) for item in value)
+    return ConvertScalar(field, field.kind, value)
+
+class ConfigBase(object):
+    __slots__ = ("_parts", "_owned", "_dirty", "_json")
+
+    def __init__(self, **values):
+        setter = object.__setattr__
+        for name, default in self._defaults:
+            setter(self, name, default)
+        setter(self, "_parts", self._default_parts) # 与类默认值共用，修改时复制
+        setter(self, "_owned", False)
+        setter(self, "_dirty", None)
+        setter(self, "_json", self._default_json)
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name[0] == "_":
+            object.__setattr__(self, name, value) # copy、pickle 恢复内部状态
+            return
+        index = self._index.get(name)
+        if index is None:
+            raise AttributeError("%s 没有参数 %s！" % (type(self).__name__, name))
+        object.__setattr__(self, name, Convert(self._fields[index], value))
+        if self._dirty is None:
+            object.__setattr__(self, "_dirty", set())
+        self._dirty.add(index)
+        object.__setattr__(self, "_json", None)
+
+    def ToJson(self):
+        if self._json is None:
+            if self._owned != True:
+                object.__setattr__(self, "_parts", list(self._parts))
+                object.__setattr__(self, "_owned", True)
+            parts = self._parts
+            for index in self._dirty:
+                field = self._fields[index]
+                parts[index] = field.prefix + json.dumps(getattr(self, field.name)) if hasattr(self, field.name) else None
+            object.__setattr__(self, "_dirty", None)
+            object.__setattr__(self, "_json", "{" + ", ".join(part for part in parts if part is not None) + "}")
+        return self._json
+
+    def ToDict(self):
+        return {field.name: getattr(self, field.name) for field in self._fields if hasattr(self, field.name)}
+
+    # 浅拷贝，已编码片段两者共用，values 为新对象上要修改的字段
+    def Clone(self, **values):
+        other = object.__new__(type(self))
+        setter = object.__setattr__
+        for name, _ in self._defaults:
+            setter(other, name, getattr(self, name))
+        for name in self._optionals:
+            if hasattr(self, name):
+                setter(other, name, getattr(self, name))
+        setter(other, "_parts", self._parts)
+        setter(other, "_owned", False)
+        setter(self, "_owned", False)
+        setter(other, "_dirty", None if self._dirty is None else set(self._dirty))
+        setter(other, "_json", self._json)
+        for name, value in values.items():
+            setattr(other, name, value)
+        return other
+
+    def __getstate__(self):
+        return self.ToDict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+# 按字段列表生成参数类，validate 为字段之间的检查函数，可为 None，可选字段放在最后，与原 Config 先初始化后另行赋值时的顺序一致
+def MakeConfigClass(name, fields, validate = None):
+    for field in fields:
+        field.default = None if field.optional == True else Convert(field, field.default)
+    parts = [None if field.optional == True else field.prefix + json.dumps(field.default) for field in fields]
+    members = {
+        "__slots__": tuple(field.name for field in fields),
+        "_fields": tuple(fields),
+        "_index": {field.name: index for index, field in enumerate(fields)},
+        "_defaults": tuple((field.name, field.default) for field in fields if field.optional != True),
+        "_optionals": tuple(field.name for field in fields if field.optional == True),
+        "_default_parts": parts,
+        "_default_json": "{" + ", ".join(part for part in parts if part is not None) + "}",
+        "Validate": (lambda self: validate(self)) if validate is not None else (lambda self: None)
+    }
+    return type(name, (ConfigBase,), members)
+
+# 由原 __dict__ 方式的 Config 等对象生成参数对象，source 中多余的属性抛出 AttributeError
+def FromObject(config_class, source):
+    return config_class(**vars(source))
+
+def ValidateSnowball(config):
+    if len(config.knock_o_days) != len(config.knock_o_rate):
+        raise ValueError("敲出日期序列与敲出比率序列长度不一致！%d != %d" % (len(config.knock_o_days), len(config.knock_o_rate)))
+    if config.run_from + config.run_days > config.runs_step:
+        raise ValueError("运行天数超出价格变动步数！%d + %d > %d" % (config.run_from, config.run_days, config.runs_step))
+    if any(day > config.runs_step for day in config.knock_o_days):
+        raise ValueError("敲出日期超出价格变动步数！%s" % max(config.knock_o_days))
+    if config.rand_cols < config.runs_step:
+        raise ValueError("随机数据列数 rand_cols 小于价格变动步数！%d < %d" % (config.rand_cols, config.runs_step))
+
+snowball_fields = [
+    Field("rand_rows", kind_int, 0, low = 0), # 随机数据行数
+    Field("rand_cols", kind_int, 0, low = 0), # 随机数据列数
+    Field("rand_quasi", kind_bool, False), # 随机数据类型
+    Field("rand_seed", kind_ints, [], low = 0), # 随机数据种子，非负整数
+    Field("dual_smooth", kind_bool, True), # 对偶平滑路径
+    Field("runs_size", kind_int, 0, low = 0), # 模拟路径数量
+    Field("runs_step", kind_int, 0, low = 0), # 价格变动步数
+    Field("year_days", kind_int, 0, low = 0), # 年交易日数量
+    Field("sigma", kind_float, 0.0, low = 0.0), # 波动率
+    Field("risk_free_rate", kind_float, 0.0), # 无风险利率
+    Field("basis_rate", kind_float, 0.0), # 股息或贴水
+    Field("price_limit_ratio", kind_float, 0.0, low = 0.0, high = 1.0), # 涨跌停限制幅度
+    Field("price_limit_style", kind_int, 0, choices = (0, 1, 2)), # 涨跌停限制方式
+    Field("notional", kind_float, 0.0, low = 0.0), # 名义本金
+    Field("trade_long", kind_bool, False), # 交易方向
+    Field("start_price", kind_float, 0.0, low = 0.0), # 初始价格
+    Field("strike_price", kind_float, 0.0, low = 0.0), # 敲入后执行价格
+    Field("knock_o_ratio", kind_float, 0.0, low = 0.0), # 敲出比率，非百分比
+    Field("knock_i_ratio", kind_float, 0.0, low = 0.0), # 敲入比率，非百分比
+    Field("knock_o_steps", kind_float, 0.0), # 敲出比例逐月递减率
+    Field("knock_i_valid", kind_bool, True), # 是否有下方敲入障碍
+    Field("knock_i_occur", kind_bool, False), # 是否已经发生敲入
+    Field("knock_i_max_loss", kind_float, 0.0, low = 0.0, high = 1.0), # 敲入后最大亏损比率，1.0 为不限亏
+    Field("knock_i_participate", kind_float, 0.0, low = 0.0), # 敲入参与率
+    Field("knock_i_margin_call", kind_bool, True), # 是否敲入后可追加保证金
+    Field("knock_i_only_at_end", kind_bool, False), # 是否仅在期末观察敲入
+    Field("knock_i_above_get", kind_bool, False), # 是否在期末获得高于敲入价的绝对收益
+    Field("coupon_rate", kind_float, 0.0), # 客户年化收益率
+    Field("is_futures", kind_bool, False), # 是否期货期权
+    Field("is_foreign", kind_bool, False), # 是否外汇期权
+    Field("margin_rate", kind_float, 0.0, low = 0.0), # 保证金比例
+    Field("margin_interest", kind_float, 0.0), # 保证金利率
+    Field("use_option_fee", kind_bool, False), # 使用期权费方式而非保证金方式
+    Field("option_fee", kind_float, 0.0, low = 0.0), # 期权费费率
+    Field("option_fee_interest", kind_float, 0.0), # 期权费利率
+    Field("back_end_load", kind_bool, False), # 期权费支付方式
+    Field("discount_payoff", kind_bool, False), # 是否对票息等收支进行贴现
+    Field("discount_margin", kind_bool, False), # 是否对保证金收支进行贴现
+    Field("discount_option_fee", kind_bool, False), # 是否对期权费收支进行贴现
+    Field("compound_option_fee", kind_bool, False), # 是否对期权费收支进行复利
+    Field("extend_end_days", kind_int, 0, low = 0), # 产品结束时延后清算天数(交易日)
+    Field("market_close", kind_bool, False), # 是否已经收盘
+    Field("ukiuko_coupon", kind_float, 0.0), # 无敲出无敲入时的固定收益
+    Field("ukiuko_coupon_ann", kind_bool, False), # False 为绝对收益率，True 为年化收益率
+    Field("ukiuko_coupon_use", kind_bool, False), # 是否单独指定红利票息
+    Field("knock_o_p_rate", kind_float, 0.0, low = 0.0), # 敲出参与比率
+    Field("knock_o_p_need", kind_bool, False), # 是否进行敲出上涨参与增强
+    Field("prefix_rebate_ann_rate", kind_float, 0.0, low = 0.0), # 前端返息比率（年化）
+    Field("prefix_rebate_ann_need", kind_bool, False),
+    Field("prefix_rebate_abs_rate", kind_float, 0.0, low = 0.0), # 前端返息比率（绝对）
+    Field("prefix_rebate_abs_need", kind_bool, False),
+    Field("suffix_rebate_ann_rate", kind_float, 0.0, low = 0.0), # 后端返息比率（年化）
+    Field("suffix_rebate_ann_need", kind_bool, False),
+    Field("suffix_rebate_abs_rate", kind_float, 0.0, low = 0.0), # 后端返息比率（绝对）
+    Field("suffix_rebate_abs_need", kind_bool, False),
+    Field("discount_rebate", kind_bool, False), # 是否对返息进行贴现
+    Field("compound_rebate", kind_bool, False), # 是否对返息进行复利
+    Field("payoff_calc_method", kind_int, 0, low = 0), # 资金流计算方式
+    Field("calc_price", kind_floats, [], low = 0.0), # 计算价格序列
+    Field("run_from", kind_int, 0, low = 0), # 起始天数，第一天为零
+    Field("run_days", kind_int, 0, low = 0), # 运行天数
+    Field("knock_o_days", kind_ints, [], low = 0), # 敲出日期序列(交易日)
+    Field("knock_o_rate", kind_floats, [], low = 0.0), # 敲出比率序列
+    Field("runs_step_n", kind_int, 0, low = 0), # 产品自然日数(含延后清算) (可选)
+    Field("year_days_n", kind_int, 0, low = 0), # 年自然日数量 (可选)
+    Field("knock_o_days_n", kind_ints, [], low = 0), # 敲出日期序列(自然日) (可选)
+    Field("trading_days_n", kind_ints, [], low = 0), # 交易日期序列(自然日) (可选)
+    Field("calc_greek", kind_str, "", choices = ("", "d", "g", "v", "t", "r")), # 要计算的希腊值标识
+    Field("brownian_bridge", kind_bool, optional = True), # 布朗桥构造路径，仅 NumPy 引擎支持
+    Field("diff_settings", kind_dict, optional = True) # 差分计算设置覆盖项，仅 NumPy 引擎支持
+]
+
+SnowballConfig = MakeConfigClass("SnowballConfig", snowball_fields, ValidateSnowball)
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、Vanilla American 的 NumPy 向量化 BAW 模型，对应 derivx_vanilla_american 插件 "ba" 模型；
+# 2、临界价格 S* 对全部参数点同时做 Newton 迭代，已收敛的点不再参与计算；
+# 3、看涨期权 q <= 0 或看跌期权 r <= 0 时不会提前行权，价格等于欧式期权价格；
+#    临界价格只与 (k, r, q, v, t) 有关，与 s 无关，按参数缓存后同一到期时间的全部价格点直接以闭式计算；
+# 4、Vanilla American 的 NumPy 向量化二叉树，对应 "bt" 模型：
+#    倒数第二步以一步期 BS 价格代替持有价值（Broadie-Detemple 平滑），再以 n 步和 n / 2 步结果做 Richardson 外推，
+#    400 步左右即可达到普通二叉树 10000 步的精度；
+#    逆推时各参数点排成一维批量同时计算，希腊值曲面的全部网格点一次逆推完成；
+#    Delta、Gamma、Theta 取自提前两步开始的同一棵树的节点，不另做差分；
+
+import numpy as np
+
+import vanilla_european
+
+critical_tolerance = 1e-10 # 临界价格迭代精度，相对临界价格
+critical_iterations = 100 # 临界价格最大迭代次数
+critical_cache_limit = 100000 # 临界价格缓存最大条目数，超出时淘汰最久未使用的条目
+
+tree_step_default = 400 # 二叉树默认步数，外推后精度约相当于普通二叉树 10000 步
+tree_chunk_rows = 128 # 二叉树分块逆推时每块的参数点数
+days_of_year = 365.0 # Theta 按日计算
+
+def ToArrays(k, r, q, v, t, is_call):
+    return np.broadcast_arrays(*[np.asarray(item, dtype = np.float64) for item in (k, r, q, v, t)], np.asarray(is_call, dtype = bool))
+
+# BAW 二次近似指数，看涨取 q2，看跌取 q1
+def CalcExponent(r, q, v, t, is_call, horizon = True):
+    m = 2.0 * r / (v * v)
+    n = 2.0 * (r - q) / (v * v)
+    if horizon == True:
+        # r 趋于零时 m / (1 - exp(-rt)) 趋于 2 / (v^2 t)
+        k_t = -np.expm1(-r * t)
+        m_k = np.where(np.abs(r * t) > 1e-12, m / np.where(k_t == 0.0, 1.0, k_t), 2.0 / (v * v * t))
+    else:
+        m_k = m
+    root = np.sqrt((n - 1.0) * (n - 1.0) + 4.0 * m_k)
+    return np.where(is_call, 0.5 * (-(n - 1.0) + root), 0.5 * (-(n - 1.0) - root))
+
+# 是否存在提前行权
+def HasEarlyExercise(r, q, is_call):
+    return np.where(is_call, q > 0.0, r > 0.0)
+
+# 临界价格初值，见 Barone-Adesi and Whaley (1987)
+def GuessCritical(k, r, q, v, t, is_call):
+    b = r - q
+    v_sqrt_t = v * np.sqrt(t)
+    exponent_inf = CalcExponent(r, q, v, t, is_call, horizon = False)
+    critical_inf = k / (1.0 - 1.0 / exponent_inf)
+    h_call = -(b * t + 2.0 * v_sqrt_t) * k / (critical_inf - k)
+    h_put = (b * t - 2.0 * v_sqrt_t) * k / (k - critical_inf)
+    with np.errstate(over = "ignore"):
+        guess_call = k + (critical_inf - k) * (1.0 - np.exp(np.minimum(h_call, 0.0)))
+        guess_put = critical_inf + (k - critical_inf) * np.exp(np.minimum(h_put, 0.0))
+    return np.where(is_call, guess_call, guess_put)
+
+# 临界价格方程残差及其导数，看涨 S - K = c(S) + (1 - e^(-qt) N(d1)) S / q2，看跌 K - S = p(S) - (1 - e^(-qt) N(-d1)) S / q1
+def CriticalResidual(critical, k, r, q, v, t, is_call, exponent):
+    terms = vanilla_european.MakeTerms(critical, k, r, q, v, t, is_call)
+    sign = terms["sign"]
+    price = vanilla_european.PriceFromTerms(terms)
+    dq_n1 = terms["dq"] * terms["n1"] # 看涨 e^(-qt) N(d1)，看跌 e^(-qt) N(-d1)
+    dq_pdf = terms["dq"] * vanilla_european.NormPdf(terms["d1"]) / (v * terms["sqrt_t"])
+    residual = sign * (critical - k) - price - sign * (1.0 - dq_n1) * critical / exponent
+    slope = sign * (1.0 - dq_n1) - sign * (1.0 - dq_n1) / exponent + dq_pdf / exponent
+    return residual, slope, price, dq_n1
+
+# guess 为临界价格初值，如相邻参数点已求得的临界价格，为空时采用 BAW 初值
+def CalcCriticalPrice(k, r, q, v, t, is_call = True, guess = None):
+    k, r, q, v, t, is_call = ToArrays(k, r, q, v, t, is_call)
+    critical = np.full(k.shape, np.nan)
+    index = np.flatnonzero(HasEarlyExercise(r, q, is_call) & (t > 0.0) & (v > 0.0))
+    if len(index) == 0:
+        return critical
+    k_i, r_i, q_i, v_i, t_i, c_i = [item.ravel()[index] for item in (k, r, q, v, t, is_call)]
+    exponent = CalcExponent(r_i, q_i, v_i, t_i, c_i)
+    value = GuessCritical(k_i, r_i, q_i, v_i, t_i, c_i)
+    if guess is not None:
+        guess = np.broadcast_to(guess, k.shape).ravel()[index]
+        value = np.where(np.isfinite(guess) & (guess > 0.0), guess, value)
+    active = np.arange(len(index))
+    for _ in range(critical_iterations):
+        residual, slope, _, _ = CriticalResidual(value[active], k_i[active], r_i[active], q_i[active], v_i[active], t_i[active], c_i[active], exponent[active])
+        step = residual / slope
+        update = value[active] - step
+        value_i = value[active]
+        # 步长保护，看涨临界价格不低于行权价，看跌临界价格在零和行权价之间
+        value[active] = np.where(c_i[active], np.maximum(update, 0.5 * (value_i + k_i[active])), np.clip(update, 0.5 * value_i, k_i[active]))
+        active = active[np.abs(step) > critical_tolerance * value[active]]
+        if len(active) == 0:
+            break
+    critical.ravel()[index] = value
+    return critical
+
+# critical 为已求得的临界价格，可在 s 变化而其他参数不变时重复使用
+def CalcPriceArray(s, k, r, q, v, t, is_call = True, critical = None):
+    s, k, r, q, v, t, is_call = vanilla_european.ToArrays(s, k, r, q, v, t, is_call)
+    if critical is None:
+        critical = CalcCriticalPrice(k, r, q, v, t, is_call)
+    critical = np.broadcast_to(critical, s.shape)
+    price = vanilla_european.CalcPriceArray(s, k, r, q, v, t, is_call)
+    early = ~np.isnan(critical)
+    if not early.any():
+        return price
+    critical_live = np.where(early, critical, k)
+    v_live = np.where(early, v, 1.0)
+    t_live = np.where(early, t, 1.0)
+    exponent = CalcExponent(r, q, v_live, t_live, is_call)
+    _, _, _, dq_n1 = CriticalResidual(critical_live, k, r, q, v_live, t_live, is_call, exponent)
+    sign = np.where(is_call, 1.0, -1.0)
+    factor = sign * critical_live / exponent * (1.0 - dq_n1) # A2 或 A1
+    with np.errstate(over = "ignore"):
+        premium = factor * np.power(s / critical_live, exponent) # 行权区域内的溢出值不会被采用
+    exercise = np.where(is_call, s >= critical_live, s <= critical_live)
+    american = np.where(exercise, sign * (s - k), price + premium)
+    return np.where(early, american, price)
+
+class CriticalCache(object):
+    def __init__(self, limit = critical_cache_limit):
+        self.limit = limit
+        self.items = {} # (k, r, q, v, t, is_call) -> 临界价格，按使用先后排列
+        self.hits = 0
+        self.misses = 0
+
+    def Clear(self):
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # 相同参数只求解一次，guess 为未命中时的初值，如差分前参数的临界价格
+    def Get(self, k, r, q, v, t, is_call = True, guess = None):
+        k, r, q, v, t, is_call = ToArrays(k, r, q, v, t, is_call)
+        shape = k.shape
+        table = np.stack([item.ravel().astype(np.float64) for item in (k, r, q, v, t, is_call)], axis = 1)
+        unique, first, inverse = np.unique(table, axis = 0, return_index = True, return_inverse = True)
+        values = np.empty(len(unique))
+        missing = []
+        for i, key in enumerate(map(tuple, unique.tolist())):
+            value = self.items.pop(key, None)
+            if value is None:
+                missing.append(i)
+            else:
+                self.items[key] = value # 移至末尾
+                values[i] = value
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+        if len(missing) > 0:
+            rows = unique[missing]
+            if guess is not None:
+                guess = np.broadcast_to(guess, shape).ravel()[first[missing]]
+            values[missing] = CalcCriticalPrice(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4], rows[:, 5] > 0.5, guess)
+            for i in missing:
+                self.items[tuple(unique[i].tolist())] = values[i]
+            while len(self.items) > self.limit:
+                self.items.pop(next(iter(self.items)))
+        return values[inverse.ravel()].reshape(shape)
+
+critical_cache = CriticalCache() # 全局临界价格缓存
+
+# BAW 希腊值以差分计算，口径与 "bs" 模型一致：Delta、Gamma 价格相对变动 1%，Vega、Rho 变动 0.01 并以 1% 为单位，Theta 为 1day 价值变化
+# 价格差分不改变 (k, r, q, v, t)，直接使用缓存的临界价格，其他差分以缓存的临界价格为初值求解
+def CalcGreeksArray(s, k, r, q, v, t, is_long = True, is_call = True, is_futures = False, is_foreign = False, greeks = "dgvtr", cache = critical_cache):
+    s, k, r, q, v, t, is_call = vanilla_european.ToArrays(s, k, r, q, v, t, is_call)
+    is_futures = np.broadcast_to(np.asarray(is_futures, dtype = bool), s.shape)
+    long_sign = np.where(np.asarray(is_long, dtype = bool), 1.0, -1.0)
+    if cache is None:
+        cache = CriticalCache()
+    critical = cache.Get(k, r, q, v, t, is_call)
+    def Price(s, r, q, v, t, reuse = False):
+        critical_i = critical if reuse == True else cache.Get(k, r, q, v, t, is_call, critical)
+        return CalcPriceArray(s, k, r, q, v, t, is_call, critical_i)
+    result = {}
+    price = CalcPriceArray(s, k, r, q, v, t, is_call, critical)
+    if "p" in greeks:
+        result["p"] = price
+    if "d" in greeks or "g" in greeks:
+        ds = 0.01 * s
+        price_u = Price(s + ds, r, q, v, t, reuse = True)
+        price_d = Price(s - ds, r, q, v, t, reuse = True)
+        if "d" in greeks:
+            result["d"] = long_sign * (price_u - price_d) / (2.0 * ds)
+        if "g" in greeks:
+            result["g"] = long_sign * (price_u - 2.0 * price + price_d) / (ds * ds)
+    if "v" in greeks:
+        v_d = np.maximum(v - 0.01, 0.0)
+        result["v"] = long_sign * (Price(s, r, q, v + 0.01, t) - Price(s, r, q, v_d, t)) / (v + 0.01 - v_d) / 100.0
+    if "t" in greeks:
+        dt = np.minimum(1.0 / days_of_year, t)
+        scale = np.where(dt > 0.0, 1.0 / (dt * days_of_year), 0.0) # 剩余不足 1day 时按比例折算
+        result["t"] = long_sign * (Price(s, r, q, v, t - dt) - price) * scale
+    if "r" in greeks:
+        q_r = np.where(is_futures, 0.01, 0.0) # 期货期权持有成本为零，利率变动时 q 同步变动
+        result["r"] = long_sign * (Price(s, r + 0.01, q + q_r, v, t) - Price(s, r - 0.01, q - q_r, v, t)) / 0.02 / 100.0
+    return result
+
+# 价格维度 array_s 与到期时间维度 array_t 的希腊值曲面，结果为 len(array_s) x len(array_t)，临界价格每个到期时间只求解一次
+def CalcGreeksSurfaceArray(greek, array_s, k, r, q, v, array_t, is_long = True, is_call = True, is_futures = False, is_foreign = False, cache = critical_cache):
+    s = np.asarray(array_s, dtype = np.float64)[:, None]
+    t = np.asarray(array_t, dtype = np.float64)[None, :]
+    return CalcGreeksArray(s, k, r, q, v, t, is_long, is_call, is_futures, is_foreign, greeks = greek, cache = cache)[greek]
+
+# 二叉树逆推，参数均已展开为一维批量，格点数组首维为节点、次维为参数点，逐步逆推时每个节点的数据连续存放
+# extend 为 2 时树提前两步开始，第 2 步三个节点为 s / up^2、s、s * up^2，同时返回这三个节点的价值用于计算 Delta、Gamma、Theta
+def RollbackTree(s, k, r, q, v, t, is_call, tree_step, is_american, extend = 0):
+    sign = np.where(is_call, 1.0, -1.0)
+    dt = t / tree_step
+    total = tree_step + extend
+    step = v * np.sqrt(dt)
+    up = np.exp(step)
+    prob = (np.exp((r - q) * dt) - 1.0 / up) / (up - 1.0 / up)
+    disc = np.exp(-r * dt)
+    # 价格格点 s * up^m，m 取 -(total - 1) ~ (total - 1)，第 i 步节点 j 对应 m = 2j - i
+    spots = s * np.exp(step * np.arange(-(total - 1), total)[:, None])
+    exercise = np.maximum(sign * (spots - k), 0.0) if is_american == True else None
+    value = vanilla_european.CalcPriceArray(spots[0 : : 2], k, r, q, v, dt, sign > 0.0) # 倒数第二步以一步期 BS 价格平滑
+    if is_american == True:
+        np.maximum(value, exercise[0 : : 2], out = value)
+    buffer = np.empty_like(value)
+    nodes = None
+    for i in range(total - 2, -1, -1):
+        result = buffer[: i + 1]
+        np.subtract(value[1 :], value[: -1], out = result)
+        result *= prob
+        result += value[: -1]
+        result *= disc
+        if is_american == True:
+            np.maximum(result, exercise[total - 1 - i : total + i : 2], out = result)
+        if i == 2 and extend == 2:
+            nodes = result.copy()
+        value, buffer = result, value
+    return value[0], nodes
+
+# 对全部参数点分块计算，func 返回一组数组，n 步和 n / 2 步结果做 Richardson 外推
+def ExtrapolateTree(func, arrays, tree_step):
+    tree_step = max(int(tree_step) // 2 * 2, 4) # 外推需要偶数步
+    count = len(arrays[0])
+    rows = tree_chunk_rows # 分块逆推，使每块的格点数据留在缓存中
+    result = None
+    for beg in range(0, count, rows):
+        args = [item[beg : beg + rows] for item in arrays]
+        value_n = func(*args, tree_step)
+        value_h = func(*args, tree_step // 2)
+        if result is None:
+            result = [np.empty(count) for _ in value_n]
+        for i in range(len(value_n)):
+            result[i][beg : beg + rows] = 2.0 * value_n[i] - value_h[i]
+    return result
+
+def CalcTreePriceArray(s, k, r, q, v, t, is_call = True, tree_step = tree_step_default, is_american = True):
+    s, k, r, q, v, t, is_call = vanilla_european.ToArrays(s, k, r, q, v, t, is_call)
+    shape = s.shape
+    s, k, r, q, v, t, is_call = [item.ravel() for item in (s, k, r, q, v, t, is_call)]
+    price = np.maximum(np.where(is_call, s - k, k - s), 0.0) # 到期或波动率不为正时按内在价值
+    live = np.flatnonzero((t > 0.0) & (v > 0.0))
+    if len(live) > 0:
+        def Price(s, k, r, q, v, t, is_call, tree_step):
+            return (RollbackTree(s, k, r, q, v, t, is_call, tree_step, is_american)[0],)
+        price[live] = ExtrapolateTree(Price, [item[live] for item in (s, k, r, q, v, t, is_call)], tree_step)[0]
+    return price.reshape(shape)
+
+# 价格、Delta、Gamma、Theta 由同一棵提前两步开始的树得出，Theta 为年化值
+def CalcTreeNodeArray(s, k, r, q, v, t, is_call, tree_step, is_american):
+    count = len(s)
+    sign = np.where(is_call, 1.0, -1.0)
+    price = np.maximum(sign * (s - k), 0.0)
+    delta = np.where(sign * (s - k) > 0.0, sign, 0.0)
+    gamma = np.zeros(count)
+    theta = np.zeros(count)
+    live = np.flatnonzero((t > 0.0) & (v > 0.0))
+    if len(live) > 0:
+        def Nodes(s, k, r, q, v, t, is_call, tree_step):
+            root, nodes = RollbackTree(s, k, r, q, v, t, is_call, tree_step, is_american, extend = 2)
+            dt = t / tree_step
+            s_u = s * np.exp(2.0 * v * np.sqrt(dt))
+            s_d = s * np.exp(-2.0 * v * np.sqrt(dt))
+            value_d, value_m, value_u = nodes[0], nodes[1], nodes[2]
+            delta = (value_u - value_d) / (s_u - s_d)
+            gamma = ((value_u - value_m) / (s_u - s) - (value_m - value_d) / (s - s_d)) / (0.5 * (s_u - s_d))
+            theta = (value_m - root) / (2.0 * dt) # 根节点早两步，价格相同
+            return value_m, delta, gamma, theta
+        result = ExtrapolateTree(Nodes, [item[live] for item in (s, k, r, q, v, t, is_call)], tree_step)
+        for array, value in zip((price, delta, gamma, theta), result):
+            array[live] = value
+    return price, delta, gamma, theta
+
+# 二叉树希腊值，口径与 "bs" 模型一致：Vega、Rho 以 1% 为单位，Theta 以 1day 为单位
+# Delta、Gamma、Theta 取自树节点，Vega、Rho 为波动率和利率变动 0.01 的中心差分，全部差分情景在同一批逆推中完成
+def CalcTreeGreeksArray(s, k, r, q, v, t, is_long = True, is_call = True, is_futures = False, is_foreign = False, tree_step = tree_step_default, is_american = True, greeks = "dgvtr"):
+    s, k, r, q, v, t, is_call = vanilla_european.ToArrays(s, k, r, q, v, t, is_call)
+    shape = s.shape
+    is_futures = np.broadcast_to(np.asarray(is_futures, dtype = bool), shape).ravel()
+    s, k, r, q, v, t, is_call = [item.ravel() for item in (s, k, r, q, v, t, is_call)]
+    long_sign = np.broadcast_to(np.where(np.asarray(is_long, dtype = bool), 1.0, -1.0), shape).ravel()
+    result = {}
+    if "p" in greeks or "d" in greeks or "g" in greeks or "t" in greeks:
+        price, delta, gamma, theta = CalcTreeNodeArray(s, k, r, q, v, t, is_call, tree_step, is_american)
+        result.update({"p": price, "d": long_sign * delta, "g": long_sign * gamma, "t": long_sign * theta / days_of_year})
+    scenarios = []
+    if "v" in greeks:
+        v_d = np.maximum(v - 0.01, 0.0)
+        scenarios += [(r, q, v + 0.01), (r, q, v_d)]
+    if "r" in greeks:
+        q_r = np.where(is_futures, 0.01, 0.0) # 期货期权持有成本为零，利率变动时 q 同步变动
+        scenarios += [(r + 0.01, q + q_r, v), (r - 0.01, q - q_r, v)]
+    if len(scenarios) > 0:
+        count = len(scenarios)
+        stack = [np.concatenate([item[i] for item in scenarios]) for i in range(3)]
+        values = CalcTreePriceArray(np.tile(s, count), np.tile(k, count), stack[0], stack[1], stack[2], np.tile(t, count), np.tile(is_call, count), tree_step, is_american)
+        values = np.split(values, count)
+        if "v" in greeks:
+            value_u, value_d = values[0], values[1]
+            values = values[2 :]
+            result["v"] = long_sign * (value_u - value_d) / (v + 0.01 - v_d) / 100.0
+        if "r" in greeks:
+            result["r"] = long_sign * (values[0] - values[1]) / 0.02 / 100.0
+    return {greek: result[greek].reshape(shape) for greek in greeks}
+
+# 价格维度 array_s 与到期时间维度 array_t 的希腊值曲面，结果为 len(array_s) x len(array_t)，全部网格点一次逆推
+def CalcTreeGreeksSurfaceArray(greek, array_s, k, r, q, v, array_t, is_long = True, is_call = True, is_futures = False, is_foreign = False, tree_step = tree_step_default, is_american = True):
+    s = np.asarray(array_s, dtype = np.float64)[:, None]
+    t = np.asarray(array_t, dtype = np.float64)[None, :]
+    return CalcTreeGreeksArray(s, k, r, q, v, t, is_long, is_call, is_futures, is_foreign, tree_step, is_american, greeks = greek)[greek]
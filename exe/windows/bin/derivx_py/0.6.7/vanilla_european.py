@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2021-2026 the DerivX authors
+# All rights reserved.
+#
+# The project sponsor and lead author is Xu Rendong.
+# E-mail: xrd@ustc.edu, QQ: 277195007, WeChat: xrd_ustc
+# See the contributors file for names of other contributors.
+#
+# Commercial use of this code in source and binary forms is
+# governed by a LGPL v3 license. You may get a copy from the
+# root directory. Or else you should get a specific written
+# permission from the project author.
+#
+# Individual and educational use of this code in source and
+# binary forms is governed by a 3-clause BSD license. You may
+# get a copy from the root directory. Certainly welcome you
+# to contribute code of all sorts.
+#
+# Be sure to retain the above copyright notice and conditions.
+
+# 模块说明：
+# 1、Vanilla European 的 NumPy 向量化 BS 模型，参数均可为标量或可广播的数组，一次调用完成整个曲面计算；
+# 2、计算口径与 derivx_vanilla_european 插件 "bs" 模型一致：
+#    Vega 以波动率变动 1% 为单位，Theta 以 1day 为单位，Rho 以无风险利率变动 1% 为单位；
+#    期货期权（is_futures）持有成本为零，Rho 只含贴现项；外汇期权（is_foreign）q 为外币利率，Rho 为本币利率敏感度；
+#    is_long 为 False 时希腊值取反，价格不受影响；
+# 3、正态分布函数采用 Cody 有理逼近，不依赖 SciPy，与 math.erfc 结果相差在 1e-15 以内；
+
+import numpy as np
+
+days_of_year = 365.0 # Theta 按日计算
+
+# Cody 正态分布函数系数
+cody_a = (2.2352520354606839287, 161.02823106855587881, 1067.6894854603709582, 18154.981253343561249, 0.065682337918207449113)
+cody_b = (47.20258190468824187, 976.09855173777669322, 10260.932208618978205, 45507.789335026729956)
+cody_c = (0.39894151208813466764, 8.8831497943883759412, 93.506656132177855979, 597.27027639480026226, 2494.5375852903726711,
+          6848.1904505362823326, 11602.651437647350124, 9842.7148383839780218, 1.0765576773720192317e-8)
+cody_d = (22.266688044328115691, 235.38790178262499861, 1519.377599407554805, 6485.558298266760755, 18615.571640885098091,
+          34900.952721145977266, 38912.003286093271411, 19685.429676859990727)
+cody_p = (0.21589853405795699, 0.1274011611602473639, 0.022235277870649807, 0.001421619193227893466, 2.9112874951168792e-5, 0.02307344176494017303)
+cody_q = (1.28426009614491121, 0.468238212480865118, 0.0659881378689285515, 0.00378239633202758244, 7.29751555083966205e-5)
+
+cody_split_1 = 0.67448975
+cody_split_2 = 5.656854249492380195206754896838 # sqrt(32)
+one_sqrt_2pi = 0.398942280401432677939946059934
+
+# 尾部概率 exp(-y^2/2) 拆分计算以减少舍入误差
+def TailExp(y, temp):
+    y_trunc = np.trunc(y * 16.0) / 16.0
+    delta = (y - y_trunc) * (y + y_trunc)
+    return np.exp(-y_trunc * y_trunc * 0.5) * np.exp(-delta * 0.5) * temp
+
+def NormCdf(x):
+    x = np.asarray(x, dtype = np.float64)
+    y = np.abs(x)
+    upper = np.empty_like(y) # 上尾概率 Q(|x|)
+    mask = y <= cody_split_1
+    if mask.any():
+        ys = y[mask]
+        ysq = np.where(ys > 1.11e-16, ys * ys, 0.0)
+        num = cody_a[4] * ysq
+        den = ysq
+        for i in range(3):
+            num = (num + cody_a[i]) * ysq
+            den = (den + cody_b[i]) * ysq
+        upper[mask] = 0.5 - ys * (num + cody_a[3]) / (den + cody_b[3])
+    mask_2 = (~mask) & (y <= cody_split_2)
+    if mask_2.any():
+        ys = y[mask_2]
+        num = cody_c[8] * ys
+        den = ys
+        for i in range(7):
+            num = (num + cody_c[i]) * ys
+            den = (den + cody_d[i]) * ys
+        upper[mask_2] = TailExp(ys, (num + cody_c[7]) / (den + cody_d[7]))
+    mask_3 = y > cody_split_2
+    if mask_3.any():
+        ys = y[mask_3]
+        ysq = 1.0 / (ys * ys)
+        num = cody_p[5] * ysq
+        den = ysq
+        for i in range(4):
+            num = (num + cody_p[i]) * ysq
+            den = (den + cody_q[i]) * ysq
+        upper[mask_3] = TailExp(ys, (one_sqrt_2pi - ysq * (num + cody_p[4]) / (den + cody_q[4])) / ys)
+    result = np.where(x > 0.0, 1.0 - upper, upper)
+    return result if result.ndim > 0 else float(result)
+
+def NormPdf(x):
+    x = np.asarray(x, dtype = np.float64)
+    return one_sqrt_2pi * np.exp(-0.5 * x * x)
+
+def ToArrays(s, k, r, q, v, t, is_call):
+    return np.broadcast_arrays(*[np.asarray(item, dtype = np.float64) for item in (s, k, r, q, v, t)], np.asarray(is_call, dtype = bool))
+
+# 公共中间量，t 或 v 不为正时按到期处理
+def MakeTerms(s, k, r, q, v, t, is_call):
+    s, k, r, q, v, t, is_call = ToArrays(s, k, r, q, v, t, is_call)
+    live = (t > 0.0) & (v > 0.0)
+    t_live = np.where(live, t, 1.0)
+    v_live = np.where(live, v, 1.0)
+    sqrt_t = np.sqrt(t_live)
+    v_sqrt_t = v_live * sqrt_t
+    d1 = (np.log(s / k) + (r - q + 0.5 * v_live * v_live) * t_live) / v_sqrt_t
+    d2 = d1 - v_sqrt_t
+    sign = np.where(is_call, 1.0, -1.0)
+    terms = {
+        "s": s, "k": k, "r": r, "q": q, "v": v_live, "t": np.where(live, t, 0.0), "live": live, "sign": sign,
+        "sqrt_t": sqrt_t, "d1": d1, "d2": d2,
+        "dq": np.exp(-q * np.where(live, t, 0.0)), "dr": np.exp(-r * np.where(live, t, 0.0)),
+        "n1": NormCdf(sign * d1), "n2": NormCdf(sign * d2)
+    }
+    return terms
+
+def PriceFromTerms(terms):
+    s, k, sign = terms["s"], terms["k"], terms["sign"]
+    price = sign * (s * terms["dq"] * terms["n1"] - k * terms["dr"] * terms["n2"])
+    intrinsic = np.maximum(sign * (s - k), 0.0)
+    return np.where(terms["live"], price, intrinsic)
+
+def CalcPriceArray(s, k, r, q, v, t, is_call = True):
+    return PriceFromTerms(MakeTerms(s, k, r, q, v, t, is_call))
+
+# greeks 为 "d"、"g"、"v"、"t"、"r" 的组合，另可含 "p" 同时返回价格
+def CalcGreeksArray(s, k, r, q, v, t, is_long = True, is_call = True, is_futures = False, is_foreign = False, greeks = "dgvtr"):
+    terms = MakeTerms(s, k, r, q, v, t, is_call)
+    s, k, r, q, v, t = terms["s"], terms["k"], terms["r"], terms["q"], terms["v"], terms["t"]
+    live, sign, sqrt_t = terms["live"], terms["sign"], terms["sqrt_t"]
+    dq, dr, n1, n2 = terms["dq"], terms["dr"], terms["n1"], terms["n2"]
+    pdf_1 = NormPdf(terms["d1"])
+    price = PriceFromTerms(terms)
+    long_sign = np.where(np.asarray(is_long, dtype = bool), 1.0, -1.0)
+    is_futures = np.asarray(is_futures, dtype = bool)
+    result = {}
+    if "p" in greeks:
+        result["p"] = price
+    if "d" in greeks:
+        delta = np.where(live, sign * dq * n1, np.where(sign * (s - k) > 0.0, sign, 0.0))
+        result["d"] = long_sign * delta
+    if "g" in greeks:
+        gamma = np.where(live, dq * pdf_1 / (s * v * sqrt_t), 0.0)
+        result["g"] = long_sign * gamma
+    if "v" in greeks:
+        vega = np.where(live, s * dq * pdf_1 * sqrt_t, 0.0) / 100.0
+        result["v"] = long_sign * vega
+    if "t" in greeks:
+        theta = -s * dq * pdf_1 * v / (2.0 * sqrt_t) - sign * r * k * dr * n2 + sign * q * s * dq * n1
+        result["t"] = long_sign * np.where(live, theta, 0.0) / days_of_year
+    if "r" in greeks:
+        # 期货期权标的价格不随利率变化，外汇期权 q 为外币利率与本币利率无关，故与股票期权同式
+        rho = np.where(is_futures, -t * price, sign * k * t * dr * n2)
+        result["r"] = long_sign * np.where(live, rho, 0.0) / 100.0
+    return result
+
+# 价格维度 array_s 与到期时间维度 array_t 的希腊值曲面，结果为 len(array_s) x len(array_t)
+def CalcGreeksSurfaceArray(greek, array_s, k, r, q, v, array_t, is_long = True, is_call = True, is_futures = False, is_foreign = False):
+    s = np.asarray(array_s, dtype = np.float64)[:, None]
+    t = np.asarray(array_t, dtype = np.float64)[None, :]
+    return CalcGreeksArray(s, k, r, q, v, t, is_long, is_call, is_futures, is_foreign, greeks = greek)[greek]